@@ -0,0 +1,221 @@
+# api_client.py
+
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlsplit, urlencode, quote
+
+from repositories import AppointmentRecord, LecturerRecord, StudentRecord, UserRecord, BookingConflictError
+from repositories import LecturerLoadRecord, DepartmentLoadRecord, WeeklyVolumeRecord
+from repositories import SEARCH_LIMIT
+from services import ServiceError, ValidationError, AuthenticationError, PermissionDenied, NotFound
+from session import Session
+
+ERRORS = {cls.__name__: cls for cls in (ServiceError, ValidationError, AuthenticationError, PermissionDenied, NotFound)}
+PROFILE_TYPES = {"student": StudentRecord, "faculty": LecturerRecord}
+# Tokens are refreshed this many seconds before they expire
+REFRESH_MARGIN = 60
+
+class ApiClient:
+    """
+    Client of server.py with the same methods as services.Service.
+
+    The GUI talks to either one through the same calls. Each thread keeps its
+    own keep-alive HTTP connection. Errors come back as the service layer's
+    exception types, transport failures included (as ServiceError), and
+    records come back as the repository record types.
+    """
+
+    def __init__(self, base_url, timeout=30):
+        url = urlsplit(base_url)
+        if url.scheme != "http" or not url.hostname:
+            raise ValueError(f"Unsupported API URL: {base_url}")
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.prefix = url.path.rstrip("/")
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def _connection(self, fresh=False):
+        conn = getattr(self.local, "conn", None)
+        if conn is None or fresh:
+            if conn is not None:
+                conn.close()
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self.local.conn = conn
+        return conn
+
+    def _request(self, method, path, session=None, body=None, query=None):
+        if session is not None and session.token_expires and time.time() > session.token_expires - REFRESH_MARGIN:
+            self.refresh(session)
+        return self._send(method, path, session, body, query)
+
+    def _send(self, method, path, session=None, body=None, query=None):
+        target = self.prefix + path + ("?" + urlencode(query) if query else "")
+        data = None if body is None else json.dumps(body).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if session is not None:
+            headers["Authorization"] = f"Bearer {session.token}"
+        for attempt in range(2):
+            conn = self._connection(fresh=attempt > 0)
+            try:
+                conn.request(method, target, body=data, headers=headers)
+                response = conn.getresponse()
+                payload = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                # The server closed an idle keep-alive connection; retry once on a new one
+                if attempt:
+                    self._drop_connection()
+                    raise ServiceError(f"Server unreachable at {self.host}:{self.port}: {e}")
+            except (OSError, http.client.HTTPException) as e:
+                # Refused, timed out or garbled; the next call starts on a new connection
+                self._drop_connection()
+                raise ServiceError(f"Server unreachable at {self.host}:{self.port}: {e}")
+        try:
+            result = json.loads(payload) if payload else None
+        except ValueError:
+            raise ServiceError(f"Invalid response from the server (status {response.status}).")
+        if response.status >= 400:
+            self._raise(response.status, result or {}, session)
+        return result
+
+    def _drop_connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+    def _raise(self, status, error, session):
+        message = error.get("message", f"Request failed with status {status}.")
+        if error.get("error") == "BookingConflictError":
+            raise BookingConflictError([AppointmentRecord(**c) for c in error.get("conflicts", [])])
+        if status == 401 and session is not None:
+            # The server no longer accepts this session; the user has to log in again
+            session.invalidate()
+        cls = ERRORS.get(error.get("error"), ServiceError)
+        raise cls(message)
+
+    # Authentication
+
+    def login(self, username, password):
+        data = self._request("POST", "/login", body={"username": username, "password": password})
+        profile_type = PROFILE_TYPES.get(data["role"])
+        profile = profile_type(**data["profile"]) if profile_type and data.get("profile") else None
+        session = Session(UserRecord(username=data["username"], role=data["role"]), profile)
+        session.token, session.token_expires = data["token"], data["token_expires"]
+        return session
+
+    def refresh(self, session):
+        """
+        Swap the session's token for a fresh one without sending the password again.
+        """
+        data = self._send("POST", "/token/refresh", session)
+        session.token, session.token_expires = data["token"], data["token_expires"]
+
+    def logout(self, session):
+        if session is not None and session.valid:
+            try:
+                self._request("POST", "/logout", session)
+            finally:
+                session.invalidate()
+
+    def change_password(self, session, old_password, new_password):
+        self._request("POST", "/password", session, {"old_password": old_password, "new_password": new_password})
+        session.invalidate()
+
+    # Change notification
+
+    def change_versions(self, session, names):
+        return self._request("GET", "/changes", session, query={"names": ",".join(names)})
+
+    # Admin
+
+    def cancellation_requests(self, session):
+        return [AppointmentRecord(**row) for row in self._request("GET", "/cancellation-requests", session)]
+
+    def decide_cancellations(self, session, approve_ids, reject_ids):
+        data = self._request("POST", "/cancellation-requests/decide", session,
+                             {"approve": list(approve_ids), "reject": list(reject_ids)})
+        return data["approved"], data["rejected"]
+
+    def edit_record(self, session, table, key, field, value):
+        data = self._request("PATCH", f"/records/{quote(table, safe='')}/{quote(str(key), safe='')}", session,
+                             {"field": field, "value": value})
+        return data["changed"]
+
+    def search_students(self, session, text, limit=SEARCH_LIMIT):
+        rows = self._request("GET", "/students/search", session, query={"q": text, "limit": limit})
+        return [StudentRecord(**row) for row in rows]
+
+    def query_statistics(self, session):
+        return self._request("GET", "/diagnostics/queries", session)
+
+    def cache_statistics(self, session):
+        return self._request("GET", "/diagnostics/cache", session)
+
+    def lecturer_load(self, session):
+        return [LecturerLoadRecord(**row) for row in self._request("GET", "/reports/lecturers", session)]
+
+    def department_load(self, session):
+        return [DepartmentLoadRecord(**row) for row in self._request("GET", "/reports/departments", session)]
+
+    def weekly_volume(self, session, first_date, last_date):
+        rows = self._request("GET", "/reports/weekly", session, query={"first": first_date, "last": last_date})
+        return [WeeklyVolumeRecord(**row) for row in rows]
+
+    def reset_query_statistics(self, session):
+        self._request("DELETE", "/diagnostics/queries", session)
+
+    # Student
+
+    def student_appointments(self, session, upcoming=False):
+        rows = self._request("GET", "/appointments", session, query={"upcoming": 1} if upcoming else None)
+        return [AppointmentRecord(**row) for row in rows]
+
+    def lecturer_choices(self, session):
+        return [LecturerRecord(**row) for row in self._request("GET", "/lecturers", session)]
+
+    def search_lecturers(self, session, text, limit=SEARCH_LIMIT):
+        rows = self._request("GET", "/lecturers/search", session, query={"q": text, "limit": limit})
+        return [LecturerRecord(**row) for row in rows]
+
+    def free_slots(self, session, lecturer_number, first_date, last_date, length):
+        rows = self._request("GET", f"/lecturers/{quote(lecturer_number, safe='')}/free-slots", session,
+                             query={"first": first_date, "last": last_date, "length": length})
+        return [tuple(row) for row in rows]
+
+    def request_appointment(self, session, lecturer_number, date, start_time, end_time):
+        data = self._request("POST", "/appointments", session, {
+            "lecturer_number": lecturer_number, "date": date, "start_time": start_time, "end_time": end_time,
+        })
+        return data["appointment_id"]
+
+    def request_cancellation(self, session, appointment_id):
+        self._request("POST", f"/appointments/{_appointment_id(appointment_id)}/cancellation-request", session)
+
+    # Faculty
+
+    def counseling_hours(self, session, upcoming=False):
+        rows = self._request("GET", "/counseling-hours", session, query={"upcoming": 1} if upcoming else None)
+        return [AppointmentRecord(**row) for row in rows]
+
+    def pending_appointments(self, session):
+        return [AppointmentRecord(**row) for row in self._request("GET", "/pending", session)]
+
+    def decide_pending(self, session, accept_ids, reject_ids):
+        data = self._request("POST", "/pending/decide", session,
+                             {"accept": list(accept_ids), "reject": list(reject_ids)})
+        return data["accepted"], data["rejected"]
+
+    def cancel_appointment(self, session, appointment_id):
+        self._request("DELETE", f"/appointments/{_appointment_id(appointment_id)}", session)
+
+def _appointment_id(appointment_id):
+    appointment_id = str(appointment_id).strip()
+    if not appointment_id:
+        raise ValidationError("Appointment ID is required.")
+    if not appointment_id.isdigit():
+        raise NotFound("No such appointment found or you are not authorized to cancel it.")
+    return appointment_id
@@ -0,0 +1,204 @@
+# archive.py
+
+import argparse
+import json
+import logging
+import os
+from datetime import date as Date, timedelta
+
+from database import ConnectionManager, db_path
+from log_config import configure_logging
+from migrations import apply_migrations
+from repositories import Repository, AppointmentRepo, AppointmentRecord, ReportRepo
+from scheduling import epoch_minutes, parse_date
+
+def archive_path_for(path):
+    """
+    Default archive file of a database: FacultyOnSite.db -> FacultyOnSite-archive.db.
+    """
+    return os.path.splitext(path)[0] + "-archive.db"
+
+# Appointments that ended before the archive cutoff live in this file. Only
+# history queries ATTACH it; the day-to-day screens read the hot file alone.
+ARCHIVE_PATH = os.environ.get("FACULTYONSITE_ARCHIVE_PATH", archive_path_for(db_path))
+# Default cutoff: appointments that ended more than this many days ago are archived
+ARCHIVE_AFTER_DAYS = int(os.environ.get("FACULTYONSITE_ARCHIVE_AFTER_DAYS", 30))
+ARCHIVE_BATCH_SIZE = 5000
+
+# Same columns as the hot Appointments table, without the foreign keys (they
+# cannot cross database files) and with the time each row was archived.
+ARCHIVE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS archive.Appointments (
+        appointment_id INTEGER PRIMARY KEY,
+        student_number TEXT NOT NULL,
+        lecturer_number TEXT NOT NULL,
+        starts_at INTEGER NOT NULL,
+        ends_at INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        cancellation_requested INTEGER DEFAULT 0,
+        date TEXT GENERATED ALWAYS AS (strftime('%Y-%m-%d', starts_at * 60, 'unixepoch')) VIRTUAL,
+        start_time TEXT GENERATED ALWAYS AS (strftime('%H:%M', starts_at * 60, 'unixepoch')) VIRTUAL,
+        end_time TEXT GENERATED ALWAYS AS (strftime('%H:%M', ends_at * 60, 'unixepoch')) VIRTUAL,
+        archived_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS archive.idx_archive_student
+    ON Appointments (student_number, starts_at, ends_at, status);
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS archive.idx_archive_lecturer
+    ON Appointments (lecturer_number, starts_at, ends_at, status);
+    """,
+]
+
+def attach_archive(conn, path=ARCHIVE_PATH):
+    """
+    ATTACH the archive database as "archive", creating its tables if needed.
+    """
+    conn.execute("ATTACH DATABASE ? AS archive", (path,))
+    conn.execute("PRAGMA archive.journal_mode = WAL")
+    for statement in ARCHIVE_SCHEMA:
+        conn.execute(statement)
+    conn.commit()
+
+def archive_manager_for(path, archive_path):
+    """
+    ConnectionManager for the database at path with archive_path ATTACHed to every connection.
+    """
+    return ConnectionManager(path, setup=lambda conn: attach_archive(conn, archive_path))
+
+class HistoryRepo(Repository):
+    """
+    A student's or lecturer's appointments across the hot database and the archive.
+
+    Runs on connections of its own with the archive ATTACHed, so opening the
+    archive is left to the screens that ask for past appointments.
+    """
+    record_type = AppointmentRecord
+
+    COLUMNS = ("appointment_id", "starts_at", "ends_at", "status")
+    # UNION rather than UNION ALL: a row copied by an interrupted archive run
+    # may briefly exist in both files and must be listed once.
+    FOR_STUDENT = (
+        "SELECT appointment_id, starts_at, ends_at, status FROM main.Appointments WHERE student_number = ? "
+        "UNION SELECT appointment_id, starts_at, ends_at, status FROM archive.Appointments WHERE student_number = ? "
+        "ORDER BY starts_at"
+    )
+    FOR_LECTURER = (
+        "SELECT appointment_id, starts_at, ends_at, status FROM main.Appointments WHERE lecturer_number = ? "
+        "UNION SELECT appointment_id, starts_at, ends_at, status FROM archive.Appointments WHERE lecturer_number = ? "
+        "ORDER BY starts_at"
+    )
+
+    def for_student(self, student_number):
+        return self._all(self.FOR_STUDENT, (student_number, student_number), self.COLUMNS)
+
+    def for_lecturer(self, lecturer_number):
+        return self._all(self.FOR_LECTURER, (lecturer_number, lecturer_number), self.COLUMNS)
+
+class Archiver:
+    """
+    Move appointments that ended before a cutoff from the hot database into the archive.
+
+    Batches are taken oldest first. Each one is copied into the archive in
+    one transaction and deleted from the hot database in the next: under WAL
+    a transaction over two database files is not atomic across them, so an
+    interrupted run may leave the last batch in both files, never in neither.
+    The copy ignores rows already archived, and the next run finishes the job.
+    The deletes leave the report summaries alone, so archived appointments
+    stay counted.
+    """
+
+    SELECT_BATCH = (
+        "SELECT appointment_id FROM main.Appointments WHERE starts_at < ? AND ends_at <= ? "
+        "ORDER BY starts_at LIMIT ?"
+    )
+    COPY = (
+        "INSERT OR IGNORE INTO archive.Appointments (appointment_id, student_number, lecturer_number, "
+        "starts_at, ends_at, status, cancellation_requested) "
+        "SELECT appointment_id, student_number, lecturer_number, starts_at, ends_at, status, cancellation_requested "
+        "FROM main.Appointments WHERE appointment_id IN (SELECT value FROM json_each(?))"
+    )
+
+    def __init__(self, repo, archive_db, batch_size=ARCHIVE_BATCH_SIZE):
+        self.repo = repo
+        self.reports = ReportRepo(repo.db)
+        self.archive_db = archive_db
+        self.batch_size = batch_size
+
+    def archive(self, cutoff):
+        """
+        Archive every appointment that ended at or before cutoff (epoch minutes).
+        Returns the number moved.
+        """
+        moved = 0
+        while True:
+            with self.archive_db.transaction() as conn:
+                ids = [row[0] for row in conn.execute(self.SELECT_BATCH, (cutoff, cutoff, self.batch_size))]
+                if ids:
+                    conn.execute(self.COPY, (json.dumps(ids),))
+            if not ids:
+                return moved
+            # Through the repository, so the free-slot cache forgets the days
+            with self.reports.paused():
+                moved += self.repo.delete_many(ids)
+            logging.info(f"Archived {moved} appointments so far")
+
+    def compact(self):
+        """
+        Return the hot database's free pages to the file system and refresh its statistics.
+
+        The first run on a database without incremental auto-vacuum converts it
+        with one full VACUUM; later runs only release the pages archiving freed.
+        """
+        conn = self.repo.db.connection()
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            logging.info("Enabling incremental auto-vacuum; rewriting the database once")
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+        else:
+            # Each step of the pragma frees pages; fetch to run it to completion
+            conn.execute("PRAGMA incremental_vacuum").fetchall()
+        conn.execute("PRAGMA analysis_limit = 1000")
+        conn.execute("ANALYZE main")
+        # Fold the WAL back into the database file and shrink it
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        self.archive_db.connection().execute("ANALYZE archive")
+
+archive_manager = archive_manager_for(db_path, ARCHIVE_PATH)
+history_repo = HistoryRepo(archive_manager)
+
+def main():
+    parser = argparse.ArgumentParser(description="Move past appointments into the archive database.")
+    parser.add_argument("--database", default=db_path)
+    parser.add_argument("--archive", help="Archive database (default: <database>-archive.db)")
+    parser.add_argument("--before", type=parse_date,
+                        help=f"Archive appointments that ended before this day (default: {ARCHIVE_AFTER_DAYS} days ago)")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--no-compact", action="store_true", help="Skip the incremental VACUUM and ANALYZE")
+    args = parser.parse_args()
+    configure_logging()
+
+    if args.archive is None:
+        args.archive = ARCHIVE_PATH if args.database == db_path else archive_path_for(args.database)
+    before = args.before or Date.today() - timedelta(days=ARCHIVE_AFTER_DAYS)
+    hot = ConnectionManager(args.database)
+    archive_db = archive_manager_for(args.database, args.archive)
+    try:
+        apply_migrations(hot.connection())
+        archiver = Archiver(AppointmentRepo(hot), archive_db, args.batch_size)
+        size = os.path.getsize(args.database)
+        moved = archiver.archive(epoch_minutes(before.isoformat()))
+        if not args.no_compact:
+            archiver.compact()
+        logging.info(f"Archived {moved} appointments that ended before {before}; "
+                     f"{args.database} went from {size} to {os.path.getsize(args.database)} bytes")
+        print(f"Archived {moved} appointments that ended before {before}.")
+    finally:
+        archive_db.close_all()
+        hot.close_all()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# auth_executor.py
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+class AuthExecutor:
+    """
+    Run slow authentication work (bcrypt) on a thread pool and deliver the
+    results back on the Tk thread.
+
+    Tk widgets must only be touched from the thread running the mainloop, so
+    workers never call back directly. Instead finished futures are collected by
+    an after() poll that only runs while jobs are in flight.
+    """
+
+    def __init__(self, root, max_workers=2, poll_interval=20):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="auth")
+        self.jobs = {}
+        self.polling = False
+
+    def in_flight(self, key):
+        return key in self.jobs
+
+    def submit(self, key, fn, args, on_success, on_error=None):
+        """
+        Run fn(*args) in the background and call on_success(result) on the Tk thread.
+
+        Returns False without queueing anything if a job with the same key is
+        still running, so repeated clicks do not queue a second hash.
+        """
+        if key in self.jobs:
+            logging.debug(f"Auth job {key} already in flight; ignoring duplicate.")
+            return False
+        future = self.pool.submit(fn, *args)
+        self.jobs[key] = (future, on_success, on_error)
+        if not self.polling:
+            self.polling = True
+            self.root.after(self.poll_interval, self._poll)
+        return True
+
+    def _poll(self):
+        for key, (future, on_success, on_error) in list(self.jobs.items()):
+            if not future.done():
+                continue
+            del self.jobs[key]
+            error = future.exception()
+            try:
+                if error is None:
+                    on_success(future.result())
+                elif on_error is not None:
+                    on_error(error)
+                else:
+                    logging.error(f"Auth job {key} failed: {error}")
+            except Exception as e:
+                logging.error(f"Error in callback for auth job {key}: {e}")
+        if self.jobs:
+            self.root.after(self.poll_interval, self._poll)
+        else:
+            self.polling = False
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.jobs.clear()
+
+def get_auth_executor(widget):
+    """
+    Return the AuthExecutor for the widget's toplevel window, creating it on first use.
+    """
+    root = widget.winfo_toplevel()
+    executor = getattr(root, "auth_executor", None)
+    if executor is None:
+        executor = AuthExecutor(root)
+        root.auth_executor = executor
+    return executor
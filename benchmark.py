@@ -0,0 +1,220 @@
+# benchmark.py
+
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import sys
+import time
+from datetime import date as Date, timedelta
+
+from database import ConnectionManager
+from log_config import configure_logging
+from query_stats import stats, percentile
+from reference_cache import ReferenceCache
+from repositories import UserRepo, StudentRepo, LecturerRepo, AppointmentRepo, ChangeCounterRepo, ReportRepo
+from scheduling import AvailabilityEngine, epoch_minutes, day_range
+from table_viewer import KeysetPager, PRIMARY_KEYS
+
+class Benchmark:
+    """
+    Run every query path the GUI uses against a database, without Tk.
+
+    Each case is called iterations times with keys sampled from the data.
+    Lecturers are sampled by appointment count, so the heavily loaded ones
+    are exercised as often as they are in real use. Results are returned as
+    plain dicts for JSON output.
+    """
+
+    def __init__(self, path, iterations=200, seed=0, page_size=50):
+        self.path = path
+        self.manager = ConnectionManager(path)
+        self.conn = self.manager.connection()
+        self.iterations = iterations
+        self.random = random.Random(seed)
+        self.page_size = page_size
+        self.users = UserRepo(self.manager)
+        self.students = StudentRepo(self.manager)
+        self.lecturers = LecturerRepo(self.manager)
+        # The same lookups through a reference cache, as the app makes them
+        self.cache = ReferenceCache(ChangeCounterRepo(self.manager).versions)
+        self.cached_lecturers = LecturerRepo(self.manager, cache=self.cache)
+        self.appointments = AppointmentRepo(self.manager)
+        self.reports = ReportRepo(self.manager)
+        self.availability = AvailabilityEngine(self.appointments)
+        self.results = []
+
+    def _sample(self, sql, count):
+        rows = [row[0] for row in self.conn.execute(sql)]
+        if not rows:
+            raise RuntimeError(f"No rows to sample for benchmark: {sql}")
+        return [self.random.choice(rows) for _ in range(count)]
+
+    def _weighted_lecturers(self, count):
+        rows = self.conn.execute(
+            "SELECT lecturer_number, COUNT(*) FROM Appointments GROUP BY lecturer_number"
+        ).fetchall()
+        if not rows:
+            return self._sample("SELECT number FROM Lecturers", count)
+        return self.random.choices([row[0] for row in rows], weights=[row[1] for row in rows], k=count)
+
+    def run_case(self, name, fn, args_list):
+        """
+        Time fn(*args) for every args in args_list and record latency percentiles in ms.
+        """
+        timings = []
+        rows = 0
+        for args in args_list:
+            start = time.perf_counter()
+            result = fn(*args)
+            timings.append(time.perf_counter() - start)
+            rows += len(result) if hasattr(result, "__len__") else int(result is not None)
+        timings.sort()
+        result = {
+            "case": name,
+            "calls": len(timings),
+            "rows": rows,
+            "mean_ms": round(sum(timings) / len(timings) * 1000, 4),
+            "p50_ms": round(percentile(timings, 0.50) * 1000, 4),
+            "p95_ms": round(percentile(timings, 0.95) * 1000, 4),
+            "p99_ms": round(percentile(timings, 0.99) * 1000, 4),
+            "max_ms": round(timings[-1] * 1000, 4),
+        }
+        self.results.append(result)
+        print(f"{name:<36} p50 {result['p50_ms']:>9.3f} ms  p95 {result['p95_ms']:>9.3f} ms  "
+              f"p99 {result['p99_ms']:>9.3f} ms  ({rows} rows)", file=sys.stderr)
+        return result
+
+    def run(self):
+        n = self.iterations
+        usernames = self._sample("SELECT username FROM Users", n)
+        students = self._sample("SELECT DISTINCT student_number FROM Appointments", n)
+        lecturers = self._weighted_lecturers(n)
+        days = self._sample("SELECT DISTINCT date FROM Appointments", n)
+
+        self.run_case("login", self.users.get, [(u,) for u in usernames])
+        self.run_case("view_appointments", self.appointments.for_student, [(s,) for s in students])
+        self.run_case("view_counseling_hours", self.appointments.for_lecturer, [(l,) for l in lecturers])
+        self.run_case("upcoming_appointments", self.appointments.upcoming_for_student,
+                      [(s, epoch_minutes(d)) for s, d in zip(students, days)])
+        self.run_case("upcoming_counseling_hours", self.appointments.upcoming_for_lecturer,
+                      [(l, epoch_minutes(d)) for l, d in zip(lecturers, days)])
+        self.run_case("lecturer_week", self.appointments.lecturer_between,
+                      [(l, *day_range(d, self._week_end(d))) for l, d in zip(lecturers, days)])
+        self.run_case("pending_appointments", self.appointments.pending_for_lecturer, [(l,) for l in lecturers])
+        # The cancellation list is unfiltered, so a handful of calls is representative
+        self.run_case("cancellation_requests", self.appointments.cancellation_requests, [()] * max(1, n // 20))
+        self.run_case("lecturer_choices", self.lecturers.choices, [()] * max(1, n // 20))
+        self.run_case("lecturer_choices_cached", self.cached_lecturers.choices, [()] * max(1, n // 20))
+        numbers = self._sample("SELECT number FROM Lecturers", n)
+        self.run_case("lecturer_exists", self.lecturers.exists, [(l,) for l in numbers])
+        self.run_case("lecturer_exists_cached", self.cached_lecturers.exists, [(l,) for l in numbers])
+        # What a user has typed after a few keys: a prefix of some surname
+        surnames = self._sample("SELECT surname FROM Lecturers", n)
+        self.run_case("lecturer_search", self.lecturers.search, [(s[:3],) for s in surnames])
+        surnames = self._sample("SELECT surname FROM Students", n)
+        self.run_case("student_search", self.students.search, [(s[:3],) for s in surnames])
+        self.run_case("booking_conflicts", self.appointments.conflicts,
+                      [(l, epoch_minutes(d, "10:00"), epoch_minutes(d, "10:30")) for l, d in zip(lecturers, days)])
+        self.run_case("free_slots_week", self._free_slots, [(l, d) for l, d in zip(lecturers, days)])
+        self.run_case("report_department_load", self.reports.department_load, [()] * max(1, n // 20))
+        # A quarter of weeks, as the reports screen shows by default
+        self.run_case("report_weekly_volume", self.reports.weekly_volume,
+                      [(d, (Date.fromisoformat(d) + timedelta(weeks=12)).isoformat()) for d in days[:max(1, n // 20)]])
+
+        for table in PRIMARY_KEYS:
+            pager = KeysetPager(self.conn, table, self.page_size)
+            columns = pager.columns
+            self.run_case(f"view_table:{table}:first_page", pager.first_page, [()] * n)
+            self.run_case(f"view_table:{table}:last_page", pager.last_page, [()] * n)
+            self.run_case(f"view_table:{table}:scroll_10_pages", self._scroll, [(pager, 10)] * max(1, n // 10))
+            self.run_case(f"view_table:{table}:sorted", self._sorted_page,
+                          [(pager, self.random.choice(columns)) for _ in range(max(1, n // 10))])
+            self.run_case(f"view_table:{table}:filtered", self._filtered_page,
+                          [(pager, columns[1], "a")] * max(1, n // 10))
+        return self.results
+
+    def _week_end(self, day):
+        return (Date.fromisoformat(day) + timedelta(days=6)).isoformat()
+
+    def _free_slots(self, lecturer, day):
+        # Cold cache each time: this measures the database side of the finder
+        self.availability.invalidate(lecturer)
+        return self.availability.free_slots(lecturer, day, self._week_end(day), 30)
+
+    def _scroll(self, pager, pages):
+        rows = pager.first_page()
+        fetched = len(rows)
+        for _ in range(pages - 1):
+            if not rows:
+                break
+            rows = pager.next_page(rows[-1])
+            fetched += len(rows)
+        return [None] * fetched
+
+    def _sorted_page(self, pager, column):
+        pager.set_sort(column)
+        try:
+            return pager.first_page()
+        finally:
+            pager.set_sort(pager.primary_key)
+
+    def _filtered_page(self, pager, column, text):
+        pager.set_filter(column, text)
+        try:
+            return pager.first_page()
+        finally:
+            pager.set_filter(None, "")
+
+    def environment(self):
+        counts = {table: self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                  for table in ("Users", "Students", "Lecturers", "Appointments")}
+        return {
+            "database": self.path,
+            "row_counts": counts,
+            "sqlite_version": sqlite3.sqlite_version,
+            "python_version": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": self.iterations,
+        }
+
+    def close(self):
+        self.manager.close_all()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every GUI query path without Tk.")
+    parser.add_argument("database", help="Database to benchmark, e.g. one built by datagen.py")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", default="", help="Free-form label stored with the results")
+    parser.add_argument("--output", help="Write JSON results here (default: stdout)")
+    args = parser.parse_args()
+    configure_logging()
+
+    stats.reset()
+    bench = Benchmark(args.database, args.iterations, args.seed)
+    try:
+        started = time.time()
+        cases = bench.run()
+        report = {
+            "label": args.label,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+            "duration_s": round(time.time() - started, 3),
+            "environment": bench.environment(),
+            "cases": cases,
+            # Per-statement breakdown from the instrumented connection
+            "statements": stats.snapshot(),
+        }
+    finally:
+        bench.close()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
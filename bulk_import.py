@@ -0,0 +1,341 @@
+# bulk_import.py
+
+import sqlite3
+import os
+import csv
+import json
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from log_config import configure_logging
+from migrations import apply_migrations
+from passwords import hash_password
+
+# Column layout of each roster kind. Student and lecturer rosters may also carry
+# a password column, in which case the matching Users row is created as well.
+ROSTERS = {
+    "users": {
+        "table": "Users",
+        "columns": ["username", "password", "role"],
+        "role": None,
+    },
+    "students": {
+        "table": "Students",
+        "columns": ["number", "name", "surname", "department", "year", "email", "phone"],
+        "role": "student",
+    },
+    "lecturers": {
+        "table": "Lecturers",
+        "columns": ["number", "name", "surname", "department", "email", "phone", "chair"],
+        "role": "faculty",
+    },
+}
+
+VALID_ROLES = ("admin", "student", "faculty")
+
+def hash_passwords(passwords, pool=None, workers=None):
+    """
+    Hash a list of passwords across a process pool, preserving order.
+    """
+    if not passwords:
+        return []
+    if pool is None:
+        with ProcessPoolExecutor(max_workers=workers) as own_pool:
+            return hash_passwords(passwords, own_pool, workers)
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(passwords) // (workers * 4))
+    return list(pool.map(hash_password, passwords, chunksize=chunksize))
+
+def read_roster(path, fmt):
+    """
+    Stream (row_number, record, error) tuples from a CSV or JSONL roster.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            for number, record in enumerate(csv.DictReader(f), start=1):
+                yield number, record, None
+        else:
+            number = 0
+            for line in f:
+                if not line.strip():
+                    continue
+                number += 1
+                try:
+                    record = json.loads(line)
+                    if not isinstance(record, dict):
+                        raise ValueError("expected a JSON object")
+                    yield number, record, None
+                except ValueError as e:
+                    yield number, {"raw": line.rstrip("\n")}, f"Invalid JSON: {e}"
+
+class RosterImporter:
+    """
+    Import a roster in large executemany batches.
+
+    Rows are validated and hashed up front; invalid rows go to the reject file
+    instead of aborting the import. Each group of commit_every rows is written in
+    one transaction with foreign-key checks deferred to commit time, together
+    with a checkpoint row in ImportCheckpoints recording how many input rows are
+    done, so an interrupted import resumes exactly after its last committed chunk.
+    """
+
+    def __init__(self, conn, kind, batch_size=5000, commit_every=50000, workers=None,
+                 checkpoint_name=None, rejects_path=None):
+        self.conn = conn
+        self.kind = kind
+        self.spec = ROSTERS[kind]
+        self.batch_size = batch_size
+        self.commit_every = max(commit_every, batch_size)
+        self.workers = workers or os.cpu_count() or 1
+        self.checkpoint_name = checkpoint_name
+        self.rejects_path = rejects_path
+        self.stats = {"rows_done": 0, "inserted": 0, "rejected": 0}
+        self.pending_rejects = []
+        self.chunk_lines = {}
+        # Highest rowid of the table before the open chunk; its inserts lie above it
+        self.chunk_start_rowid = 0
+
+        columns = self.spec["columns"]
+        self.insert_sql = (
+            f"INSERT INTO {self.spec['table']} ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' for _ in columns)})"
+        )
+        self.user_sql = "INSERT INTO Users (username, password, role) VALUES (?, ?, ?)"
+
+    def load_checkpoint(self):
+        if not self.checkpoint_name:
+            return 0
+        row = self.conn.execute(
+            "SELECT kind, rows_done, inserted, rejected FROM ImportCheckpoints WHERE name = ?",
+            (self.checkpoint_name,)
+        ).fetchone()
+        if row:
+            if row[0] != self.kind:
+                raise ValueError(f"Checkpoint {self.checkpoint_name} belongs to a {row[0]} import.")
+            self.stats.update(rows_done=row[1], inserted=row[2], rejected=row[3])
+            logging.info(f"Resuming {self.kind} import after row {self.stats['rows_done']}.")
+        return self.stats["rows_done"]
+
+    def save_checkpoint(self):
+        """
+        Record progress inside the open chunk transaction, so the checkpoint
+        commits or rolls back together with the rows it counts.
+        """
+        if not self.checkpoint_name:
+            return
+        self.conn.execute(
+            "INSERT INTO ImportCheckpoints (name, kind, rows_done, inserted, rejected) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET rows_done = excluded.rows_done, inserted = excluded.inserted, "
+            "rejected = excluded.rejected, updated_at = CURRENT_TIMESTAMP",
+            (self.checkpoint_name, self.kind, self.stats["rows_done"], self.stats["inserted"],
+             self.stats["rejected"])
+        )
+
+    def reject(self, number, record, reason):
+        # Never write plain-text passwords to the reject file
+        record = {key: value for key, value in record.items() if key != "password"}
+        self.pending_rejects.append((number, reason, json.dumps(record)))
+
+
+    def flush_rejects(self):
+        if self.pending_rejects and self.rejects_path:
+            new_file = not os.path.exists(self.rejects_path)
+            with open(self.rejects_path, "a", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                if new_file:
+                    writer.writerow(["row", "reason", "record"])
+                writer.writerows(self.pending_rejects)
+        self.stats["rejected"] += len(self.pending_rejects)
+        self.pending_rejects = []
+
+    def validate(self, record):
+        """
+        Return (values, password, error) for one roster record.
+        """
+        values = []
+        for column in self.spec["columns"]:
+            value = str(record.get(column) or "").strip()
+            if not value:
+                return None, None, f"Missing {column}"
+            values.append(value)
+        if self.kind == "users":
+            if values[2] not in VALID_ROLES:
+                return None, None, f"Invalid role: {values[2]}"
+            return values, values[1], None
+        password = str(record.get("password") or "").strip()
+        return values, password or None, None
+
+    def prepare(self, batch, pool):
+        """
+        Validate a batch and hash its passwords across the process pool.
+        """
+        rows = []
+        for number, record, error in batch:
+            if error is None:
+                values, password, error = self.validate(record)
+            if error is not None:
+                self.reject(number, record, error)
+                continue
+            rows.append((number, record, values, password))
+
+        hashes = iter(hash_passwords([row[3] for row in rows if row[3]], pool, self.workers))
+        prepared = []
+        for number, record, values, password in rows:
+            hashed = next(hashes) if password else None
+            if self.kind == "users":
+                values[1] = hashed
+                user = None
+            else:
+                user = (values[0], hashed, self.spec["role"]) if hashed else None
+            prepared.append((number, record, tuple(values), user))
+        return prepared
+
+    def write(self, prepared):
+        """
+        Insert a prepared batch, falling back to row-by-row inserts if it contains a bad row.
+        """
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute("SAVEPOINT batch")
+            users = [user for _, _, _, user in prepared if user]
+            if users:
+                cursor.executemany(self.user_sql, users)
+            cursor.executemany(self.insert_sql, [values for _, _, values, _ in prepared])
+            cursor.execute("RELEASE batch")
+            inserted = prepared
+        except sqlite3.Error:
+            cursor.execute("ROLLBACK TO batch")
+            cursor.execute("RELEASE batch")
+            inserted = []
+            for row in prepared:
+                number, record, values, user = row
+                try:
+                    cursor.execute("SAVEPOINT row")
+                    if user:
+                        cursor.execute(self.user_sql, user)
+                    cursor.execute(self.insert_sql, values)
+                    cursor.execute("RELEASE row")
+                    inserted.append(row)
+                except sqlite3.Error as e:
+                    cursor.execute("ROLLBACK TO row")
+                    cursor.execute("RELEASE row")
+                    self.reject(number, record, str(e))
+        for number, record, values, _ in inserted:
+            self.chunk_lines[values[0]] = (number, record)
+        self.stats["inserted"] += len(inserted)
+
+    def begin_chunk(self):
+        cursor = self.conn.cursor()
+        cursor.execute("BEGIN")
+        cursor.execute("PRAGMA defer_foreign_keys = ON")
+        self.chunk_start_rowid = cursor.execute(f"SELECT ifnull(MAX(rowid), 0) FROM {self.spec['table']}").fetchone()[0]
+
+    def remove_foreign_key_violations(self):
+        """
+        Reject rows of this chunk that reference a missing user before the
+        deferred check fails the commit. Rows committed earlier are left alone:
+        the deferred check only counts violations made in this transaction.
+        Only the chunk's rowid range is read, each row with one Users lookup,
+        so the cost does not grow with the rows already in the table.
+        """
+        if self.kind == "users":
+            return
+        table = self.spec["table"]
+        cursor = self.conn.cursor()
+        orphans = cursor.execute(
+            f"SELECT t.rowid, t.number FROM {table} t LEFT JOIN Users u ON u.username = t.number "
+            f"WHERE t.rowid > ? AND u.username IS NULL", (self.chunk_start_rowid,)
+        ).fetchall()
+        for rowid, key in orphans:
+            cursor.execute(f"DELETE FROM {table} WHERE rowid = ?", (rowid,))
+            if key in self.chunk_lines:
+                number, record = self.chunk_lines[key]
+                self.reject(number, record, f"No Users row for {key}")
+                self.stats["inserted"] -= 1
+
+    def commit_chunk(self, rows_done):
+        self.remove_foreign_key_violations()
+        self.stats["rows_done"] = rows_done
+        # Rejects are written before the commit: a crash in between repeats
+        # them in the reject file on resume rather than losing them
+        self.flush_rejects()
+        self.save_checkpoint()
+        self.conn.commit()
+        self.chunk_lines = {}
+        logging.info(f"Committed {self.kind} import through row {rows_done}.")
+
+    def run(self, path, fmt):
+        skip = self.load_checkpoint()
+        in_chunk = 0
+        rows_done = skip
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            batch = []
+            for item in read_roster(path, fmt):
+                if item[0] <= skip:
+                    continue
+                batch.append(item)
+                if len(batch) < self.batch_size:
+                    continue
+                if in_chunk == 0:
+                    self.begin_chunk()
+                self.write(self.prepare(batch, pool))
+                rows_done = batch[-1][0]
+                in_chunk += len(batch)
+                batch = []
+                if in_chunk >= self.commit_every:
+                    self.commit_chunk(rows_done)
+                    in_chunk = 0
+            if batch:
+                if in_chunk == 0:
+                    self.begin_chunk()
+                self.write(self.prepare(batch, pool))
+                rows_done = batch[-1][0]
+                in_chunk += len(batch)
+            if in_chunk:
+                self.commit_chunk(rows_done)
+        return self.stats
+
+def main():
+    # Imported here, not at the top: hashing processes that start by spawning
+    # re-import this module, and importing database opens the database
+    from database import db_path, ConnectionManager
+
+    parser = argparse.ArgumentParser(description="Bulk import a Users/Students/Lecturers roster.")
+    parser.add_argument("kind", choices=sorted(ROSTERS))
+    parser.add_argument("roster", help="Path to a .csv or .jsonl roster file")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Roster format (default: from file extension)")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--commit-every", type=int, default=50000, help="Rows per transaction and checkpoint")
+    parser.add_argument("--workers", type=int, default=None, help="Hashing processes (default: all cores)")
+    parser.add_argument("--checkpoint", help="Checkpoint name in the database (default: the roster's full path)")
+    parser.add_argument("--rejects", help="Reject file (default: <roster>.rejects.csv)")
+    parser.add_argument("--database", default=db_path)
+    args = parser.parse_args()
+    configure_logging()
+
+    fmt = args.format or ("jsonl" if args.roster.endswith((".jsonl", ".json")) else "csv")
+    manager = ConnectionManager(args.database)
+    conn = manager.connection()
+    try:
+        apply_migrations(conn)
+        importer = RosterImporter(
+            conn, args.kind,
+            batch_size=args.batch_size,
+            commit_every=args.commit_every,
+            workers=args.workers,
+            checkpoint_name=args.checkpoint or os.path.abspath(args.roster),
+            rejects_path=args.rejects or args.roster + ".rejects.csv",
+        )
+        stats = importer.run(args.roster, fmt)
+        print(f"Imported {stats['inserted']} rows, rejected {stats['rejected']} "
+              f"({stats['rows_done']} roster rows processed).")
+    except Exception as e:
+        conn.rollback()
+        logging.critical(f"Bulk import failed: {e}")
+        print(f"Bulk import failed: {e}")
+    finally:
+        manager.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# conftest.py
+
+import os
+import tempfile
+
+import pytest
+
+# database.py connects on import; keep that connection off the shipped FacultyOnSite.db
+os.environ.setdefault("FACULTYONSITE_DATABASE",
+                      os.path.join(tempfile.mkdtemp(prefix="facultyonsite-"), "FacultyOnSite.db"))
+# The cheapest work factor bcrypt accepts; the tests only need hashes to match
+os.environ.setdefault("FACULTYONSITE_BCRYPT_ROUNDS", "4")
+
+from create_database import create_tables
+from database import ConnectionManager, manager as live_manager
+from migrations import apply_migrations
+from passwords import hash_password
+
+USERS = [("admin1", "admin"), ("S1", "student"), ("S2", "student"), ("L1", "faculty"), ("L2", "faculty")]
+STUDENTS = [("S1", "Ayse", "Kaya", "Physics"), ("S2", "John", "Smith", "Mathematics")]
+LECTURERS = [("L1", "Mehmet", "Demir", "Physics"), ("L2", "Mary", "Brown", "Mathematics")]
+
+@pytest.fixture
+def db(tmp_path):
+    """
+    ConnectionManager of a fresh, fully migrated database with one admin, two
+    students (S1, S2) and two lecturers (L1, L2).
+    """
+    manager = ConnectionManager(str(tmp_path / "test.db"))
+    conn = manager.connection()
+    create_tables(conn)
+    apply_migrations(conn)
+    _seed(conn)
+    yield manager
+    manager.close_all()
+
+def _seed(conn):
+    conn.executemany("INSERT INTO Users (username, password, role) VALUES (?, 'unused', ?)", USERS)
+    conn.executemany(
+        "INSERT INTO Students (number, name, surname, department, year, email, phone) "
+        "VALUES (?, ?, ?, ?, '2', 'student@example.com', '555')", STUDENTS)
+    conn.executemany(
+        "INSERT INTO Lecturers (number, name, surname, department, email, phone, chair) "
+        "VALUES (?, ?, ?, ?, 'lecturer@example.com', '555', 'Lecturer')", LECTURERS)
+    conn.commit()
+
+@pytest.fixture(scope="session")
+def live_db():
+    """
+    The scratch database behind database.manager, which the module-level
+    repositories, write queue and service use. Seeded like db, once per run;
+    every password is "Secret@123".
+    """
+    conn = live_manager.connection()
+    create_tables(conn)
+    apply_migrations(conn)
+    _seed(conn)
+    conn.execute("UPDATE Users SET password = ?", (hash_password("Secret@123"),))
+    conn.commit()
+    return live_manager
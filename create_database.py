@@ -2,6 +2,7 @@
 
 import sqlite3
 import os
+from migrations import apply_migrations
 
 def create_tables(conn):
     cursor = conn.cursor()
@@ -75,6 +76,8 @@ def main():
     
     try:
         create_tables(conn)
+        version = apply_migrations(conn)
+        print(f"Schema is at version {version}.")
     except sqlite3.Error as e:
         print(f"An error occurred while creating tables: {e}")
     finally:
@@ -1,70 +1,179 @@
 # database.py
 
 import sqlite3
-import bcrypt
 import os
 import logging
+import threading
+from contextlib import contextmanager
+from query_stats import InstrumentedConnection
 
-# Configure logging
-logging.basicConfig(
-    filename='app.log',
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# Configure the path to the database file; the tests point it at a scratch copy
+db_path = os.environ.get("FACULTYONSITE_DATABASE", os.path.join(os.path.dirname(__file__), 'FacultyOnSite.db'))
 
-# Configure the path to the database file
-db_path = os.path.join(os.path.dirname(__file__), 'FacultyOnSite.db')
+# Prepared statements kept per connection; repositories.py issues a fixed set
+# of SQL strings, so this comfortably holds all of them.
+STATEMENT_CACHE_SIZE = 256
 
-# Establish a persistent connection to SQLite database
+# Settings applied to every connection. WAL lets readers run alongside a writer,
+# and synchronous=NORMAL is durable under WAL except on power loss.
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "foreign_keys": "ON",
+    "cache_size": -16000,
+    "mmap_size": 268435456,
+    "temp_store": "MEMORY",
+}
+
+class ConnectionManager:
+    """
+    Hand out one connection per thread, each configured with PRAGMAS.
+
+    SQLite connections must not be shared between threads that use them at the
+    same time, so every thread (GUI, auth pool, background jobs) gets its own
+    connection on first use and keeps it for its lifetime.
+    """
+
+    def __init__(self, path, pragmas=None, setup=None):
+        self.path = path
+        self.pragmas = PRAGMAS if pragmas is None else pragmas
+        # Optional setup(conn) run on every new connection, e.g. to ATTACH a database
+        self.setup = setup
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.connections = []
+
+    def _open(self):
+        # Every statement is timed per normalized SQL; see query_stats.py.
+        # A "file:" path is a URI, e.g. a read-only snapshot (snapshots.py).
+        conn = sqlite3.connect(
+            self.path, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE,
+            factory=InstrumentedConnection, uri=self.path.startswith("file:")
+        )
+
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value};")
+        if self.setup is not None:
+            self.setup(conn)
+        with self.lock:
+            self.connections.append(conn)
+        logging.debug(f"Opened connection to {self.path} for thread {threading.current_thread().name}")
+        return conn
+
+    def connection(self):
+        """
+        Return the calling thread's connection, opening it if needed.
+        """
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            self.local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self, immediate=True):
+        """
+        Run a block in a transaction on the calling thread's connection.
+
+        BEGIN IMMEDIATE takes the write lock up front so that a read-then-write
+        block cannot fail half way with SQLITE_BUSY. Nested calls use a savepoint.
+        """
+        conn = self.connection()
+        pending = self._pending()
+        if conn.in_transaction:
+            mark = len(pending)
+            conn.execute("SAVEPOINT nested")
+            try:
+                yield conn
+                conn.execute("RELEASE nested")
+            except BaseException:
+                conn.execute("ROLLBACK TO nested")
+                conn.execute("RELEASE nested")
+                del pending[mark:]
+                raise
+            return
+        del pending[:]
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            del pending[:]
+            raise
+        callbacks, pending[:] = list(pending), []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logging.error(f"Error in after-commit callback: {e}")
+
+    def _pending(self):
+        pending = getattr(self.local, "after_commit", None)
+        if pending is None:
+            pending = self.local.after_commit = []
+        return pending
+
+    def after_commit(self, callback):
+        """
+        Run callback once the calling thread's open transaction commits, or now
+        if none is open. Callbacks of a transaction or savepoint that rolls back
+        are dropped.
+        """
+        if self.connection().in_transaction:
+            self._pending().append(callback)
+        else:
+            callback()
+
+    def close_thread_connection(self):
+        """
+        Close the calling thread's connection, e.g. when a worker thread exits.
+        """
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            self.local.conn = None
+            with self.lock:
+                self.connections.remove(conn)
+            conn.close()
+
+    def close_all(self):
+        with self.lock:
+            connections, self.connections = self.connections, []
+        for conn in connections:
+            conn.close()
+        self.local = threading.local()
+
+# Establish the connection manager and the GUI thread's connection
 try:
-    db_connection = sqlite3.connect(db_path, check_same_thread=False)
+    manager = ConnectionManager(db_path)
+    db_connection = manager.connection()
     cursor = db_connection.cursor()
     logging.debug(f"Connected to database at {db_path}")
 except sqlite3.Error as e:
     logging.critical(f"Failed to connect to database: {e}")
     raise e
 
-# Enable foreign key constraints
-try:
-    cursor.execute("PRAGMA foreign_keys = ON;")
-    logging.debug("Foreign key constraints enabled.")
-except sqlite3.Error as e:
-    logging.error(f"Failed to enable foreign key constraints: {e}")
-
-def hash_password(password):
+def get_connection():
     """
-    Hash a password for storing.
+    Return the calling thread's database connection.
     """
-    try:
-        hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
-        logging.debug("Password hashed successfully.")
-        return hashed.decode('utf-8')
-    except Exception as e:
-        logging.error(f"Error hashing password: {e}")
-        raise e
-
-def check_password(password, hashed):
+    return manager.connection()
+
+def transaction(immediate=True):
     """
-    Check a hashed password against a plain text password.
+    Context manager running a block in a transaction on the calling thread's connection.
     """
-    try:
-        result = bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
-        logging.debug("Password verification result: {}".format(result))
-        return result
-    except ValueError as ve:
-        logging.error(f"Invalid salt in hashed password: {ve}")
-        return False
-    except Exception as e:
-        logging.error(f"Error checking password: {e}")
-        return False
+    return manager.transaction(immediate)
 
 def close_connection():
     """
-    Close the database connection gracefully.
+    Close every database connection gracefully.
     """
     try:
-        if db_connection:
-            db_connection.close()
-            logging.debug("Database connection closed.")
+        if manager:
+            manager.close_all()
+            logging.debug("Database connections closed.")
+
     except sqlite3.Error as e:
         logging.error(f"Error closing database connection: {e}")
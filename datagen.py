@@ -0,0 +1,193 @@
+# datagen.py
+
+import argparse
+import logging
+import os
+import random
+import sqlite3
+import time
+from datetime import date as Date, timedelta
+
+import bcrypt
+
+from create_database import create_tables
+from log_config import configure_logging
+from migrations import apply_migrations
+from scheduling import parse_time, EPOCH_ORDINAL, MINUTES_PER_DAY
+
+DEFAULT_PASSWORD = "password"
+# Working-day slots appointments are drawn from
+DAY_START, DAY_END, SLOT_MINUTES = "09:00", "17:00", 30
+# (status, weight) of generated appointments
+STATUSES = [("Scheduled", 60), ("Pending", 25), ("Cancelled", 15)]
+CANCELLATION_REQUEST_RATE = 0.05
+DEPARTMENTS = ["Computer Engineering", "Electrical Engineering", "Mathematics", "Physics",
+               "Chemistry", "Biology", "Economics", "Psychology", "History", "Architecture"]
+CHAIRS = ["Professor", "Associate Professor", "Assistant Professor", "Lecturer"]
+NAMES = ["Ali", "Ayse", "Mehmet", "Zeynep", "John", "Mary", "Ahmed", "Elif", "Can", "Deniz",
+         "Emre", "Selin", "Omar", "Lina", "Mert", "Ece", "Kerem", "Yasemin", "Burak", "Derya"]
+SURNAMES = ["Yilmaz", "Kaya", "Demir", "Sahin", "Celik", "Smith", "Brown", "Khan", "Aydin", "Ozturk",
+            "Arslan", "Dogan", "Kilic", "Aslan", "Cetin", "Kara", "Koc", "Kurt", "Ozdemir", "Polat"]
+
+def student_number(index):
+    return f"S{index:07d}"
+
+def lecturer_number(index):
+    return f"L{index:05d}"
+
+def lecturer_weights(count, skew):
+    """
+    Zipf-like cumulative weights: lecturer i gets load proportional to 1 / (i + 1) ** skew,
+    so a few lecturers carry most appointments, as in a real department.
+    """
+    cumulative = []
+    total = 0.0
+    for index in range(count):
+        total += 1.0 / (index + 1) ** skew
+        cumulative.append(total)
+    return cumulative
+
+class DataGenerator:
+    """
+    Fill a database with synthetic users, students, lecturers and appointments.
+
+    All users share one bcrypt hash of the same password, so generating 50k
+    accounts costs one hash instead of 50k. Rows are written with executemany in
+    batches, one transaction per batch.
+    """
+
+    def __init__(self, conn, seed=0, batch_size=50000, password=DEFAULT_PASSWORD):
+        self.conn = conn
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+    def _insert(self, sql, rows):
+        batch = []
+        written = 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                written += self._flush(sql, batch)
+                batch = []
+        if batch:
+            written += self._flush(sql, batch)
+        return written
+
+    def _flush(self, sql, batch):
+        with self.conn:
+            self.conn.executemany(sql, batch)
+        return len(batch)
+
+    def _person(self):
+        return self.random.choice(NAMES), self.random.choice(SURNAMES), self.random.choice(DEPARTMENTS)
+
+    def users(self, students, lecturers):
+        rows = [("admin", self.password_hash, "admin")]
+        rows += [(student_number(i), self.password_hash, "student") for i in range(students)]
+        rows += [(lecturer_number(i), self.password_hash, "faculty") for i in range(lecturers)]
+        return self._insert("INSERT OR IGNORE INTO Users (username, password, role) VALUES (?, ?, ?)", rows)
+
+    def students(self, count):
+        def rows():
+            for i in range(count):
+                number = student_number(i)
+                name, surname, department = self._person()
+                yield (number, name, surname, department, str(self.random.randint(1, 4)),
+                       f"{number.lower()}@students.example.edu", f"555{i:07d}")
+        return self._insert(
+            "INSERT OR IGNORE INTO Students (number, name, surname, department, year, email, phone) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", rows()
+        )
+
+    def lecturers(self, count):
+        def rows():
+            for i in range(count):
+                number = lecturer_number(i)
+                name, surname, department = self._person()
+                yield (number, name, surname, department, f"{number.lower()}@example.edu",
+                       f"444{i:07d}", self.random.choice(CHAIRS))
+        return self._insert(
+            "INSERT OR IGNORE INTO Lecturers (number, name, surname, department, email, phone, chair) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", rows()
+        )
+
+    def appointments(self, count, students, lecturers, first_day, days, skew):
+        cumulative = lecturer_weights(lecturers, skew)
+        slots = list(range(parse_time(DAY_START), parse_time(DAY_END), SLOT_MINUTES))
+        statuses = [status for status, _ in STATUSES]
+        status_weights = [weight for _, weight in STATUSES]
+        first = (first_day.toordinal() - EPOCH_ORDINAL) * MINUTES_PER_DAY
+
+        def rows():
+            remaining = count
+            while remaining:
+                chunk = min(remaining, self.batch_size)
+                chosen = self.random.choices(range(lecturers), cum_weights=cumulative, k=chunk)
+                chosen_status = self.random.choices(statuses, weights=status_weights, k=chunk)
+                for lecturer, status in zip(chosen, chosen_status):
+                    start = first + self.random.randrange(days) * MINUTES_PER_DAY + self.random.choice(slots)
+                    requested = int(status != "Cancelled" and self.random.random() < CANCELLATION_REQUEST_RATE)
+                    yield (student_number(self.random.randrange(students)), lecturer_number(lecturer),
+                           start, start + SLOT_MINUTES, status, requested)
+                remaining -= chunk
+        return self._insert(
+            "INSERT INTO Appointments (student_number, lecturer_number, starts_at, ends_at, "
+            "status, cancellation_requested) VALUES (?, ?, ?, ?, ?, ?)", rows()
+        )
+
+def generate(path, students=50000, lecturers=2000, appointments=2000000, skew=1.1, days=365,
+             first_day=None, seed=0, batch_size=50000):
+    """
+    Create (or extend) the database at path with the given scale and return the row counts written.
+    """
+    first_day = first_day or Date.today() - timedelta(days=days // 2)
+    conn = sqlite3.connect(path)
+    try:
+        create_tables(conn)
+        apply_migrations(conn)
+        # Generation only: the file is disposable until it is complete
+        conn.execute("PRAGMA journal_mode = MEMORY")
+        conn.execute("PRAGMA synchronous = OFF")
+        generator = DataGenerator(conn, seed=seed, batch_size=batch_size)
+        counts = {}
+        for name, step in (
+            ("users", lambda: generator.users(students, lecturers)),
+            ("students", lambda: generator.students(students)),
+            ("lecturers", lambda: generator.lecturers(lecturers)),
+            ("appointments", lambda: generator.appointments(appointments, students, lecturers, first_day, days, skew)),
+        ):
+            started = time.perf_counter()
+            counts[name] = step()
+            logging.info(f"Generated {counts[name]} {name} in {time.perf_counter() - started:.1f}s")
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA journal_mode = WAL")
+        return counts
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic FacultyOnSite database.")
+    parser.add_argument("database", help="Path of the database to create, e.g. synthetic.db")
+    parser.add_argument("--students", type=int, default=50000)
+    parser.add_argument("--lecturers", type=int, default=2000)
+    parser.add_argument("--appointments", type=int, default=2000000)
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of per-lecturer load (0 = uniform)")
+    parser.add_argument("--days", type=int, default=365, help="Number of days appointments are spread over")
+    parser.add_argument("--first-day", type=Date.fromisoformat, help="First appointment day (default: days/2 ago)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=50000)
+    args = parser.parse_args()
+    configure_logging()
+
+    if os.path.exists(args.database):
+        print(f"{args.database} exists; generated rows will be added to it.")
+    started = time.perf_counter()
+    counts = generate(
+        args.database, args.students, args.lecturers, args.appointments, args.skew,
+        args.days, args.first_day, args.seed, args.batch_size
+    )
+    print(f"Generated {counts} in {time.perf_counter() - started:.1f}s.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# list_model.py
+
+import customtkinter as ctk
+
+class ListModel:
+    """
+    Ordered rows keyed by id that report row-level changes to subscribers.
+
+    Subscribers are called as listener(kind, key, row) with kind one of
+    "insert", "update" or "remove", so a view only touches the rows that changed.
+    """
+
+    def __init__(self, key, rows=()):
+        self.key = key
+        self.rows = {key(row): row for row in rows}
+        self.listeners = []
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows.items())
+
+    def keys(self):
+        return list(self.rows)
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def _emit(self, kind, key, row):
+        for listener in self.listeners:
+            listener(kind, key, row)
+
+    def upsert(self, row):
+        key = self.key(row)
+        kind = "update" if key in self.rows else "insert"
+        if kind == "update" and self.rows[key] == row:
+            return
+        self.rows[key] = row
+        self._emit(kind, key, row)
+
+    def remove(self, keys):
+        for key in keys:
+            row = self.rows.pop(key, None)
+            if row is not None:
+                self._emit("remove", key, row)
+
+    def apply(self, rows):
+        """
+        Make the model hold exactly rows, emitting only the differences.
+        """
+        fresh = {self.key(row): row for row in rows}
+        self.remove([key for key in self.rows if key not in fresh])
+        for row in fresh.values():
+            self.upsert(row)
+
+class ListView(ctk.CTkScrollableFrame):
+    """
+    One widget per row of a ListModel.
+
+    Widgets are created, relabelled or destroyed only for the rows the model
+    reports as changed, so a change costs the same however long the list is.
+    Subclasses implement create_widget(row) and return the widget.
+    """
+
+    def __init__(self, master, model, describe, empty_text):
+        super().__init__(master)
+        self.model = model
+        self.describe = describe
+        self.widgets = {}
+        self.empty_label = ctk.CTkLabel(self, text=empty_text)
+        for key, row in model:
+            self.widgets[key] = self.create_widget(key, row)
+        self._update_empty()
+        model.subscribe(self.on_change)
+
+    def create_widget(self, key, row):
+        raise NotImplementedError
+
+    def _update_empty(self):
+        if self.widgets:
+            self.empty_label.pack_forget()
+        else:
+            self.empty_label.pack(pady=10)
+
+    def on_change(self, kind, key, row):
+        if not self.winfo_exists():
+            return
+        if kind == "insert":
+            self.widgets[key] = self.create_widget(key, row)
+        elif kind == "update":
+            self.widgets[key].configure(text=self.describe(row))
+        elif kind == "remove":
+            self.removed(key)
+            self.widgets.pop(key).destroy()
+        self._update_empty()
+
+    def removed(self, key):
+        pass
+
+class LabelListView(ListView):
+    """
+    Read-only list with one label per row.
+    """
+
+    def create_widget(self, key, row):
+        label = ctk.CTkLabel(self, text=self.describe(row))
+        label.pack(pady=5)
+        return label
+
+class CheckListView(ListView):
+    """
+    Selectable list with one checkbox per row.
+    """
+
+    def __init__(self, master, model, describe, empty_text):
+        self.selected = {}
+        super().__init__(master, model, describe, empty_text)
+
+    def create_widget(self, key, row):
+        selected = ctk.BooleanVar(value=False)
+        checkbox = ctk.CTkCheckBox(self, text=self.describe(row), variable=selected)
+        checkbox.pack(anchor="w", pady=5)
+        self.selected[key] = selected
+        return checkbox
+
+    def removed(self, key):
+        del self.selected[key]
+
+    def selected_keys(self):
+        return [key for key, selected in self.selected.items() if selected.get()]
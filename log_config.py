@@ -0,0 +1,101 @@
+# log_config.py
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+
+LOG_FILE = os.path.join(os.path.dirname(__file__), 'app.log')
+
+# Settings read from the environment by configure_logging
+LEVEL_VARIABLE = "FACULTYONSITE_LOG_LEVEL"          # DEBUG, INFO, WARNING, ... (default INFO)
+FILE_VARIABLE = "FACULTYONSITE_LOG_FILE"            # path of the log file (default app.log)
+ROTATE_VARIABLE = "FACULTYONSITE_LOG_ROTATE"        # "size" (default) or "time"
+MAX_BYTES_VARIABLE = "FACULTYONSITE_LOG_MAX_BYTES"  # size rotation threshold (default 5 MB)
+WHEN_VARIABLE = "FACULTYONSITE_LOG_WHEN"            # time rotation interval, e.g. "midnight" (default)
+BACKUPS_VARIABLE = "FACULTYONSITE_LOG_BACKUPS"      # rotated files kept (default 5)
+
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUPS = 5
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_STANDARD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener = None
+_lock = threading.Lock()
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format each record as one JSON object per line, including any extra= fields.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in _STANDARD_ATTRIBUTES and not name.startswith("_"):
+                entry[name] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def _file_handler(path):
+    backups = int(os.environ.get(BACKUPS_VARIABLE, DEFAULT_BACKUPS))
+    if os.environ.get(ROTATE_VARIABLE, "size").lower() == "time":
+        return logging.handlers.TimedRotatingFileHandler(
+            path, when=os.environ.get(WHEN_VARIABLE, "midnight"), backupCount=backups, encoding="utf-8"
+        )
+    return logging.handlers.RotatingFileHandler(
+        path, maxBytes=int(os.environ.get(MAX_BYTES_VARIABLE, DEFAULT_MAX_BYTES)),
+        backupCount=backups, encoding="utf-8"
+    )
+
+def configure_logging(path=None, level=None):
+    """
+    Route the root logger through a queue to a rotating JSON log file.
+
+    Callers only put records on an unbounded queue; a QueueListener thread does
+    the formatting and file I/O, so logging never blocks the Tk or database
+    threads. Safe to call more than once; later calls are ignored.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return _listener
+        level = level or os.environ.get(LEVEL_VARIABLE, "INFO")
+        handler = _file_handler(path or os.environ.get(FILE_VARIABLE, LOG_FILE))
+        handler.setFormatter(JsonFormatter())
+
+        log_queue = queue.SimpleQueue()
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(logging.handlers.QueueHandler(log_queue))
+        root.setLevel(level.upper() if isinstance(level, str) else level)
+
+        _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+        return _listener
+
+def stop_logging():
+    """
+    Flush queued records and stop the listener thread.
+    """
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
@@ -1,430 +1,688 @@
 # main_app.py
 
-from dbm import sqlite3
+import os
+import sqlite3
+import logging
 import customtkinter as ctk
-from tkinter import messagebox
-from database import db_connection, cursor, check_password, close_connection, hash_password
+from tkinter import messagebox, filedialog
+from datetime import date as Date, timedelta
+from database import db_connection, close_connection
+from repositories import HOT_QUERIES, report_repo
+from repositories import BookingConflictError
+from scheduling import parse_date
+from services import service, describe_error, ServiceError, AuthenticationError
+from api_client import ApiClient
+from migrations import apply_migrations, verify_query_plans
+from table_viewer import TableViewer
+from auth_executor import get_auth_executor
+from list_model import ListModel, CheckListView, LabelListView
+from type_ahead import TypeAheadPicker
+from screens import get_screen_manager
+from log_config import configure_logging
+from query_stats import write_snapshot
+from write_queue import write_queue
+from snapshots import snapshotter, snapshot_scheduler, open_snapshot
 
 # Configure CustomTkinter
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
 
-# GUI Utility Functions
-def clear_frame(frame):
-    for widget in frame.winfo_children():
-        widget.destroy()
+# Days searched by the free-slot finder in request_appointment
+FREE_SLOT_DAYS = 7
 
-def show_login(frame):
-    clear_frame(frame)
-    ctk.CTkLabel(frame, text="Faculty on Site", font=("Arial", 24)).pack(pady=20)
+# Lecturers listed on the reports screen, and its default range of weeks
+REPORT_LECTURERS = 50
+REPORT_WEEKS_BACK = 12
+REPORT_WEEKS_AHEAD = 4
 
-    username_entry = ctk.CTkEntry(frame, placeholder_text="Username", width=250)
-    username_entry.pack(pady=10)
+# With FACULTYONSITE_API_URL set (e.g. http://127.0.0.1:8765) the app is a client of
+# server.py; otherwise it runs the service layer in-process on the local database.
+API_URL = os.environ.get("FACULTYONSITE_API_URL")
+backend = ApiClient(API_URL) if API_URL else service
 
-    password_entry = ctk.CTkEntry(frame, placeholder_text="Password", show="*", width=250)
-    password_entry.pack(pady=10)
+# GUI Utility Functions
+def clear_entries(*entries):
+    for entry in entries:
+        entry.delete(0, "end")
+
+def add_decision_buttons(frame, view, handle_decision):
+    """
+    Add Accept Selected / Reject Selected / Accept All buttons for a CheckListView.
+    handle_decision(accept_ids, reject_ids) applies the batch.
+    """
+    buttons = ctk.CTkFrame(frame)
+    buttons.pack(pady=5)
+    ctk.CTkButton(buttons, text="Accept Selected", command=lambda: handle_decision(view.selected_keys(), [])).pack(side="left", padx=5)
+    ctk.CTkButton(buttons, text="Reject Selected", command=lambda: handle_decision([], view.selected_keys())).pack(side="left", padx=5)
+    ctk.CTkButton(buttons, text="Accept All", command=lambda: handle_decision(view.model.keys(), [])).pack(side="left", padx=5)
+
+def report_error(frame, session, e, context):
+    # Show a failed service call; an expired session sends the user back to login
+    messagebox.showerror("Error", describe_error(e))
+    logging.error(f"Error in {context}: {e}")
+    if session is not None and not session.valid:
+        logout(frame)
+
+def logout(frame, session=None):
+    # Show the login screen first, then drop the previous user's cached screens
+    try:
+        backend.logout(session)
+    except ServiceError as e:
+        logging.error(f"Error during logout: {e}")
+    show_login(frame)
+    get_screen_manager(frame).discard(keep=("login",))
 
-    login_error_label = ctk.CTkLabel(frame, text="", text_color="red", font=("Arial", 12))
-    login_error_label.pack(pady=5)
+def show_login(frame):
+    def build(screen):
+        ctk.CTkLabel(screen, text="Faculty on Site", font=("Arial", 24)).pack(pady=20)
+
+        username_entry = ctk.CTkEntry(screen, placeholder_text="Username", width=250)
+        username_entry.pack(pady=10)
+
+        password_entry = ctk.CTkEntry(screen, placeholder_text="Password", show="*", width=250)
+        password_entry.pack(pady=10)
+
+        login_error_label = ctk.CTkLabel(screen, text="", text_color="red", font=("Arial", 12))
+        login_error_label.pack(pady=5)
+
+        def handle_login():
+            username = username_entry.get().strip()
+            password = password_entry.get().strip()
+            logging.debug(f"Attempting login for user: {username}")
+            # bcrypt runs on the auth pool; finish_login is called back on the Tk thread
+            submitted = get_auth_executor(frame).submit(
+                "login", backend.login, (username, password), finish_login, handle_login_error
+            )
+            if submitted:
+                login_button.configure(state="disabled")
+                login_error_label.configure(text="Signing in...", text_color="gray")
+
+        def finish_login(session):
+            if not login_button.winfo_exists():
+                return
+            login_button.configure(state="normal")
+            login_error_label.configure(text="", text_color="red")
+            try:
+                # Role and profile were looked up once at login and are carried by the session
+                show_home(frame, session)
+            except Exception as e:
+                messagebox.showerror("Error", describe_error(e))
+                logging.error(f"Error during login: {e}")
+
+        def handle_login_error(e):
+            if login_button.winfo_exists():
+                login_button.configure(state="normal")
+                login_error_label.configure(text="", text_color="red")
+            if isinstance(e, AuthenticationError):
+                login_error_label.configure(text=str(e))
+                return
+            messagebox.showerror("Error", describe_error(e))
+            logging.error(f"Error during login: {e}")
+
+        login_button = ctk.CTkButton(screen, text="Login", command=handle_login)
+        login_button.pack(pady=20)
+
+        def refresh():
+            clear_entries(username_entry, password_entry)
+            login_error_label.configure(text="", text_color="red")
+        return refresh
+
+    get_screen_manager(frame).show("login", build)
+
+def show_home(frame, session):
+    # Route to the menu for the session's role
+    if session.role == "admin":
+        show_admin_menu(frame, Admin(session))
+    elif session.role == "student":
+        show_student_menu(frame, Student(session))
+    elif session.role == "faculty":
+        show_faculty_menu(frame, Faculty(session))
+    else:
+        show_main_menu(frame)
 
-    def handle_login():
-        username = username_entry.get().strip()
-        password = password_entry.get().strip()
-        print(f"Attempting login for user: {username}")  # Debugging line
-        try:
-            user = cursor.execute("SELECT * FROM Users WHERE username = ?", (username,)).fetchone()
-            print(f"User fetched: {user}")  # Debugging line
-            if user and check_password(password, user[1]):
-                role = user[2]
-                print(f"User role: {role}")  # Debugging line
-                if role == "admin":
-                    show_admin_menu(frame, Admin(username))
-                elif role == "student":
-                    show_student_menu(frame, Student(username))
-                elif role == "faculty":
-                    show_faculty_menu(frame, Faculty(username))
-                else:
-                    login_error_label.configure(text="Role not recognized.")
-            else:
-                print("Invalid username or password.")  # Debugging line
-                login_error_label.configure(text="Invalid username or password.")
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred: {e}")
-            print(f"Error during login: {e}")  # Debugging line
+# Change Password Feature
+def change_password(frame, session):
+    username = session.username
+    def build(screen):
+        ctk.CTkLabel(screen, text="Change Password", font=("Arial", 24)).pack(pady=20)
 
-    ctk.CTkButton(frame, text="Login", command=handle_login).pack(pady=20)
+        old_password_entry = ctk.CTkEntry(screen, placeholder_text="Old Password", show="*", width=250)
+        old_password_entry.pack(pady=10)
 
-# Change Password Feature
-def change_password(frame, username):
-    clear_frame(frame)
-    ctk.CTkLabel(frame, text="Change Password", font=("Arial", 24)).pack(pady=20)
+        new_password_entry = ctk.CTkEntry(screen, placeholder_text="New Password", show="*", width=250)
+        new_password_entry.pack(pady=10)
 
-    old_password_entry = ctk.CTkEntry(frame, placeholder_text="Old Password", show="*", width=250)
-    old_password_entry.pack(pady=10)
+        confirm_password_entry = ctk.CTkEntry(screen, placeholder_text="Confirm New Password", show="*", width=250)
+        confirm_password_entry.pack(pady=10)
 
-    new_password_entry = ctk.CTkEntry(frame, placeholder_text="New Password", show="*", width=250)
-    new_password_entry.pack(pady=10)
+        error_label = ctk.CTkLabel(screen, text="", text_color="red", font=("Arial", 12))
+        error_label.pack(pady=5)
 
-    confirm_password_entry = ctk.CTkEntry(frame, placeholder_text="Confirm New Password", show="*", width=250)
-    confirm_password_entry.pack(pady=10)
+        def handle_change_password():
+            old_password = old_password_entry.get().strip()
+            new_password = new_password_entry.get().strip()
+            confirm_password = confirm_password_entry.get().strip()
 
-    error_label = ctk.CTkLabel(frame, text="", text_color="red", font=("Arial", 12))
-    error_label.pack(pady=5)
+            if new_password != confirm_password:
+                error_label.configure(text="New passwords do not match.")
+                return
 
-    def handle_change_password():
-        old_password = old_password_entry.get().strip()
-        new_password = new_password_entry.get().strip()
-        confirm_password = confirm_password_entry.get().strip()
+            # Both bcrypt calls run on the auth pool; the service ends the session on success
+            submitted = get_auth_executor(frame).submit(
+                ("change_password", username), backend.change_password, (session, old_password, new_password),
+                finish_change_password, handle_change_password_error
+            )
+            if submitted:
+                change_button.configure(state="disabled")
+                error_label.configure(text="Updating password...", text_color="gray")
+
+        def finish_change_password(_):
+            if not change_button.winfo_exists():
+                return
+            change_button.configure(state="normal")
+            error_label.configure(text="", text_color="red")
+            messagebox.showinfo("Success", "Password updated successfully. Please log in again.")
+            logout(frame)
+
+        def handle_change_password_error(e):
+            if change_button.winfo_exists():
+                change_button.configure(state="normal")
+                error_label.configure(text="", text_color="red")
+            if isinstance(e, AuthenticationError) and session.valid:
+                error_label.configure(text=str(e))
+                return
+            messagebox.showerror("Error", describe_error(e))
+            logging.error(f"Error during password change: {e}")
+            if not session.valid:
+                logout(frame)
 
-        try:
-            user = cursor.execute("SELECT * FROM Users WHERE username = ?", (username,)).fetchone()
-            if user and check_password(old_password, user[1]):
-                if new_password != confirm_password:
-                    error_label.configure(text="New passwords do not match.")
-                    return
+        change_button = ctk.CTkButton(screen, text="Change Password", command=handle_change_password)
+        change_button.pack(pady=20)
+        ctk.CTkButton(screen, text="Back", command=lambda: navigate_back(session, frame)).pack(pady=10)
 
-                # Update the password
-                cursor.execute("UPDATE Users SET password = ? WHERE username = ?", (hash_password(new_password), username))
-                db_connection.commit()
-                messagebox.showinfo("Success", "Password updated successfully.")
-                # Redirect to the appropriate menu based on role
-                role = user[2]
-                if role == "admin":
-                    show_admin_menu(frame, Admin(username))
-                elif role == "student":
-                    show_student_menu(frame, Student(username))
-                elif role == "faculty":
-                    show_faculty_menu(frame, Faculty(username))
-            else:
-                error_label.configure(text="Old password is incorrect.")
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred: {e}")
-            print(f"Error during password change: {e}")  # Debugging line
+        def refresh():
+            clear_entries(old_password_entry, new_password_entry, confirm_password_entry)
+            error_label.configure(text="", text_color="red")
+        return refresh
 
-    ctk.CTkButton(frame, text="Change Password", command=handle_change_password).pack(pady=20)
-    ctk.CTkButton(frame, text="Back", command=lambda: navigate_back(username, frame)).pack(pady=10)
+    get_screen_manager(frame).show(("change_password", username), build)
 
-def navigate_back(username, frame):
-    # Determine user role to navigate back correctly
+def navigate_back(session, frame):
+    # The session already knows the role; an invalidated one has to log in again
     try:
-        user = cursor.execute("SELECT * FROM Users WHERE username = ?", (username,)).fetchone()
-        if user:
-            role = user[2]
-            if role == "admin":
-                show_admin_menu(frame, Admin(username))
-            elif role == "student":
-                show_student_menu(frame, Student(username))
-            elif role == "faculty":
-                show_faculty_menu(frame, Faculty(username))
-            else:
-                show_main_menu(frame)
+        if session.valid:
+            show_home(frame, session)
         else:
-            show_login(frame)
+            logout(frame)
     except Exception as e:
         messagebox.showerror("Error", f"An error occurred: {e}")
-        print(f"Error during navigation: {e}")  # Debugging line
+        logging.error(f"Error during navigation: {e}")
 
 # Admin Class
 class Admin:
-    def __init__(self, username):
-        self.username = username
+    def __init__(self, session):
+        self.session = session
+        self.username = session.username
 
     def approve_cancellations(self, frame):
-        clear_frame(frame)
-        ctk.CTkLabel(frame, text="Approve Cancellations", font=("Arial", 18)).pack(pady=10)
+        def build(screen):
+            ctk.CTkLabel(screen, text="Approve Cancellations", font=("Arial", 18)).pack(pady=10)
+
+            model = ListModel(lambda a: a.appointment_id, backend.cancellation_requests(self.session))
+            view = CheckListView(
+                screen, model,
+                lambda a: f"Appointment {a.appointment_id}\nStudent: {a.student_number}\nLecturer: {a.lecturer_number}",
+                "No cancellation requests to approve."
+            )
+            view.pack(fill="both", expand=True, padx=10, pady=5)
+
+            def handle_decision(approve_ids, reject_ids):
+                try:
+                    # The whole batch is applied in one transaction
+                    approved, rejected = backend.decide_cancellations(self.session, approve_ids, reject_ids)
+                    # Only the decided rows' widgets are destroyed
+                    model.remove(approve_ids + reject_ids)
+                    summary = f"{approved} cancellation(s) approved, {rejected} rejected."
+                    skipped = len(approve_ids) + len(reject_ids) - approved - rejected
+                    if skipped:
+                        summary += f"\n{skipped} request(s) were already handled."
+                    messagebox.showinfo("Success", summary)
+                except Exception as e:
+                    report_error(frame, self.session, e, "approve_cancellations")
+
+            add_decision_buttons(screen, view, handle_decision)
+            ctk.CTkButton(screen, text="Back", command=lambda: show_admin_menu(frame, self)).pack(pady=10)
+
+            def refresh():
+                model.apply(backend.cancellation_requests(self.session))
+            return refresh
 
         try:
-            requests = cursor.execute("SELECT * FROM Appointments WHERE cancellation_requested = 1").fetchall()
-            if not requests:
-                ctk.CTkLabel(frame, text="No cancellation requests to approve.").pack(pady=10)
-                ctk.CTkButton(frame, text="Back", command=lambda: show_admin_menu(frame, self)).pack(pady=20)
-                return
-
-            for appointment in requests:
-                request_text = f"Appointment {appointment[0]}\nStudent: {appointment[1]}\nLecturer: {appointment[2]}"
-                decision_label = ctk.CTkLabel(frame, text=request_text)
-                decision_label.pack(pady=5)
-
-                def handle_decision(decision, app_id=appointment[0], label=decision_label):
-                    try:
-                        if decision == "accept":
-                            cursor.execute("DELETE FROM Appointments WHERE appointment_id = ?", (app_id,))
-                        elif decision == "reject":
-                            cursor.execute("UPDATE Appointments SET cancellation_requested = 0 WHERE appointment_id = ?", (app_id,))
-                        db_connection.commit()
-                        label.destroy()
-                        messagebox.showinfo("Success", f"Appointment {app_id} {decision}ed.")
-                    except Exception as e:
-                        messagebox.showerror("Error", f"An error occurred: {e}")
-                        print(f"Error handling decision: {e}")  # Debugging line
-
-                ctk.CTkButton(frame, text="Accept", command=lambda d="accept": handle_decision(d)).pack(pady=5)
-                ctk.CTkButton(frame, text="Reject", command=lambda d="reject": handle_decision(d)).pack(pady=5)
-
-            ctk.CTkButton(frame, text="Back", command=lambda: show_admin_menu(frame, self)).pack(pady=20)
+            get_screen_manager(frame).show(("approve_cancellations", self.username), build,
+                                           watch=lambda: backend.change_versions(self.session, ["Appointments"]))
         except Exception as e:
-            messagebox.showerror("Error", f"An error occurred: {e}")
-            print(f"Error in approve_cancellations: {e}")  # Debugging line
+            report_error(frame, self.session, e, "approve_cancellations")
 
     def edit_database(self, frame):
-        clear_frame(frame)
-        ctk.CTkLabel(frame, text="Edit Database", font=("Arial", 18)).pack(pady=10)
+        def build(screen):
+            ctk.CTkLabel(screen, text="Edit Database", font=("Arial", 18)).pack(pady=10)
 
-        table_option = ctk.CTkComboBox(frame, values=["Students", "Lecturers", "Appointments"])
-        table_option.pack(pady=5)
+            def search_records(text, limit):
+                # Students and Lecturers can be looked up by name; Appointments only by ID
+                if table_option.get() == "Students":
+                    return backend.search_students(self.session, text, limit)
+                if table_option.get() == "Lecturers":
+                    return backend.search_lecturers(self.session, text, limit)
+                return []
 
-        entry_id = ctk.CTkEntry(frame, placeholder_text="ID")
-        entry_id.pack(pady=5)
+            def fill_id(record):
+                entry_id.delete(0, "end")
+                entry_id.insert(0, record.number)
 
-        entry_field = ctk.CTkEntry(frame, placeholder_text="Field to Edit")
-        entry_field.pack(pady=5)
+            table_option = ctk.CTkComboBox(screen, values=["Students", "Lecturers", "Appointments"],
+                                           command=lambda choice: picker.clear())
+            table_option.pack(pady=5)
 
-        entry_value = ctk.CTkEntry(frame, placeholder_text="New Value")
-        entry_value.pack(pady=5)
+            picker = TypeAheadPicker(screen, search_records, lambda r: f"{r.number}: {r.name} {r.surname} ({r.department})",
+                                     lambda r: r.number, on_select=fill_id, limit=8,
+                                     placeholder_text="Search by name or number")
+            picker.pack(pady=5)
 
-        def edit_table():
-            edit_option = table_option.get()
-            record_id = entry_id.get().strip()
-            field = entry_field.get().strip()
-            new_value = entry_value.get().strip()
+            entry_id = ctk.CTkEntry(screen, placeholder_text="ID")
+            entry_id.pack(pady=5)
 
-            # Validate table and field names to prevent SQL injection
-            valid_tables = {
-                "Students": ["name", "surname", "department", "year", "email", "phone"],
-                "Lecturers": ["name", "surname", "department", "email", "phone", "chair"],
-                "Appointments": ["date", "start_time", "end_time", "status", "cancellation_requested"]
-            }
+            entry_field = ctk.CTkEntry(screen, placeholder_text="Field to Edit")
+            entry_field.pack(pady=5)
 
-            if edit_option not in valid_tables:
-                messagebox.showerror("Error", "Invalid table selected.")
-                return
+            entry_value = ctk.CTkEntry(screen, placeholder_text="New Value")
+            entry_value.pack(pady=5)
 
-            if field not in valid_tables[edit_option]:
-                messagebox.showerror("Error", "Invalid field selected.")
-                return
+            def edit_table():
+                edit_option = table_option.get()
+                record_id = entry_id.get().strip()
+                field = entry_field.get().strip()
+                new_value = entry_value.get().strip()
 
-            try:
-                if edit_option == "Students":
-                    cursor.execute(f"UPDATE Students SET {field} = ? WHERE number = ?", (new_value, record_id))
-                elif edit_option == "Lecturers":
-                    cursor.execute(f"UPDATE Lecturers SET {field} = ? WHERE number = ?", (new_value, record_id))
-                elif edit_option == "Appointments":
-                    cursor.execute(f"UPDATE Appointments SET {field} = ? WHERE appointment_id = ?", (new_value, record_id))
-                db_connection.commit()
-                messagebox.showinfo("Success", f"{edit_option} table updated.")
-            except sqlite3.Error as e:
-                messagebox.showerror("Error", f"An error occurred: {e}")
-                print(f"Error in edit_database: {e}")  # Debugging line
-
-        ctk.CTkButton(frame, text="Submit", command=edit_table).pack(pady=10)
-        ctk.CTkButton(frame, text="Back", command=lambda: show_admin_menu(frame, self)).pack(pady=20)
+                try:
+                    # Table and field names are validated by the service
+                    backend.edit_record(self.session, edit_option, record_id, field, new_value)
+                    messagebox.showinfo("Success", f"{edit_option} table updated.")
+                except BookingConflictError as ce:
+                    messagebox.showerror("Time Unavailable", str(ce))
+                except (ServiceError, sqlite3.Error) as e:
+                    report_error(frame, self.session, e, "edit_database")
+
+            ctk.CTkButton(screen, text="Submit", command=edit_table).pack(pady=10)
+            ctk.CTkButton(screen, text="Back", command=lambda: show_admin_menu(frame, self)).pack(pady=20)
+
+            def refresh():
+                clear_entries(entry_id, entry_field, entry_value)
+                picker.clear()
+            return refresh
+
+        get_screen_manager(frame).show(("edit_database", self.username), build)
+
+    def diagnostics(self, frame):
+        def build(screen):
+            ctk.CTkLabel(screen, text="Diagnostics", font=("Arial", 18)).pack(pady=10)
+
+            # One row per normalized statement, slowest total time first
+            model = ListModel(lambda entry: entry["statement"], backend.query_statistics(self.session))
+            LabelListView(
+                screen, model,
+                lambda entry: (f"{entry['statement']}\n"
+                               f"{entry['count']} calls, {entry['rows']} rows, total {entry['total_ms']:.1f} ms | "
+                               f"p50 {entry['p50_ms']:.2f} p95 {entry['p95_ms']:.2f} p99 {entry['p99_ms']:.2f} ms"),
+                "No statements recorded yet."
+            ).pack(fill="both", expand=True, padx=10, pady=5)
+            cache_label = ctk.CTkLabel(screen, text="", justify="left")
+            cache_label.pack(pady=5)
+
+            def show_cache(tables):
+                lines = [f"{t['table']}: {t['hit_rate']:.1%} hits of {t['hits'] + t['misses']} lookups, "
+                         f"{t['stale']} stale, {t['evictions']} evicted, {t['entries']} cached"
+                         for t in tables]
+                cache_label.configure(text="Reference cache\n" + ("\n".join(lines) or "No lookups yet."))
+            show_cache(backend.cache_statistics(self.session))
+
+            def refresh():
+                try:
+                    model.apply(backend.query_statistics(self.session))
+                    show_cache(backend.cache_statistics(self.session))
+                except ServiceError as e:
+                    report_error(frame, self.session, e, "diagnostics")
+
+            def reset():
+                try:
+                    backend.reset_query_statistics(self.session)
+                except ServiceError as e:
+                    report_error(frame, self.session, e, "diagnostics")
+                    return
+                refresh()
+
+            def dump():
+                path = filedialog.asksaveasfilename(
+                    defaultextension=".json", initialfile="query_stats.json", filetypes=[("JSON", "*.json")]
+                )
+                if not path:
+                    return
+                try:
+                    write_snapshot(path, backend.query_statistics(self.session))
+                    messagebox.showinfo("Success", f"Statistics written to {path}.")
+                except (ServiceError, OSError) as e:
+                    report_error(frame, self.session, e, "diagnostics")
+
+            buttons = ctk.CTkFrame(screen)
+            buttons.pack(pady=5)
+            ctk.CTkButton(buttons, text="Refresh", command=refresh).pack(side="left", padx=5)
+            ctk.CTkButton(buttons, text="Reset", command=reset).pack(side="left", padx=5)
+            ctk.CTkButton(buttons, text="Dump to File", command=dump).pack(side="left", padx=5)
+            ctk.CTkButton(screen, text="Back", command=lambda: show_admin_menu(frame, self)).pack(pady=10)
+            return refresh
+
+        get_screen_manager(frame).show(("diagnostics", self.username), build)
+
+    def reports(self, frame):
+        def build(screen):
+            ctk.CTkLabel(screen, text="Reports", font=("Arial", 18)).pack(pady=10)
+
+            def counts(row):
+                return (f"{row.pending} pending, {row.scheduled} scheduled, {row.cancelled} cancelled, "
+                        f"{row.cancellation_requests} cancellation requests")
+
+            ctk.CTkLabel(screen, text="By department").pack()
+            departments = ListModel(lambda d: d.department, backend.department_load(self.session))
+            LabelListView(screen, departments, lambda d: f"{d.department} ({d.lecturers} lecturers)\n{counts(d)}",
+                          "No appointments yet.").pack(fill="both", expand=True, padx=10, pady=5)
+
+            ctk.CTkLabel(screen, text=f"Busiest {REPORT_LECTURERS} lecturers").pack()
+            lecturers = ListModel(lambda l: l.number, backend.lecturer_load(self.session)[:REPORT_LECTURERS])
+            LabelListView(screen, lecturers,
+                          lambda l: f"{l.number} {l.name or ''} {l.surname or ''} ({l.department or 'Unknown'})\n{counts(l)}",
+                          "No appointments yet.").pack(fill="both", expand=True, padx=10, pady=5)
+
+            ctk.CTkLabel(screen, text="Weekly volume").pack()
+            weeks = ctk.CTkFrame(screen)
+            weeks.pack(pady=5)
+            today = Date.today()
+            entry_first = ctk.CTkEntry(weeks, placeholder_text="First day (YYYY-MM-DD)", width=180)
+            entry_first.insert(0, (today - timedelta(weeks=REPORT_WEEKS_BACK)).isoformat())
+            entry_first.pack(side="left", padx=5)
+            entry_last = ctk.CTkEntry(weeks, placeholder_text="Last day (YYYY-MM-DD)", width=180)
+            entry_last.insert(0, (today + timedelta(weeks=REPORT_WEEKS_AHEAD)).isoformat())
+            entry_last.pack(side="left", padx=5)
+            volume = ListModel(lambda w: w.week_start, backend.weekly_volume(
+                self.session, entry_first.get().strip(), entry_last.get().strip()))
+            LabelListView(screen, volume,
+                          lambda w: (f"Week of {w.week_start}: {w.appointments} appointments, "
+                                     f"{w.cancellation_rate:.1%} with a cancellation request\n{counts(w)}"),
+                          "No appointments in these weeks.").pack(fill="both", expand=True, padx=10, pady=5)
+
+            def refresh():
+                try:
+                    departments.apply(backend.department_load(self.session))
+                    lecturers.apply(backend.lecturer_load(self.session)[:REPORT_LECTURERS])
+                    volume.apply(backend.weekly_volume(self.session, entry_first.get().strip(), entry_last.get().strip()))
+                except ServiceError as e:
+                    report_error(frame, self.session, e, "reports")
+
+            ctk.CTkButton(weeks, text="Show", command=refresh).pack(side="left", padx=5)
+            ctk.CTkButton(screen, text="Back", command=lambda: show_admin_menu(frame, self)).pack(pady=10)
+            return refresh
+
+        # The summaries are small; re-read them whenever an appointment changes
+        get_screen_manager(frame).show(("reports", self.username), build,
+                                       watch=lambda: backend.change_versions(self.session, ["Appointments"]))
 
 # Student Class
 class Student:
-    def __init__(self, username):
-        self.username = username
+    def __init__(self, session):
+        self.session = session
+        self.username = session.username
 
     def view_appointments(self, frame):
-        clear_frame(frame)
-        ctk.CTkLabel(frame, text="Your Appointments", font=("Arial", 18)).pack(pady=10)
+        def build(screen):
+            ctk.CTkLabel(screen, text="Your Appointments", font=("Arial", 18)).pack(pady=10)
 
-        try:
-            appointments = cursor.execute("SELECT * FROM Appointments WHERE student_number = ?", (self.username,)).fetchall()
-            if appointments:
-                for a in appointments:
-                    ctk.CTkLabel(frame, text=f"ID {a[0]}: {a[3]} {a[4]}-{a[5]} ({a[6]})").pack(pady=5)
-            else:
-                ctk.CTkLabel(frame, text="No appointments found.").pack(pady=10)
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred: {e}")
-            print(f"Error in view_appointments: {e}")  # Debugging line
+            # Upcoming only by default: an index seek from now instead of the whole history
+            show_past = ctk.BooleanVar(value=False)
+            ctk.CTkSwitch(screen, text="Include past appointments", variable=show_past,
+                          command=lambda: refresh()).pack(pady=5)
 
-        ctk.CTkButton(frame, text="Back", command=lambda: show_student_menu(frame, self)).pack(pady=20)
+            model = ListModel(lambda a: a.appointment_id, backend.student_appointments(self.session, upcoming=True))
+            LabelListView(
+                screen, model,
+                lambda a: f"ID {a.appointment_id}: {a.date} {a.start_time}-{a.end_time} ({a.status})",
+                "No appointments found."
+            ).pack(fill="both", expand=True, padx=10, pady=5)
 
-    def request_appointment(self, frame):
-        clear_frame(frame)
-        ctk.CTkLabel(frame, text="Request Appointment", font=("Arial", 18)).pack(pady=10)
+            ctk.CTkButton(screen, text="Back", command=lambda: show_student_menu(frame, self)).pack(pady=20)
+
+            def refresh():
+                model.apply(backend.student_appointments(self.session, upcoming=not show_past.get()))
+            return refresh
 
         try:
-            lecturers = cursor.execute("SELECT * FROM Lecturers").fetchall()
-            if not lecturers:
-                ctk.CTkLabel(frame, text="No lecturers available.").pack(pady=10)
-                ctk.CTkButton(frame, text="Back", command=lambda: show_student_menu(frame, self)).pack(pady=20)
-                return
+            get_screen_manager(frame).show(("view_appointments", self.username), build,
+                                           watch=lambda: backend.change_versions(self.session, [f"student:{self.username}"]))
+        except Exception as e:
+            report_error(frame, self.session, e, "view_appointments")
 
-            lecturer_list = ctk.CTkComboBox(frame, values=[f"{l[0]}: {l[1]} {l[2]}" for l in lecturers])
-            lecturer_list.pack(pady=5)
+    def request_appointment(self, frame):
+        def build(screen):
+            ctk.CTkLabel(screen, text="Request Appointment", font=("Arial", 18)).pack(pady=10)
+
+            # Only the top matches are fetched, however many lecturers there are
+            picker = TypeAheadPicker(screen, lambda text, limit: backend.search_lecturers(self.session, text, limit),
+                                     lambda l: f"{l.number}: {l.name} {l.surname} ({l.department})",
+                                     lambda l: l.number, limit=8, placeholder_text="Search lecturers")
+            picker.pack(pady=5)
 
-            entry_date = ctk.CTkEntry(frame, placeholder_text="Date (YYYY-MM-DD)")
+            entry_date = ctk.CTkEntry(screen, placeholder_text="Date (YYYY-MM-DD)")
             entry_date.pack(pady=5)
 
-            entry_start = ctk.CTkEntry(frame, placeholder_text="Start Time (HH:MM)")
+            entry_start = ctk.CTkEntry(screen, placeholder_text="Start Time (HH:MM)")
             entry_start.pack(pady=5)
 
-            entry_end = ctk.CTkEntry(frame, placeholder_text="End Time (HH:MM)")
+            entry_end = ctk.CTkEntry(screen, placeholder_text="End Time (HH:MM)")
             entry_end.pack(pady=5)
 
+            entry_length = ctk.CTkEntry(screen, placeholder_text="Length in minutes (default 30)")
+            entry_length.pack(pady=5)
+
+            def find_free_slots():
+                # Offer the lecturer's open slots for the week starting at the entered date
+                lecturer_id = picker.selected_key
+                if not lecturer_id:
+                    messagebox.showerror("Error", "Choose a lecturer first.")
+                    return
+                try:
+                    first_day = parse_date(entry_date.get().strip() or Date.today().isoformat())
+                    last_day = first_day + timedelta(days=FREE_SLOT_DAYS - 1)
+                    slots = backend.free_slots(
+                        self.session, lecturer_id, first_day.isoformat(), last_day.isoformat(),
+                        entry_length.get().strip() or 30
+                    )
+                except ValueError as ve:
+                    messagebox.showerror("Error", str(ve))
+                    return
+                except (ServiceError, sqlite3.Error) as e:
+                    report_error(frame, self.session, e, "find_free_slots")
+                    return
+                slot_list.configure(values=[f"{day} {start}-{end}" for day, start, end in slots])
+                slot_list.set("Choose a free slot" if slots else "No free slots this week")
+
+            def choose_slot(choice):
+                day, _, times = choice.partition(" ")
+                start, _, end = times.partition("-")
+                if not end:
+                    return
+                for entry, value in ((entry_date, day), (entry_start, start), (entry_end, end)):
+                    entry.delete(0, "end")
+                    entry.insert(0, value)
+
+            ctk.CTkButton(screen, text="Find Free Slots", command=find_free_slots).pack(pady=5)
+            slot_list = ctk.CTkComboBox(screen, values=[], command=choose_slot, width=250)
+            slot_list.pack(pady=5)
+
             def submit_request():
-                lecturer_id = lecturer_list.get().split(":")[0].strip()
+                lecturer_id = picker.selected_key
                 date = entry_date.get().strip()
                 start_time = entry_start.get().strip()
                 end_time = entry_end.get().strip()
 
-                # Basic validation
-                if not (lecturer_id and date and start_time and end_time):
-                    messagebox.showerror("Error", "All fields are required.")
-                    return
-
                 try:
-                    # Verify that lecturer exists
-                    lecturer_exists = cursor.execute("SELECT * FROM Lecturers WHERE number = ?", (lecturer_id,)).fetchone()
-                    if not lecturer_exists:
-                        messagebox.showerror("Error", "Selected lecturer does not exist.")
-                        return
-
-                    # Verify that student exists
-                    student_exists = cursor.execute("SELECT * FROM Students WHERE number = ?", (self.username,)).fetchone()
-                    if not student_exists:
-                        messagebox.showerror("Error", "Student record does not exist.")
-                        return
-
-                    cursor.execute(
-                        "INSERT INTO Appointments (student_number, lecturer_number, date, start_time, end_time, status) VALUES (?, ?, ?, ?, ?, 'Pending')",
-                        (self.username, lecturer_id, date, start_time, end_time)
-                    )
-                    db_connection.commit()
+                    # Slot format, lecturer and student record are validated by the service
+                    backend.request_appointment(self.session, lecturer_id, date, start_time, end_time)
                     messagebox.showinfo("Success", "Appointment request submitted.")
                     show_student_menu(frame, self)
+                except BookingConflictError as ce:
+                    messagebox.showerror("Time Unavailable", str(ce))
                 except sqlite3.IntegrityError as ie:
                     messagebox.showerror("Integrity Error", f"An integrity error occurred: {ie}")
-                    print(f"Integrity Error: {ie}")  # Debugging line
-                except sqlite3.Error as e:
-                    messagebox.showerror("Error", f"An error occurred: {e}")
-                    print(f"Error in request_appointment: {e}")  # Debugging line
+                    logging.error(f"Integrity Error: {ie}")
+                except (ServiceError, sqlite3.Error) as e:
+                    report_error(frame, self.session, e, "request_appointment")
+
+            ctk.CTkButton(screen, text="Submit", command=submit_request).pack(pady=10)
+            ctk.CTkButton(screen, text="Back", command=lambda: show_student_menu(frame, self)).pack(pady=20)
+
+            def refresh():
+                # Start from an empty form
+                picker.clear()
+                clear_entries(entry_date, entry_start, entry_end, entry_length)
+                slot_list.configure(values=[])
+                slot_list.set("")
 
-            ctk.CTkButton(frame, text="Submit", command=submit_request).pack(pady=10)
-            ctk.CTkButton(frame, text="Back", command=lambda: show_student_menu(frame, self)).pack(pady=20)
+            refresh()
+            return refresh
+
+        try:
+            get_screen_manager(frame).show(("request_appointment", self.username), build)
         except Exception as e:
-            messagebox.showerror("Error", f"An error occurred: {e}")
-            print(f"Error in request_appointment: {e}")  # Debugging line
+            report_error(frame, self.session, e, "request_appointment")
 
     def request_cancellation(self, frame):
-        clear_frame(frame)
-        ctk.CTkLabel(frame, text="Request Cancellation", font=("Arial", 18)).pack(pady=10)
+        def build(screen):
+            ctk.CTkLabel(screen, text="Request Cancellation", font=("Arial", 18)).pack(pady=10)
 
-        entry_id = ctk.CTkEntry(frame, placeholder_text="Appointment ID")
-        entry_id.pack(pady=5)
+            entry_id = ctk.CTkEntry(screen, placeholder_text="Appointment ID")
+            entry_id.pack(pady=5)
 
-        def submit_cancellation():
-            app_id = entry_id.get().strip()
-            if not app_id:
-                messagebox.showerror("Error", "Appointment ID is required.")
-                return
-            try:
-                cursor.execute("UPDATE Appointments SET cancellation_requested = 1 WHERE appointment_id = ? AND student_number = ?", (app_id, self.username))
-                if cursor.rowcount == 0:
-                    messagebox.showerror("Error", "No such appointment found or you are not authorized to cancel it.")
-                else:
-                    db_connection.commit()
+            def submit_cancellation():
+                app_id = entry_id.get().strip()
+                try:
+                    backend.request_cancellation(self.session, app_id)
                     messagebox.showinfo("Success", "Cancellation request submitted.")
                     show_student_menu(frame, self)
-            except sqlite3.Error as e:
-                messagebox.showerror("Error", f"An error occurred: {e}")
-                print(f"Error in submit_cancellation: {e}")  # Debugging line
+                except (ServiceError, sqlite3.Error) as e:
+                    report_error(frame, self.session, e, "submit_cancellation")
+
+            ctk.CTkButton(screen, text="Submit", command=submit_cancellation).pack(pady=10)
+            ctk.CTkButton(screen, text="Back", command=lambda: show_student_menu(frame, self)).pack(pady=20)
 
-        ctk.CTkButton(frame, text="Submit", command=submit_cancellation).pack(pady=10)
-        ctk.CTkButton(frame, text="Back", command=lambda: show_student_menu(frame, self)).pack(pady=20)
+            return lambda: clear_entries(entry_id)
+
+        get_screen_manager(frame).show(("request_cancellation", self.username), build)
 
 # Faculty Class
 class Faculty:
-    def __init__(self, username):
-        self.username = username
+    def __init__(self, session):
+        self.session = session
+        self.username = session.username
 
     def view_counseling_hours(self, frame):
-        clear_frame(frame)
-        ctk.CTkLabel(frame, text="Counseling Hours", font=("Arial", 18)).pack(pady=10)
+        def build(screen):
+            ctk.CTkLabel(screen, text="Counseling Hours", font=("Arial", 18)).pack(pady=10)
+
+            show_past = ctk.BooleanVar(value=False)
+            ctk.CTkSwitch(screen, text="Include past appointments", variable=show_past,
+                          command=lambda: refresh()).pack(pady=5)
+
+            model = ListModel(lambda a: a.appointment_id, backend.counseling_hours(self.session, upcoming=True))
+            LabelListView(
+                screen, model,
+                lambda a: f"ID {a.appointment_id}: {a.date} {a.start_time}-{a.end_time} ({a.status})",
+                "No counseling hours found."
+            ).pack(fill="both", expand=True, padx=10, pady=5)
+
+            ctk.CTkButton(screen, text="Back", command=lambda: show_faculty_menu(frame, self)).pack(pady=20)
+
+            def refresh():
+                model.apply(backend.counseling_hours(self.session, upcoming=not show_past.get()))
+            return refresh
 
         try:
-            appointments = cursor.execute("SELECT * FROM Appointments WHERE lecturer_number = ?", (self.username,)).fetchall()
-            if appointments:
-                for a in appointments:
-                    ctk.CTkLabel(frame, text=f"ID {a[0]}: {a[3]} {a[4]}-{a[5]} ({a[6]})").pack(pady=5)
-            else:
-                ctk.CTkLabel(frame, text="No counseling hours found.").pack(pady=10)
+            get_screen_manager(frame).show(("view_counseling_hours", self.username), build,
+                                           watch=lambda: backend.change_versions(self.session, [f"lecturer:{self.username}"]))
         except Exception as e:
-            messagebox.showerror("Error", f"An error occurred: {e}")
-            print(f"Error in view_counseling_hours: {e}")  # Debugging line
-
-        ctk.CTkButton(frame, text="Back", command=lambda: show_faculty_menu(frame, self)).pack(pady=20)
+            report_error(frame, self.session, e, "view_counseling_hours")
 
     def accept_or_reject_appointment(self, frame):
-        clear_frame(frame)
-        ctk.CTkLabel(frame, text="Pending Appointments", font=("Arial", 18)).pack(pady=10)
+        def build(screen):
+            ctk.CTkLabel(screen, text="Pending Appointments", font=("Arial", 18)).pack(pady=10)
+
+            model = ListModel(lambda a: a.appointment_id, backend.pending_appointments(self.session))
+            view = CheckListView(
+                screen, model,
+                lambda a: f"Appointment {a.appointment_id}\nStudent: {a.student_number}\nDate: {a.date} {a.start_time}-{a.end_time}",
+                "No pending appointments."
+            )
+            view.pack(fill="both", expand=True, padx=10, pady=5)
+
+            def handle_decision(accept_ids, reject_ids):
+                try:
+                    # The whole batch is applied in one transaction
+                    accepted, rejected = backend.decide_pending(self.session, accept_ids, reject_ids)
+                    summary = f"{accepted} appointment(s) accepted, {rejected} rejected."
+                    skipped = len(accept_ids) + len(reject_ids) - accepted - rejected
+                    if skipped:
+                        summary += f"\n{skipped} appointment(s) were no longer pending."
+                    # Drop the decided rows instead of rebuilding the screen
+                    model.remove(accept_ids + reject_ids)
+                    messagebox.showinfo("Success", summary)
+                except Exception as e:
+                    report_error(frame, self.session, e, "accept_or_reject_appointment")
+
+            add_decision_buttons(screen, view, handle_decision)
+            ctk.CTkButton(screen, text="Back", command=lambda: show_faculty_menu(frame, self)).pack(pady=10)
+
+            def refresh():
+                model.apply(backend.pending_appointments(self.session))
+            return refresh
 
         try:
-            pending_appointments = cursor.execute("SELECT * FROM Appointments WHERE status = 'Pending' AND lecturer_number = ?", (self.username,)).fetchall()
-            if not pending_appointments:
-                ctk.CTkLabel(frame, text="No pending appointments.").pack(pady=10)
-                ctk.CTkButton(frame, text="Back", command=lambda: show_faculty_menu(frame, self)).pack(pady=20)
-                return
-
-            for appointment in pending_appointments:
-                request_text = f"Appointment {appointment[0]}\nStudent: {appointment[1]}\nDate: {appointment[3]} {appointment[4]}-{appointment[5]}"
-                ctk.CTkLabel(frame, text=request_text).pack(pady=5)
-
-                def handle_decision(decision, app_id=appointment[0]):
-                    try:
-                        if decision == "accept":
-                            cursor.execute("UPDATE Appointments SET status = 'Scheduled' WHERE appointment_id = ?", (app_id,))
-                        elif decision == "reject":
-                            cursor.execute("DELETE FROM Appointments WHERE appointment_id = ?", (app_id,))
-                        db_connection.commit()
-                        messagebox.showinfo("Success", f"Appointment {app_id} {decision}ed.")
-                        self.accept_or_reject_appointment(frame)  # Refresh the list
-                    except Exception as e:
-                        messagebox.showerror("Error", f"An error occurred: {e}")
-                        print(f"Error in accept_or_reject_appointment: {e}")  # Debugging line
-
-                ctk.CTkButton(frame, text="Accept", command=lambda d="accept": handle_decision(d)).pack(pady=5)
-                ctk.CTkButton(frame, text="Reject", command=lambda d="reject": handle_decision(d)).pack(pady=5)
-
-            ctk.CTkButton(frame, text="Back", command=lambda: show_faculty_menu(frame, self)).pack(pady=20)
+            # New student requests appear while the list is open
+            get_screen_manager(frame).show(("accept_or_reject_appointment", self.username), build,
+                                           watch=lambda: backend.change_versions(self.session, [f"lecturer:{self.username}"]))
         except Exception as e:
-            messagebox.showerror("Error", f"An error occurred: {e}")
-            print(f"Error in accept_or_reject_appointment: {e}")  # Debugging line
+            report_error(frame, self.session, e, "accept_or_reject_appointment")
 
     def cancel_appointment(self, frame):
-        clear_frame(frame)
-        ctk.CTkLabel(frame, text="Cancel Appointment", font=("Arial", 18)).pack(pady=10)
+        def build(screen):
+            ctk.CTkLabel(screen, text="Cancel Appointment", font=("Arial", 18)).pack(pady=10)
 
-        entry_id = ctk.CTkEntry(frame, placeholder_text="Appointment ID")
-        entry_id.pack(pady=5)
+            entry_id = ctk.CTkEntry(screen, placeholder_text="Appointment ID")
+            entry_id.pack(pady=5)
 
-        def submit_cancellation():
-            app_id = entry_id.get().strip()
-            if not app_id:
-                messagebox.showerror("Error", "Appointment ID is required.")
-                return
-            try:
-                cursor.execute("DELETE FROM Appointments WHERE appointment_id = ? AND lecturer_number = ?", (app_id, self.username))
-                if cursor.rowcount == 0:
-                    messagebox.showerror("Error", "No such appointment found or you are not authorized to cancel it.")
-                else:
-                    db_connection.commit()
+            def submit_cancellation():
+                app_id = entry_id.get().strip()
+                try:
+                    backend.cancel_appointment(self.session, app_id)
                     messagebox.showinfo("Success", "Appointment cancelled.")
                     show_faculty_menu(frame, self)
-            except sqlite3.Error as e:
-                messagebox.showerror("Error", f"An error occurred: {e}")
-                print(f"Error in cancel_appointment: {e}")  # Debugging line
+                except (ServiceError, sqlite3.Error) as e:
+                    report_error(frame, self.session, e, "cancel_appointment")
+
+            ctk.CTkButton(screen, text="Submit", command=submit_cancellation).pack(pady=10)
+            ctk.CTkButton(screen, text="Back", command=lambda: show_faculty_menu(frame, self)).pack(pady=20)
+
+            return lambda: clear_entries(entry_id)
 
-        ctk.CTkButton(frame, text="Submit", command=submit_cancellation).pack(pady=10)
-        ctk.CTkButton(frame, text="Back", command=lambda: show_faculty_menu(frame, self)).pack(pady=20)
+        get_screen_manager(frame).show(("cancel_appointment", self.username), build)
 
 # View Table Functionality
 def view_table(frame, table_name):
-    clear_frame(frame)
-    ctk.CTkLabel(frame, text=f"View {table_name} Table", font=("Arial", 18)).pack(pady=10)
-
     # Validate table name to prevent SQL injection
     valid_tables = ["Students", "Lecturers", "Appointments"]
     if table_name not in valid_tables:
@@ -432,72 +690,110 @@ def view_table(frame, table_name):
         show_main_menu(frame)
         return
 
-    try:
-        rows = cursor.execute(f"SELECT * FROM {table_name}").fetchall()
-        if rows:
-            for row in rows:
-                ctk.CTkLabel(frame, text=str(row)).pack(pady=5)
+    # Browse a recent snapshot when there is one, so scrolling a whole table
+    # never reads alongside the live database's writers; otherwise read live
+    snapshot = snapshotter.fresh()
+
+    def build(screen):
+        ctk.CTkLabel(screen, text=f"View {table_name} Table", font=("Arial", 18)).pack(pady=10)
+        if snapshot:
+            source = f"Snapshot taken {snapshotter.taken_at(snapshot):%Y-%m-%d %H:%M}"
         else:
-            ctk.CTkLabel(frame, text="No data found.").pack(pady=10)
+            source = "Live data"
+        ctk.CTkLabel(screen, text=source, text_color="gray").pack()
+
+        # Only the visible rows exist as widgets; pages are fetched by keyset.
+        # The viewer closes its snapshot connection when the screen is destroyed.
+        if snapshot:
+            viewer = TableViewer(screen, open_snapshot(snapshot), table_name, owns_connection=True)
+        else:
+            viewer = TableViewer(screen, db_connection, table_name)
+        viewer.pack(fill="both", expand=True, padx=10)
+
+        ctk.CTkButton(screen, text="Back", command=lambda: show_main_menu(frame)).pack(pady=20)
+        return viewer.go_first
+
+    try:
+        # A newer snapshot builds a new screen; the old one ages out of the cache
+        get_screen_manager(frame).show(("view_table", table_name, snapshot), build)
     except Exception as e:
         messagebox.showerror("Error", f"An error occurred: {e}")
-        print(f"Error in view_table: {e}")  # Debugging line
-
-    ctk.CTkButton(frame, text="Back", command=lambda: show_main_menu(frame)).pack(pady=20)
+        logging.error(f"Error in view_table: {e}")
 
 # GUI Functions
 def show_main_menu(frame):
-    clear_frame(frame)
-    ctk.CTkLabel(frame, text="Main Menu", font=("Arial", 24)).pack(pady=20)
+    def build(screen):
+        ctk.CTkLabel(screen, text="Main Menu", font=("Arial", 24)).pack(pady=20)
 
-    ctk.CTkButton(frame, text="View Students Table", command=lambda: view_table(frame, "Students")).pack(pady=10)
-    ctk.CTkButton(frame, text="View Lecturers Table", command=lambda: view_table(frame, "Lecturers")).pack(pady=10)
-    ctk.CTkButton(frame, text="View Appointments Table", command=lambda: view_table(frame, "Appointments")).pack(pady=10)
-    ctk.CTkButton(frame, text="Logout", command=lambda: show_login(frame)).pack(pady=10)
-    ctk.CTkButton(frame, text="Exit", command=exit_application).pack(pady=20)
+        ctk.CTkButton(screen, text="View Students Table", command=lambda: view_table(frame, "Students")).pack(pady=10)
+        ctk.CTkButton(screen, text="View Lecturers Table", command=lambda: view_table(frame, "Lecturers")).pack(pady=10)
+        ctk.CTkButton(screen, text="View Appointments Table", command=lambda: view_table(frame, "Appointments")).pack(pady=10)
+        ctk.CTkButton(screen, text="Logout", command=lambda: logout(frame)).pack(pady=10)
+        ctk.CTkButton(screen, text="Exit", command=exit_application).pack(pady=20)
+
+    get_screen_manager(frame).show("main_menu", build)
 
 def show_admin_menu(frame, admin):
-    clear_frame(frame)
-    ctk.CTkLabel(frame, text="Admin Menu", font=("Arial", 24)).pack(pady=20)
+    def build(screen):
+        ctk.CTkLabel(screen, text="Admin Menu", font=("Arial", 24)).pack(pady=20)
+
+        ctk.CTkButton(screen, text="Approve Cancellations", command=lambda: admin.approve_cancellations(frame)).pack(pady=10)
+        ctk.CTkButton(screen, text="Edit Database", command=lambda: admin.edit_database(frame)).pack(pady=10)
+        ctk.CTkButton(screen, text="Reports", command=lambda: admin.reports(frame)).pack(pady=10)
+        ctk.CTkButton(screen, text="Diagnostics", command=lambda: admin.diagnostics(frame)).pack(pady=10)
+        ctk.CTkButton(screen, text="Change Password", command=lambda: change_password(frame, admin.session)).pack(pady=10)
+        ctk.CTkButton(screen, text="Logout", command=lambda: logout(frame, admin.session)).pack(pady=10)
+        ctk.CTkButton(screen, text="Exit", command=exit_application).pack(pady=20)
 
-    ctk.CTkButton(frame, text="Approve Cancellations", command=lambda: admin.approve_cancellations(frame)).pack(pady=10)
-    ctk.CTkButton(frame, text="Edit Database", command=lambda: admin.edit_database(frame)).pack(pady=10)
-    ctk.CTkButton(frame, text="Change Password", command=lambda: change_password(frame, admin.username)).pack(pady=10)
-    ctk.CTkButton(frame, text="Logout", command=lambda: show_login(frame)).pack(pady=10)
-    ctk.CTkButton(frame, text="Exit", command=exit_application).pack(pady=20)
+    get_screen_manager(frame).show(("admin_menu", admin.username), build)
 
 def show_student_menu(frame, student):
-    clear_frame(frame)
-    ctk.CTkLabel(frame, text="Student Menu", font=("Arial", 24)).pack(pady=20)
+    def build(screen):
+        ctk.CTkLabel(screen, text="Student Menu", font=("Arial", 24)).pack(pady=20)
+
+        ctk.CTkButton(screen, text="View Appointments", command=lambda: student.view_appointments(frame)).pack(pady=10)
+        ctk.CTkButton(screen, text="Request Appointment", command=lambda: student.request_appointment(frame)).pack(pady=10)
+        ctk.CTkButton(screen, text="Request Cancellation", command=lambda: student.request_cancellation(frame)).pack(pady=10)
+        ctk.CTkButton(screen, text="Change Password", command=lambda: change_password(frame, student.session)).pack(pady=10)
+        ctk.CTkButton(screen, text="Logout", command=lambda: logout(frame, student.session)).pack(pady=10)
+        ctk.CTkButton(screen, text="Exit", command=exit_application).pack(pady=20)
 
-    ctk.CTkButton(frame, text="View Appointments", command=lambda: student.view_appointments(frame)).pack(pady=10)
-    ctk.CTkButton(frame, text="Request Appointment", command=lambda: student.request_appointment(frame)).pack(pady=10)
-    ctk.CTkButton(frame, text="Request Cancellation", command=lambda: student.request_cancellation(frame)).pack(pady=10)
-    ctk.CTkButton(frame, text="Change Password", command=lambda: change_password(frame, student.username)).pack(pady=10)
-    ctk.CTkButton(frame, text="Logout", command=lambda: show_login(frame)).pack(pady=10)
-    ctk.CTkButton(frame, text="Exit", command=exit_application).pack(pady=20)
+    get_screen_manager(frame).show(("student_menu", student.username), build)
 
 def show_faculty_menu(frame, faculty):
-    clear_frame(frame)
-    ctk.CTkLabel(frame, text="Faculty Menu", font=("Arial", 24)).pack(pady=20)
+    def build(screen):
+        ctk.CTkLabel(screen, text="Faculty Menu", font=("Arial", 24)).pack(pady=20)
 
-    ctk.CTkButton(frame, text="View Counseling Hours", command=lambda: faculty.view_counseling_hours(frame)).pack(pady=10)
-    ctk.CTkButton(frame, text="Accept/Reject Appointments", command=lambda: faculty.accept_or_reject_appointment(frame)).pack(pady=10)
-    ctk.CTkButton(frame, text="Cancel Appointment", command=lambda: faculty.cancel_appointment(frame)).pack(pady=10)
-    ctk.CTkButton(frame, text="Change Password", command=lambda: change_password(frame, faculty.username)).pack(pady=10)
-    ctk.CTkButton(frame, text="Logout", command=lambda: show_login(frame)).pack(pady=10)
-    ctk.CTkButton(frame, text="Exit", command=exit_application).pack(pady=20)
+        ctk.CTkButton(screen, text="View Counseling Hours", command=lambda: faculty.view_counseling_hours(frame)).pack(pady=10)
+        ctk.CTkButton(screen, text="Accept/Reject Appointments", command=lambda: faculty.accept_or_reject_appointment(frame)).pack(pady=10)
+        ctk.CTkButton(screen, text="Cancel Appointment", command=lambda: faculty.cancel_appointment(frame)).pack(pady=10)
+        ctk.CTkButton(screen, text="Change Password", command=lambda: change_password(frame, faculty.session)).pack(pady=10)
+        ctk.CTkButton(screen, text="Logout", command=lambda: logout(frame, faculty.session)).pack(pady=10)
+        ctk.CTkButton(screen, text="Exit", command=exit_application).pack(pady=20)
+
+    get_screen_manager(frame).show(("faculty_menu", faculty.username), build)
 
 def exit_application():
     if messagebox.askyesno("Confirm Exit", "Are you sure you want to exit?"):
         try:
+            # Commit whatever the writer thread still holds before closing
+            snapshot_scheduler.close()
+            write_queue.close()
             close_connection()  # Close the connection using the function from database.py
         except Exception as e:
-            print(f"Error closing database connection: {e}")  # Debugging line
+            logging.error(f"Error closing database connection: {e}")
         exit()
 
 # Main Application Setup
 def main():
+    configure_logging()
+    if not API_URL:
+        # Bring the schema up to date and refuse to start if a hot query would scan
+        apply_migrations(db_connection)
+        verify_query_plans(db_connection, HOT_QUERIES)
+        report_repo.check_not_paused()
+        snapshot_scheduler.start()
+
     root = ctk.CTk()  # Initialize the CustomTkinter root window
     root.title("Appointment Management System")
     root.geometry("600x400")  # Set the window size
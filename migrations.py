@@ -0,0 +1,525 @@
+# migrations.py
+
+import sqlite3
+import re
+import logging
+
+from scheduling import normalize_slot, epoch_minutes
+
+def _legacy_slot(date, start_time, end_time, part):
+    # SQL function for migration 5: one end of a free-text slot in epoch minutes, or NULL
+    try:
+        day, start, end = normalize_slot(date, start_time, end_time)
+        return epoch_minutes(day, start if part == 0 else end)
+    except (ValueError, AttributeError):
+        return None
+
+def _convert_appointment_times(cursor):
+    """
+    Copy Appointments into Appointments_new, parsing the free-text date and
+    times. Rows that cannot be parsed are kept in AppointmentsUnparsed.
+    """
+    conn = cursor.connection
+    conn.create_function("legacy_slot", 4, _legacy_slot, deterministic=True)
+    cursor.execute("""
+        INSERT INTO Appointments_new (appointment_id, student_number, lecturer_number, starts_at, ends_at,
+                                      status, cancellation_requested)
+        SELECT appointment_id, student_number, lecturer_number, starts_at, ends_at, status, cancellation_requested
+        FROM (
+            SELECT *, legacy_slot(date, start_time, end_time, 0) AS starts_at,
+                      legacy_slot(date, start_time, end_time, 1) AS ends_at
+            FROM Appointments
+        )
+        WHERE starts_at IS NOT NULL;
+    """)
+    # Keep AUTOINCREMENT from handing out the ids of unparsed or deleted rows again
+    cursor.execute("DELETE FROM sqlite_sequence WHERE name = 'Appointments_new'")
+    cursor.execute(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'Appointments_new', seq FROM sqlite_sequence "
+        "WHERE name = 'Appointments'"
+    )
+    unparsed = cursor.execute(
+        "SELECT COUNT(*) FROM Appointments WHERE appointment_id NOT IN (SELECT appointment_id FROM Appointments_new)"
+    ).fetchone()[0]
+    if unparsed:
+        cursor.execute("""
+            CREATE TABLE AppointmentsUnparsed AS SELECT * FROM Appointments
+            WHERE appointment_id NOT IN (SELECT appointment_id FROM Appointments_new);
+        """)
+        logging.warning(f"{unparsed} appointments with unreadable dates or times were moved to AppointmentsUnparsed")
+
+# Each migration is (version, description, steps). A step is either an SQL
+# string or a callable taking a cursor. Migrations run in version order, each
+# inside its own transaction, and are recorded in the schema_version table so
+# that running the migrator again is a no-op.
+MIGRATIONS = [
+    (1, "Appointments lookup indexes", [
+        # Student.view_appointments: WHERE student_number = ?
+        """
+        CREATE INDEX IF NOT EXISTS idx_appointments_student
+        ON Appointments (student_number, date, start_time, end_time, status);
+        """,
+        # Faculty.view_counseling_hours: WHERE lecturer_number = ?
+        """
+        CREATE INDEX IF NOT EXISTS idx_appointments_lecturer
+        ON Appointments (lecturer_number, date, start_time, end_time, status);
+        """,
+        # Faculty.accept_or_reject_appointment: WHERE status = 'Pending' AND lecturer_number = ?
+        """
+        CREATE INDEX IF NOT EXISTS idx_appointments_pending
+        ON Appointments (lecturer_number, date, start_time, end_time, student_number)
+        WHERE status = 'Pending';
+        """,
+        # Admin.approve_cancellations: WHERE cancellation_requested = 1
+        """
+        CREATE INDEX IF NOT EXISTS idx_appointments_cancellation
+        ON Appointments (student_number, lecturer_number)
+        WHERE cancellation_requested = 1;
+        """,
+    ]),
+    (2, "Make the partial Appointments indexes covering", [
+        # The repositories select only the displayed columns; carrying the
+        # filtered column as well lets SQLite answer from the index alone.
+        "DROP INDEX IF EXISTS idx_appointments_pending;",
+        """
+        CREATE INDEX idx_appointments_pending
+        ON Appointments (lecturer_number, date, start_time, end_time, student_number, status)
+        WHERE status = 'Pending';
+        """,
+        "DROP INDEX IF EXISTS idx_appointments_cancellation;",
+        """
+        CREATE INDEX idx_appointments_cancellation
+        ON Appointments (student_number, lecturer_number, cancellation_requested)
+        WHERE cancellation_requested = 1;
+        """,
+    ]),
+    (3, "Per-user token epochs for revoking API session tokens", [
+        # A signed token carries the epoch it was issued at; bumping the
+        # user's epoch revokes every token issued before.
+        """
+        CREATE TABLE IF NOT EXISTS TokenEpochs (
+            username TEXT PRIMARY KEY,
+            epoch INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (username) REFERENCES Users(username) ON DELETE CASCADE
+        );
+        """,
+    ]),
+    (4, "Full-text search over Lecturers and Students", [
+        # External-content FTS5 indexes kept in sync by triggers; the
+        # type-ahead pickers query them for the top matches only.
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS LecturersSearch USING fts5 (
+            number, name, surname, department, chair,
+            content = 'Lecturers', content_rowid = 'rowid',
+            tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        );
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS LecturersSearch_insert AFTER INSERT ON Lecturers BEGIN
+            INSERT INTO LecturersSearch (rowid, number, name, surname, department, chair)
+                VALUES (new.rowid, new.number, new.name, new.surname, new.department, new.chair);
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS LecturersSearch_delete AFTER DELETE ON Lecturers BEGIN
+            INSERT INTO LecturersSearch (LecturersSearch, rowid, number, name, surname, department, chair)
+                VALUES ('delete', old.rowid, old.number, old.name, old.surname, old.department, old.chair);
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS LecturersSearch_update AFTER UPDATE ON Lecturers BEGIN
+            INSERT INTO LecturersSearch (LecturersSearch, rowid, number, name, surname, department, chair)
+                VALUES ('delete', old.rowid, old.number, old.name, old.surname, old.department, old.chair);
+            INSERT INTO LecturersSearch (rowid, number, name, surname, department, chair)
+                VALUES (new.rowid, new.number, new.name, new.surname, new.department, new.chair);
+        END;
+        """,
+        "INSERT INTO LecturersSearch (LecturersSearch) VALUES ('rebuild');",
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS StudentsSearch USING fts5 (
+            number, name, surname, department,
+            content = 'Students', content_rowid = 'rowid',
+            tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        );
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS StudentsSearch_insert AFTER INSERT ON Students BEGIN
+            INSERT INTO StudentsSearch (rowid, number, name, surname, department)
+                VALUES (new.rowid, new.number, new.name, new.surname, new.department);
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS StudentsSearch_delete AFTER DELETE ON Students BEGIN
+            INSERT INTO StudentsSearch (StudentsSearch, rowid, number, name, surname, department)
+                VALUES ('delete', old.rowid, old.number, old.name, old.surname, old.department);
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS StudentsSearch_update AFTER UPDATE ON Students BEGIN
+            INSERT INTO StudentsSearch (StudentsSearch, rowid, number, name, surname, department)
+                VALUES ('delete', old.rowid, old.number, old.name, old.surname, old.department);
+            INSERT INTO StudentsSearch (rowid, number, name, surname, department)
+                VALUES (new.rowid, new.number, new.name, new.surname, new.department);
+        END;
+        """,
+        "INSERT INTO StudentsSearch (StudentsSearch) VALUES ('rebuild');",
+    ]),
+    (5, "Store appointment times as integer epoch minutes", [
+        # starts_at/ends_at are minutes of wall-clock time since 1970-01-01.
+        # date, start_time and end_time remain as generated columns for
+        # display; they are no longer written.
+        """
+        CREATE TABLE Appointments_new (
+            appointment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_number TEXT NOT NULL,
+            lecturer_number TEXT NOT NULL,
+            starts_at INTEGER NOT NULL,
+            ends_at INTEGER NOT NULL,
+            status TEXT NOT NULL CHECK(status IN ('Pending', 'Scheduled', 'Cancelled')),
+            cancellation_requested INTEGER DEFAULT 0 CHECK(cancellation_requested IN (0,1)),
+            date TEXT GENERATED ALWAYS AS (strftime('%Y-%m-%d', starts_at * 60, 'unixepoch')) VIRTUAL,
+            start_time TEXT GENERATED ALWAYS AS (strftime('%H:%M', starts_at * 60, 'unixepoch')) VIRTUAL,
+            end_time TEXT GENERATED ALWAYS AS (strftime('%H:%M', ends_at * 60, 'unixepoch')) VIRTUAL,
+            CONSTRAINT appointment_length CHECK(starts_at >= 0 AND ends_at > starts_at AND ends_at - starts_at <= 1440),
+            FOREIGN KEY (student_number) REFERENCES Students(number) ON DELETE CASCADE,
+            FOREIGN KEY (lecturer_number) REFERENCES Lecturers(number) ON DELETE CASCADE
+        );
+        """,
+        _convert_appointment_times,
+        "DROP TABLE Appointments;",
+        "ALTER TABLE Appointments_new RENAME TO Appointments;",
+        # The indexes of migrations 1 and 2, keyed on the instants instead of the text columns
+        """
+        CREATE INDEX idx_appointments_student
+        ON Appointments (student_number, starts_at, ends_at, status);
+        """,
+        """
+        CREATE INDEX idx_appointments_lecturer
+        ON Appointments (lecturer_number, starts_at, ends_at, status);
+        """,
+        """
+        CREATE INDEX idx_appointments_pending
+        ON Appointments (lecturer_number, starts_at, ends_at, student_number, status)
+        WHERE status = 'Pending';
+        """,
+        """
+        CREATE INDEX idx_appointments_cancellation
+        ON Appointments (student_number, lecturer_number, cancellation_requested)
+        WHERE cancellation_requested = 1;
+        """,
+    ]),
+    (6, "Index appointments by start for archiving", [
+        # archive.py moves appointments that ended before a cutoff in batches
+        # of the oldest first; this keeps each batch an index seek.
+        "CREATE INDEX IF NOT EXISTS idx_appointments_starts ON Appointments (starts_at);",
+    ]),
+    (7, "Change counters for refreshing open screens", [
+        # One counter per table and one per lecturer and student with
+        # appointments, bumped by triggers in the writing transaction. Open
+        # screens compare the counters they depend on instead of re-querying.
+        """
+        CREATE TABLE IF NOT EXISTS ChangeCounters (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        ) WITHOUT ROWID;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS AppointmentsChanges_insert AFTER INSERT ON Appointments BEGIN
+            INSERT INTO ChangeCounters (name, version) VALUES ('Appointments', 1),
+                ('lecturer:' || new.lecturer_number, 1), ('student:' || new.student_number, 1)
+                ON CONFLICT (name) DO UPDATE SET version = version + 1;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS AppointmentsChanges_delete AFTER DELETE ON Appointments BEGIN
+            INSERT INTO ChangeCounters (name, version) VALUES ('Appointments', 1),
+                ('lecturer:' || old.lecturer_number, 1), ('student:' || old.student_number, 1)
+                ON CONFLICT (name) DO UPDATE SET version = version + 1;
+        END;
+        """,
+        # An update may move a row between lecturers or students; both sides are told
+        """
+        CREATE TRIGGER IF NOT EXISTS AppointmentsChanges_update AFTER UPDATE ON Appointments BEGIN
+            INSERT INTO ChangeCounters (name, version) VALUES ('Appointments', 1),
+                ('lecturer:' || old.lecturer_number, 1), ('student:' || old.student_number, 1)
+                ON CONFLICT (name) DO UPDATE SET version = version + 1;
+            INSERT INTO ChangeCounters (name, version)
+                SELECT 'lecturer:' || new.lecturer_number, 1 WHERE new.lecturer_number IS NOT old.lecturer_number
+                UNION ALL
+                SELECT 'student:' || new.student_number, 1 WHERE new.student_number IS NOT old.student_number
+                ON CONFLICT (name) DO UPDATE SET version = version + 1;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS StudentsChanges_insert AFTER INSERT ON Students BEGIN
+            INSERT INTO ChangeCounters (name, version) VALUES ('Students', 1)
+                ON CONFLICT (name) DO UPDATE SET version = version + 1;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS StudentsChanges_update AFTER UPDATE ON Students BEGIN
+            INSERT INTO ChangeCounters (name, version) VALUES ('Students', 1)
+                ON CONFLICT (name) DO UPDATE SET version = version + 1;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS StudentsChanges_delete AFTER DELETE ON Students BEGIN
+            INSERT INTO ChangeCounters (name, version) VALUES ('Students', 1)
+                ON CONFLICT (name) DO UPDATE SET version = version + 1;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS LecturersChanges_insert AFTER INSERT ON Lecturers BEGIN
+            INSERT INTO ChangeCounters (name, version) VALUES ('Lecturers', 1)
+                ON CONFLICT (name) DO UPDATE SET version = version + 1;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS LecturersChanges_update AFTER UPDATE ON Lecturers BEGIN
+            INSERT INTO ChangeCounters (name, version) VALUES ('Lecturers', 1)
+                ON CONFLICT (name) DO UPDATE SET version = version + 1;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS LecturersChanges_delete AFTER DELETE ON Lecturers BEGIN
+            INSERT INTO ChangeCounters (name, version) VALUES ('Lecturers', 1)
+                ON CONFLICT (name) DO UPDATE SET version = version + 1;
+        END;
+        """,
+    ]),
+    (8, "Change counter for cached user roles", [
+        # Password changes and rehashes leave cached roles valid, so only
+        # changes to username and role bump the counter
+        """
+        CREATE TRIGGER IF NOT EXISTS UsersChanges_insert AFTER INSERT ON Users BEGIN
+            INSERT INTO ChangeCounters (name, version) VALUES ('Users', 1)
+                ON CONFLICT (name) DO UPDATE SET version = version + 1;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS UsersChanges_update AFTER UPDATE OF username, role ON Users BEGIN
+            INSERT INTO ChangeCounters (name, version) VALUES ('Users', 1)
+                ON CONFLICT (name) DO UPDATE SET version = version + 1;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS UsersChanges_delete AFTER DELETE ON Users BEGIN
+            INSERT INTO ChangeCounters (name, version) VALUES ('Users', 1)
+                ON CONFLICT (name) DO UPDATE SET version = version + 1;
+        END;
+        """,
+    ]),
+    (9, "Report summaries of lecturer load and weekly volume", [
+        # Appointment counts per (lecturer, status) and per (week, status),
+        # kept current by triggers so the reports never group Appointments.
+        # A week is its Monday in days since 1970-01-01 (a Thursday). Counts
+        # that drop to zero are kept; the report queries skip them.
+        """
+        CREATE TABLE IF NOT EXISTS LecturerLoad (
+            lecturer_number TEXT NOT NULL,
+            status TEXT NOT NULL,
+            appointments INTEGER NOT NULL,
+            cancellation_requests INTEGER NOT NULL,
+            PRIMARY KEY (lecturer_number, status)
+        ) WITHOUT ROWID;
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS WeeklyVolume (
+            week INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            appointments INTEGER NOT NULL,
+            cancellation_requests INTEGER NOT NULL,
+            PRIMARY KEY (week, status)
+        ) WITHOUT ROWID;
+        """,
+        # Holds a row only inside the archiver's delete transaction: archived
+        # appointments leave the hot table but stay counted in the reports
+        "CREATE TABLE IF NOT EXISTS ReportsPaused (flag INTEGER PRIMARY KEY);",
+        """
+        CREATE TRIGGER IF NOT EXISTS AppointmentsReports_insert AFTER INSERT ON Appointments BEGIN
+            INSERT INTO LecturerLoad VALUES (new.lecturer_number, new.status, 1, ifnull(new.cancellation_requested, 0))
+                ON CONFLICT (lecturer_number, status) DO UPDATE SET appointments = appointments + 1,
+                    cancellation_requests = cancellation_requests + excluded.cancellation_requests;
+            INSERT INTO WeeklyVolume VALUES (new.starts_at / 1440 - (new.starts_at / 1440 + 3) % 7, new.status, 1,
+                                             ifnull(new.cancellation_requested, 0))
+                ON CONFLICT (week, status) DO UPDATE SET appointments = appointments + 1,
+                    cancellation_requests = cancellation_requests + excluded.cancellation_requests;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS AppointmentsReports_delete AFTER DELETE ON Appointments
+        WHEN NOT EXISTS (SELECT 1 FROM ReportsPaused) BEGIN
+            UPDATE LecturerLoad SET appointments = appointments - 1,
+                cancellation_requests = cancellation_requests - ifnull(old.cancellation_requested, 0)
+                WHERE lecturer_number = old.lecturer_number AND status = old.status;
+            UPDATE WeeklyVolume SET appointments = appointments - 1,
+                cancellation_requests = cancellation_requests - ifnull(old.cancellation_requested, 0)
+                WHERE week = old.starts_at / 1440 - (old.starts_at / 1440 + 3) % 7 AND status = old.status;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS AppointmentsReports_update
+        AFTER UPDATE OF lecturer_number, starts_at, status, cancellation_requested ON Appointments BEGIN
+            UPDATE LecturerLoad SET appointments = appointments - 1,
+                cancellation_requests = cancellation_requests - ifnull(old.cancellation_requested, 0)
+                WHERE lecturer_number = old.lecturer_number AND status = old.status;
+            UPDATE WeeklyVolume SET appointments = appointments - 1,
+                cancellation_requests = cancellation_requests - ifnull(old.cancellation_requested, 0)
+                WHERE week = old.starts_at / 1440 - (old.starts_at / 1440 + 3) % 7 AND status = old.status;
+            INSERT INTO LecturerLoad VALUES (new.lecturer_number, new.status, 1, ifnull(new.cancellation_requested, 0))
+                ON CONFLICT (lecturer_number, status) DO UPDATE SET appointments = appointments + 1,
+                    cancellation_requests = cancellation_requests + excluded.cancellation_requests;
+            INSERT INTO WeeklyVolume VALUES (new.starts_at / 1440 - (new.starts_at / 1440 + 3) % 7, new.status, 1,
+                                             ifnull(new.cancellation_requested, 0))
+                ON CONFLICT (week, status) DO UPDATE SET appointments = appointments + 1,
+                    cancellation_requests = cancellation_requests + excluded.cancellation_requests;
+        END;
+        """,
+        # Appointments archived before this migration are only counted after
+        # a rebuild with the archive attached: python reports.py --rebuild
+        """
+        INSERT INTO LecturerLoad
+        SELECT lecturer_number, status, COUNT(*), SUM(ifnull(cancellation_requested, 0))
+        FROM Appointments GROUP BY lecturer_number, status;
+        """,
+        """
+        INSERT INTO WeeklyVolume
+        SELECT starts_at / 1440 - (starts_at / 1440 + 3) % 7, status, COUNT(*), SUM(ifnull(cancellation_requested, 0))
+        FROM Appointments GROUP BY 1, 2;
+        """,
+    ]),
+    (10, "Keep cancelled appointments as Cancelled rows", [
+        # Approved and lecturer cancellations now set status = 'Cancelled'
+        # instead of deleting the row, so they stay in the report summaries
+        # and a rebuild counts them. Only open requests are listed for approval.
+        "DROP INDEX IF EXISTS idx_appointments_cancellation;",
+        """
+        CREATE INDEX idx_appointments_cancellation
+        ON Appointments (student_number, lecturer_number, cancellation_requested)
+        WHERE cancellation_requested = 1 AND status IN ('Pending', 'Scheduled');
+        """,
+    ]),
+    (11, "Change counter for cached token epochs", [
+        # Every API server process caches epochs; a bump by any of them, or
+        # by the GUI, must reach the others
+        """
+        CREATE TRIGGER IF NOT EXISTS TokenEpochsChanges_insert AFTER INSERT ON TokenEpochs BEGIN
+            INSERT INTO ChangeCounters (name, version) VALUES ('TokenEpochs', 1)
+                ON CONFLICT (name) DO UPDATE SET version = version + 1;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS TokenEpochsChanges_update AFTER UPDATE ON TokenEpochs BEGIN
+            INSERT INTO ChangeCounters (name, version) VALUES ('TokenEpochs', 1)
+                ON CONFLICT (name) DO UPDATE SET version = version + 1;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS TokenEpochsChanges_delete AFTER DELETE ON TokenEpochs BEGIN
+            INSERT INTO ChangeCounters (name, version) VALUES ('TokenEpochs', 1)
+                ON CONFLICT (name) DO UPDATE SET version = version + 1;
+        END;
+        """,
+    ]),
+    (12, "Bulk import checkpoints", [
+        # bulk_import.py writes a roster's progress in the transaction of the
+        # chunk it covers, so a resumed import never repeats a committed chunk
+        """
+        CREATE TABLE IF NOT EXISTS ImportCheckpoints (
+            name TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            rows_done INTEGER NOT NULL,
+            inserted INTEGER NOT NULL,
+            rejected INTEGER NOT NULL,
+            updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID;
+        """,
+    ]),
+]
+
+
+# Matches plan rows such as "SCAN Appointments" or "SCAN TABLE Appointments".
+# Scans of a (partial) index report "USING INDEX" and are allowed.
+_FULL_SCAN = re.compile(r"^SCAN (TABLE )?(\w+)( AS \w+)?$")
+
+def ensure_version_table(conn):
+    """
+    Create the schema_version table if it does not exist yet.
+    """
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+    conn.commit()
+
+def current_version(conn):
+    """
+    Return the highest applied migration version, or 0 for a fresh database.
+    """
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+def apply_migrations(conn):
+    """
+    Apply every pending migration in order. Returns the resulting schema version.
+    """
+    ensure_version_table(conn)
+    cursor = conn.cursor()
+    for version, description, steps in MIGRATIONS:
+        if version <= current_version(conn):
+            continue
+        try:
+            # Take the write lock before re-checking so that two processes
+            # starting at once do not both apply the same migration.
+            cursor.execute("BEGIN IMMEDIATE")
+            if version <= current_version(conn):
+                conn.rollback()
+                continue
+            for step in steps:
+                if callable(step):
+                    step(cursor)
+                else:
+                    cursor.execute(step)
+            cursor.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                (version, description)
+            )
+            conn.commit()
+            logging.info(f"Applied migration {version}: {description}")
+        except sqlite3.Error as e:
+            conn.rollback()
+            logging.critical(f"Migration {version} ({description}) failed: {e}")
+            raise e
+    return current_version(conn)
+
+def full_scans(conn, sql, params=()):
+    """
+    Return the tables that the query plan of sql reads with a full table scan.
+    """
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    tables = []
+    for row in plan:
+        match = _FULL_SCAN.match(row[3])
+        if match:
+            tables.append(match.group(2))
+    return tables
+
+def verify_query_plans(conn, queries):
+    """
+    Raise RuntimeError if the plan of any query in queries contains a full table scan.
+
+    queries maps a name to an (sql, params) pair.
+    """
+    failures = []
+    for name, (sql, params) in queries.items():
+        tables = full_scans(conn, sql, params)
+        if tables:
+            failures.append(f"{name} scans {', '.join(tables)}")
+    if failures:
+        message = "Query plan check failed: " + "; ".join(failures)
+        logging.critical(message)
+        raise RuntimeError(message)
+    logging.debug(f"Query plan check passed for {len(queries)} queries.")
@@ -0,0 +1,51 @@
+# passwords.py
+
+import bcrypt
+import logging
+import os
+from query_stats import stats
+
+# Password hashing. Kept out of database.py so that the bulk importer's hashing
+# processes import bcrypt alone and never open the database.
+
+# bcrypt work factor for new hashes; existing hashes at another cost are
+# rehashed on the next successful login (see needs_rehash)
+BCRYPT_ROUNDS = int(os.environ.get("FACULTYONSITE_BCRYPT_ROUNDS", 12))
+
+def hash_password(password):
+    """
+    Hash a password for storing.
+    """
+    try:
+        with stats.timed("bcrypt.hashpw"):
+            hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS))
+        logging.debug("Password hashed successfully.")
+        return hashed.decode('utf-8')
+    except Exception as e:
+        logging.error(f"Error hashing password: {e}")
+        raise e
+
+def needs_rehash(hashed):
+    """
+    Return True if a stored hash was made with a different work factor than BCRYPT_ROUNDS.
+    """
+    try:
+        return int(hashed.split('$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+def check_password(password, hashed):
+    """
+    Check a hashed password against a plain text password.
+    """
+    try:
+        with stats.timed("bcrypt.checkpw"):
+            result = bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+        logging.debug("Password verification result: {}".format(result))
+        return result
+    except ValueError as ve:
+        logging.error(f"Invalid salt in hashed password: {ve}")
+        return False
+    except Exception as e:
+        logging.error(f"Error checking password: {e}")
+        return False
@@ -0,0 +1,247 @@
+# query_stats.py
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+
+# Statements slower than this are logged with their query plan
+SLOW_QUERY_MS = float(os.environ.get("FACULTYONSITE_SLOW_QUERY_MS", 100))
+# Latency samples kept per statement for the percentiles
+SAMPLES_PER_STATEMENT = 2048
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """
+    Reduce a statement to its shape: literals become ?, IN lists collapse to (?...)
+    and whitespace is squeezed, so calls differing only in values share one entry.
+    """
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("(?...)", sql)
+    return _SPACE.sub(" ", sql).strip().rstrip(";")
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+class StatementStats:
+    __slots__ = ("count", "rows", "total", "maximum", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.rows = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.samples = deque(maxlen=SAMPLES_PER_STATEMENT)
+
+class QueryStats:
+    """
+    Count, rows and latency of every statement run through an InstrumentedConnection,
+    aggregated per normalized SQL.
+
+    Percentiles are computed over the most recent SAMPLES_PER_STATEMENT calls of
+    each statement. Non-SQL work such as bcrypt can be recorded with timed().
+    """
+
+    def __init__(self, slow_ms=SLOW_QUERY_MS):
+        self.slow_ms = slow_ms
+        self.statements = {}
+        self.lock = threading.Lock()
+
+    def record(self, key, seconds, rows):
+        with self.lock:
+            entry = self.statements.get(key)
+            if entry is None:
+                entry = self.statements[key] = StatementStats()
+            entry.count += 1
+            entry.rows += rows
+            entry.total += seconds
+            entry.maximum = max(entry.maximum, seconds)
+            entry.samples.append(seconds)
+
+    @contextmanager
+    def timed(self, name):
+        """
+        Record the duration of a block under name, e.g. "bcrypt.checkpw".
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, 0)
+
+    def snapshot(self):
+        """
+        Return one dict per statement, slowest total time first. Times are in milliseconds.
+        """
+        with self.lock:
+            items = [(key, entry.count, entry.rows, entry.total, entry.maximum, sorted(entry.samples))
+                     for key, entry in self.statements.items()]
+        result = []
+        for key, count, rows, total, maximum, samples in items:
+            result.append({
+                "statement": key,
+                "count": count,
+                "rows": rows,
+                "total_ms": round(total * 1000, 3),
+                "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+                "p95_ms": round(percentile(samples, 0.95) * 1000, 3),
+                "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+                "max_ms": round(maximum * 1000, 3),
+            })
+        result.sort(key=lambda entry: entry["total_ms"], reverse=True)
+        return result
+
+    def reset(self):
+        with self.lock:
+            self.statements.clear()
+
+    def dump(self, path):
+        """
+        Write the snapshot to path as JSON and return the path.
+        """
+        return write_snapshot(path, self.snapshot())
+
+    def slow(self, conn, sql, params, seconds):
+        """
+        Log a statement that exceeded slow_ms together with its EXPLAIN QUERY PLAN.
+        """
+        plan = None
+        if sql.lstrip().upper().startswith(_EXPLAINABLE):
+            try:
+                # A plain cursor, so the EXPLAIN itself is not instrumented
+                rows = sqlite3.Cursor(conn).execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+                plan = [row[3] for row in rows]
+            except sqlite3.Error as e:
+                plan = [f"unavailable: {e}"]
+        logging.warning(
+            f"Slow query ({seconds * 1000:.1f} ms): {normalize_sql(sql)}",
+            extra={"duration_ms": round(seconds * 1000, 3), "query_plan": plan},
+        )
+
+def write_snapshot(path, snapshot):
+    """
+    Write a snapshot (e.g. one fetched from the API server) to path as JSON.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "statements": snapshot}, f, indent=2)
+    logging.info(f"Query statistics written to {path}")
+    return path
+
+stats = QueryStats()
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Cursor that times each statement, including fetching its rows.
+
+    A statement's entry is recorded once its rows are exhausted, the cursor is
+    reused or closed; until then fetch time and row counts accumulate.
+    """
+
+    _pending = None
+
+    def _flush(self):
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        sql, params, seconds, rows = pending
+        stats.record(normalize_sql(sql), seconds, rows)
+        if seconds * 1000 >= stats.slow_ms:
+            stats.slow(self.connection, sql, params, seconds)
+
+    def _run(self, method, sql, params, first_params):
+        self._flush()
+        start = time.perf_counter()
+        try:
+            method(sql, params)
+        finally:
+            elapsed = time.perf_counter() - start
+            if self.description is None:
+                self._pending = [sql, first_params, elapsed, max(self.rowcount, 0)]
+                self._flush()
+            else:
+                self._pending = [sql, first_params, elapsed, 0]
+        return self
+
+    def execute(self, sql, params=()):
+        return self._run(super().execute, sql, params, params)
+
+    def executemany(self, sql, params_seq):
+        params_seq = list(params_seq)
+        return self._run(super().executemany, sql, params_seq, params_seq[0] if params_seq else ())
+
+    def _fetched(self, start, rows, done):
+        pending = self._pending
+        if pending is not None:
+            pending[2] += time.perf_counter() - start
+            pending[3] += rows
+            if done:
+                self._flush()
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(start, len(rows), not rows)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows), True)
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(start, 0, True)
+            raise
+        self._fetched(start, 1, False)
+        return row
+
+    def close(self):
+        self._flush()
+        super().close()
+
+    def __del__(self):
+        # Most one-row lookups never exhaust their cursor; record them when it is dropped
+        try:
+            self._flush()
+        except Exception:
+            pass
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    Connection whose cursors, including those behind execute() shortcuts, are InstrumentedCursors.
+    """
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, params_seq):
+        return self.cursor().executemany(sql, params_seq)
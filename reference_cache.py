@@ -0,0 +1,104 @@
+# reference_cache.py
+
+import os
+import threading
+from collections import OrderedDict
+
+# Entries kept across all tables; beyond this the least recently used is dropped
+REFERENCE_CACHE_SIZE = int(os.environ.get("FACULTYONSITE_REFERENCE_CACHE_SIZE", 4096))
+
+class CacheStats:
+    __slots__ = ("hits", "misses", "stale", "evictions")
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+class ReferenceCache:
+    """
+    LRU cache of reference lookups (lecturers, students, user roles, token
+    epochs), each entry stamped with the generation of the table it was read from.
+
+    versions(tables) returns {table: generation}: the change counters that the
+    triggers of migrations 7, 8 and 11 bump on every write to Users, Students,
+    Lecturers and TokenEpochs, whether it came from Admin.edit_database, the
+    API server or another process. An entry is served only while its table is still at the
+    generation it was loaded under, so no write has to invalidate anything.
+    """
+
+    def __init__(self, versions, max_entries=REFERENCE_CACHE_SIZE):
+        self.versions = versions
+        self.max_entries = max_entries
+        # (table, key) -> (generation, value), least recently used first
+        self.entries = OrderedDict()
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def _stats(self, table):
+        entry = self.stats.get(table)
+        if entry is None:
+            entry = self.stats[table] = CacheStats()
+        return entry
+
+    def get(self, table, key, load):
+        """
+        Return the value cached for key in table, calling load() when it is
+        missing or was loaded under an older generation.
+        """
+        generation = self.versions([table])[table]
+        with self.lock:
+            stats = self._stats(table)
+            entry = self.entries.get((table, key))
+            if entry is not None:
+                if entry[0] == generation:
+                    self.entries.move_to_end((table, key))
+                    stats.hits += 1
+                    return entry[1]
+                stats.stale += 1
+            stats.misses += 1
+        # The generation was read before the rows, so a write committing while
+        # they load leaves this entry stale on the next lookup, never wrong
+        value = load()
+        with self.lock:
+            self.entries[(table, key)] = (generation, value)
+            self.entries.move_to_end((table, key))
+            while len(self.entries) > self.max_entries:
+                (evicted, _), _ = self.entries.popitem(last=False)
+                self._stats(evicted).evictions += 1
+        return value
+
+    def snapshot(self):
+        """
+        Return one dict per table with its entry count, hits, misses (stale
+        entries included), evictions and hit rate.
+        """
+        with self.lock:
+            sizes = {}
+            for table, _ in self.entries:
+                sizes[table] = sizes.get(table, 0) + 1
+            result = []
+            for table, stats in sorted(self.stats.items()):
+                lookups = stats.hits + stats.misses
+                result.append({
+                    "table": table,
+                    "entries": sizes.get(table, 0),
+                    "hits": stats.hits,
+                    "misses": stats.misses,
+                    "stale": stats.stale,
+                    "evictions": stats.evictions,
+                    "hit_rate": round(stats.hits / lookups, 4) if lookups else 0.0,
+                })
+        return result
+
+    def reset_statistics(self):
+        with self.lock:
+            self.stats.clear()
+
+    def clear(self):
+        """
+        Drop every entry, e.g. before a benchmark run that must start cold.
+        """
+        with self.lock:
+            self.entries.clear()
@@ -0,0 +1,71 @@
+# reports.py
+
+import argparse
+import logging
+import os
+from datetime import date as Date, timedelta
+
+from archive import ARCHIVE_PATH, archive_manager_for, archive_path_for
+from database import ConnectionManager, db_path
+from log_config import configure_logging
+from migrations import apply_migrations
+from repositories import ReportRepo
+from snapshots import Snapshotter, snapshot_manager_for, SNAPSHOT_DIR
+
+def print_reports(repo, weeks):
+    today = Date.today()
+    print("Department              Lecturers  Pending  Scheduled  Cancelled  Cancel requests")
+    for d in repo.department_load():
+        print(f"{d.department:<24}{d.lecturers:>9}{d.pending:>9}{d.scheduled:>11}{d.cancelled:>11}"
+              f"{d.cancellation_requests:>17}")
+    print()
+    print("Week of       Appointments  Pending  Scheduled  Cancelled  Cancel request rate")
+    for w in repo.weekly_volume((today - timedelta(weeks=weeks)).isoformat(), today.isoformat()):
+        print(f"{w.week_start:<14}{w.appointments:>12}{w.pending:>9}{w.scheduled:>11}{w.cancelled:>11}"
+              f"{w.cancellation_rate:>20.1%}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the appointment reports or rebuild their summary tables.")
+    parser.add_argument("--database", default=db_path)
+    parser.add_argument("--archive", help="Archive database (default: <database>-archive.db)")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Recount the summaries from Appointments and the archive, e.g. after a repair")
+    parser.add_argument("--weeks", type=int, default=12, help="Weeks of volume to print")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="Print from the latest snapshot of the database instead of the live file")
+    args = parser.parse_args()
+    configure_logging()
+
+    if args.snapshot:
+        if args.rebuild:
+            parser.error("--rebuild writes to the live database and cannot be combined with --snapshot")
+        latest = Snapshotter(args.database, SNAPSHOT_DIR).latest()
+        if latest is None:
+            parser.error(f"No snapshot of {args.database} in {SNAPSHOT_DIR}; take one with: python snapshots.py take")
+        print(f"Snapshot taken {Snapshotter.taken_at(latest):%Y-%m-%d %H:%M:%S}")
+        db = snapshot_manager_for(latest)
+        try:
+            print_reports(ReportRepo(db), args.weeks)
+        finally:
+            db.close_all()
+        return
+
+    if args.archive is None:
+        args.archive = ARCHIVE_PATH if args.database == db_path else archive_path_for(args.database)
+    if args.rebuild and os.path.exists(args.archive):
+        db = archive_manager_for(args.database, args.archive)
+    else:
+        db = ConnectionManager(args.database)
+    try:
+        apply_migrations(db.connection())
+        repo = ReportRepo(db)
+        if args.rebuild:
+            counted = repo.rebuild()
+            logging.info(f"Rebuilt the report summaries from {counted} appointments")
+            print(f"Rebuilt the report summaries from {counted} appointments.")
+        print_reports(repo, args.weeks)
+    finally:
+        db.close_all()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,813 @@
+# repositories.py
+
+import json
+import logging
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from database import manager
+from reference_cache import ReferenceCache
+from scheduling import IntervalTree, AvailabilityEngine, MAX_APPOINTMENT_MINUTES, MINUTES_PER_DAY
+from scheduling import epoch_minutes, from_epoch_minutes, parse_time, day_range
+
+
+# Results returned by the type-ahead searches
+SEARCH_LIMIT = 20
+
+def fts_query(text):
+    """
+    Turn free text typed into a picker into an FTS5 query: every word must
+    match the start of some indexed term. Quoting each word keeps FTS5 syntax
+    characters in the input from being interpreted.
+    """
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", text))
+
+class Record:
+    """
+    Compact row object. Subclasses list their columns in __slots__; columns a
+    query did not select are left as None.
+    """
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    @classmethod
+    def from_row(cls, columns, row):
+        record = cls.__new__(cls)
+        for name in cls.__slots__:
+            setattr(record, name, None)
+        for name, value in zip(columns, row):
+            setattr(record, name, value)
+        return record
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+class UserRecord(Record):
+    __slots__ = ("username", "password", "role")
+
+class StudentRecord(Record):
+    __slots__ = ("number", "name", "surname", "department", "year", "email", "phone")
+
+class LecturerRecord(Record):
+    __slots__ = ("number", "name", "surname", "department", "email", "phone", "chair")
+
+class AppointmentRecord(Record):
+    __slots__ = ("appointment_id", "student_number", "lecturer_number", "date",
+                 "start_time", "end_time", "status", "cancellation_requested", "starts_at", "ends_at")
+
+    @classmethod
+    def from_row(cls, columns, row):
+        # Queries select the starts_at/ends_at instants, which the covering
+        # indexes hold; the display columns are derived from them here.
+        record = super().from_row(columns, row)
+        if record.starts_at is not None and record.date is None:
+            record.date, record.start_time = from_epoch_minutes(record.starts_at)
+            record.end_time = from_epoch_minutes(record.ends_at)[1]
+        return record
+
+class LecturerLoadRecord(Record):
+    __slots__ = ("number", "name", "surname", "department", "pending", "scheduled", "cancelled",
+                 "cancellation_requests")
+
+class DepartmentLoadRecord(Record):
+    __slots__ = ("department", "lecturers", "pending", "scheduled", "cancelled", "cancellation_requests")
+
+class WeeklyVolumeRecord(Record):
+    __slots__ = ("week_start", "pending", "scheduled", "cancelled", "appointments", "cancellation_requests",
+                 "cancellation_rate")
+
+class BookingConflictError(Exception):
+    """
+    Raised when a requested slot overlaps one of the lecturer's Pending or
+    Scheduled appointments. conflicts holds the overlapping AppointmentRecords.
+    """
+
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        slots = ", ".join(f"{c.date} {c.start_time}-{c.end_time}" for c in conflicts)
+        super().__init__(f"The lecturer already has an appointment at {slots}.")
+
+class Repository:
+    """
+    Base class for the repositories. Every query is a constant SQL string so that
+    the connection's statement cache (sized in database.py) reuses the prepared
+    statement instead of compiling it again on each call.
+    """
+    record_type = None
+    table = None
+    key = None
+    # Columns Admin.edit_database may change
+    editable_fields = ()
+
+    def __init__(self, db=manager, cache=None):
+        self.db = db
+        # Optional ReferenceCache for the lookups that go through _cached
+        self.cache = cache
+
+    def _cached(self, key, load):
+        if self.cache is None:
+            return load()
+        return self.cache.get(self.table, key, load)
+
+    def _one(self, sql, params, columns):
+        row = self.db.connection().execute(sql, params).fetchone()
+        return None if row is None else self.record_type.from_row(columns, row)
+
+    def _all(self, sql, params, columns):
+        rows = self.db.connection().execute(sql, params).fetchall()
+        return [self.record_type.from_row(columns, row) for row in rows]
+
+    def update_field(self, key, field, value):
+        """
+        Set one editable column of one row. Returns the number of rows changed.
+        """
+        if field not in self.editable_fields:
+            raise ValueError(f"Invalid field: {field}")
+        with self.db.transaction() as conn:
+            return conn.execute(f"UPDATE {self.table} SET {field} = ? WHERE {self.key} = ?", (value, key)).rowcount
+
+class UserRepo(Repository):
+    record_type = UserRecord
+    table = "Users"
+    key = "username"
+
+    GET = "SELECT username, password, role FROM Users WHERE username = ?"
+    GET_ROLE = "SELECT role FROM Users WHERE username = ?"
+    UPDATE_PASSWORD = "UPDATE Users SET password = ? WHERE username = ?"
+
+    def get(self, username):
+        return self._one(self.GET, (username,), UserRecord.__slots__)
+
+    def role(self, username):
+        def load():
+            row = self.db.connection().execute(self.GET_ROLE, (username,)).fetchone()
+            return row[0] if row else None
+        return self._cached(("role", username), load)
+
+    def update_password(self, username, hashed):
+        with self.db.transaction() as conn:
+            return conn.execute(self.UPDATE_PASSWORD, (hashed, username)).rowcount
+
+class TokenEpochRepo(Repository):
+    table = "TokenEpochs"
+    key = "username"
+
+    GET = "SELECT epoch FROM TokenEpochs WHERE username = ?"
+    BUMP = (
+        "INSERT INTO TokenEpochs (username, epoch) VALUES (?, 1) "
+        "ON CONFLICT (username) DO UPDATE SET epoch = epoch + 1 RETURNING epoch"
+    )
+
+    def get(self, username):
+        def load():
+            row = self.db.connection().execute(self.GET, (username,)).fetchone()
+            return row[0] if row else 0
+        return self._cached(username, load)
+
+    def bump(self, username):
+        """
+        Advance the user's epoch, revoking their earlier tokens, and return the new epoch.
+        """
+        with self.db.transaction() as conn:
+            return conn.execute(self.BUMP, (username,)).fetchone()[0]
+
+class ChangeCounterRepo(Repository):
+    """
+    Versions of the change counters kept by the triggers of migration 7.
+
+    Counter names are table names ("Appointments", "Students", "Lecturers")
+    and "lecturer:<number>" / "student:<number>" for one person's appointments.
+    """
+    table = "ChangeCounters"
+    key = "name"
+
+    GET = "SELECT name, version FROM ChangeCounters WHERE name IN (SELECT value FROM json_each(?))"
+
+    def __init__(self, db=manager):
+        super().__init__(db)
+        self.local = threading.local()
+
+    def versions(self, names):
+        """
+        Return {name: version} for names; a counter that was never bumped is 0.
+
+        PRAGMA data_version only moves when another connection commits, and
+        total_changes when this one writes. While neither has moved since the
+        last call on this thread, the cached versions are returned without
+        reading any table.
+        """
+        conn = self.db.connection()
+        # A plain cursor: this runs before every cached lookup, and timing it
+        # in query_stats would cost more than the pragma itself
+        state = (sqlite3.Cursor(conn).execute("PRAGMA data_version").fetchone()[0], conn.total_changes)
+        cache = getattr(self.local, "cache", None)
+        if cache is None or cache[0] != state:
+            cache = self.local.cache = (state, {})
+        known = cache[1]
+        missing = [name for name in names if name not in known]
+        if missing:
+            known.update({name: 0 for name in missing})
+            known.update(conn.execute(self.GET, (json.dumps(missing),)).fetchall())
+        return {name: known[name] for name in names}
+
+class StudentRepo(Repository):
+    record_type = StudentRecord
+    table = "Students"
+    key = "number"
+    editable_fields = ("name", "surname", "department", "year", "email", "phone")
+
+    GET = "SELECT number, name, surname, department, year, email, phone FROM Students WHERE number = ?"
+    EXISTS = "SELECT 1 FROM Students WHERE number = ?"
+    SEARCH_COLUMNS = ("number", "name", "surname", "department")
+    SEARCH = (
+        "SELECT s.number, s.name, s.surname, s.department FROM StudentsSearch "
+        "JOIN Students s ON s.rowid = StudentsSearch.rowid "
+        "WHERE StudentsSearch MATCH ? ORDER BY StudentsSearch.rank LIMIT ?"
+    )
+
+    def get(self, number):
+        return self._cached(("get", number), lambda: self._one(self.GET, (number,), StudentRecord.__slots__))
+
+    def exists(self, number):
+        return self._cached(("exists", number),
+                            lambda: self.db.connection().execute(self.EXISTS, (number,)).fetchone() is not None)
+
+    def search(self, text, limit=SEARCH_LIMIT):
+        """
+        Return the best limit students matching every word of text by prefix.
+        """
+        query = fts_query(text)
+        if not query:
+            return []
+        return self._all(self.SEARCH, (query, limit), self.SEARCH_COLUMNS)
+
+class LecturerRepo(Repository):
+    record_type = LecturerRecord
+    table = "Lecturers"
+    key = "number"
+    editable_fields = ("name", "surname", "department", "email", "phone", "chair")
+
+    GET = "SELECT number, name, surname, department, email, phone, chair FROM Lecturers WHERE number = ?"
+    EXISTS = "SELECT 1 FROM Lecturers WHERE number = ?"
+    CHOICES = "SELECT number, name, surname FROM Lecturers"
+    SEARCH_COLUMNS = ("number", "name", "surname", "department", "chair")
+    SEARCH = (
+        "SELECT l.number, l.name, l.surname, l.department, l.chair FROM LecturersSearch "
+        "JOIN Lecturers l ON l.rowid = LecturersSearch.rowid "
+        "WHERE LecturersSearch MATCH ? ORDER BY LecturersSearch.rank LIMIT ?"
+    )
+
+    def get(self, number):
+        return self._cached(("get", number), lambda: self._one(self.GET, (number,), LecturerRecord.__slots__))
+
+    def exists(self, number):
+        return self._cached(("exists", number),
+                            lambda: self.db.connection().execute(self.EXISTS, (number,)).fetchone() is not None)
+
+    def choices(self):
+        """
+        Return number, name and surname of every lecturer for the booking picker.
+        """
+        # A copy, so a caller sorting or filtering it leaves the cached list alone
+        return list(self._cached("choices", lambda: self._all(self.CHOICES, (), ("number", "name", "surname"))))
+
+    def search(self, text, limit=SEARCH_LIMIT):
+        """
+        Return the best limit lecturers matching every word of text by prefix,
+        across number, name, surname, department and chair.
+        """
+        query = fts_query(text)
+        if not query:
+            return []
+        return self._all(self.SEARCH, (query, limit), self.SEARCH_COLUMNS)
+
+class AppointmentRepo(Repository):
+    record_type = AppointmentRecord
+    table = "Appointments"
+    key = "appointment_id"
+    editable_fields = ("date", "start_time", "end_time", "status", "cancellation_requested")
+
+    # Column lists match the covering indexes rebuilt by migration 5
+    LIST_COLUMNS = ("appointment_id", "starts_at", "ends_at", "status")
+    PENDING_COLUMNS = ("appointment_id", "student_number", "starts_at", "ends_at")
+    CANCELLATION_COLUMNS = ("appointment_id", "student_number", "lecturer_number")
+    ACTIVE_COLUMNS = ("appointment_id", "starts_at", "ends_at", "status")
+
+    FOR_STUDENT = (
+        "SELECT appointment_id, starts_at, ends_at, status FROM Appointments "
+        "WHERE student_number = ? ORDER BY starts_at"
+    )
+    FOR_LECTURER = (
+        "SELECT appointment_id, starts_at, ends_at, status FROM Appointments "
+        "WHERE lecturer_number = ? ORDER BY starts_at"
+    )
+    # Range scans: [start, end) instants, in start order straight from the index
+    STUDENT_BETWEEN = (
+        "SELECT appointment_id, starts_at, ends_at, status FROM Appointments "
+        "WHERE student_number = ? AND starts_at >= ? AND starts_at < ? ORDER BY starts_at"
+    )
+    LECTURER_BETWEEN = (
+        "SELECT appointment_id, starts_at, ends_at, status FROM Appointments "
+        "WHERE lecturer_number = ? AND starts_at >= ? AND starts_at < ? ORDER BY starts_at"
+    )
+    UPCOMING_FOR_STUDENT = (
+        "SELECT appointment_id, starts_at, ends_at, status FROM Appointments "
+        "WHERE student_number = ? AND starts_at >= ? ORDER BY starts_at LIMIT ?"
+    )
+    UPCOMING_FOR_LECTURER = (
+        "SELECT appointment_id, starts_at, ends_at, status FROM Appointments "
+        "WHERE lecturer_number = ? AND starts_at >= ? ORDER BY starts_at LIMIT ?"
+    )
+    PENDING = (
+        "SELECT appointment_id, student_number, starts_at, ends_at FROM Appointments "
+        "WHERE status = 'Pending' AND lecturer_number = ? ORDER BY starts_at"
+    )
+    CANCELLATION_REQUESTS = (
+        "SELECT appointment_id, student_number, lecturer_number FROM Appointments "
+        "WHERE cancellation_requested = 1 AND status IN ('Pending', 'Scheduled')"
+    )
+    # Overlap test for half-open slots; served by idx_appointments_lecturer
+    # (lecturer_number, starts_at, ...). No appointment is longer than
+    # MAX_APPOINTMENT_MINUTES, so only starts in (start - max, end) can overlap.
+    CONFLICTS = (
+        "SELECT appointment_id, starts_at, ends_at, status FROM Appointments "
+        "WHERE lecturer_number = ? AND starts_at > ? AND starts_at < ? AND ends_at > ? "
+        "AND status IN ('Pending', 'Scheduled')"
+    )
+    ACTIVE_BETWEEN = (
+        "SELECT appointment_id, starts_at, ends_at, status FROM Appointments "
+        "WHERE lecturer_number = ? AND starts_at >= ? AND starts_at < ? AND status IN ('Pending', 'Scheduled')"
+    )
+    INSERT = (
+        "INSERT INTO Appointments (student_number, lecturer_number, starts_at, ends_at, status) "
+        "VALUES (?, ?, ?, ?, 'Pending')"
+    )
+    # Admin.edit_database edits the display columns; they are written through
+    # to the instants after the new slot has been checked for overlaps
+    STATUSES = ("Pending", "Scheduled", "Cancelled")
+    GET_SLOT = "SELECT appointment_id, lecturer_number, starts_at, ends_at, status FROM Appointments WHERE appointment_id = ?"
+    SET_SLOT = "UPDATE Appointments SET starts_at = ?, ends_at = ?, status = ? WHERE appointment_id = ?"
+    # Writes return the lecturer and day they touched so listeners can be told
+    REQUEST_CANCELLATION = (
+        "UPDATE Appointments SET cancellation_requested = 1 WHERE appointment_id = ? AND student_number = ? "
+        "AND status IN ('Pending', 'Scheduled') RETURNING lecturer_number, date"
+    )
+    CLEAR_CANCELLATION = (
+        "UPDATE Appointments SET cancellation_requested = 0 WHERE appointment_id = ? "
+        "RETURNING lecturer_number, date"
+    )
+    SCHEDULE = "UPDATE Appointments SET status = 'Scheduled' WHERE appointment_id = ? RETURNING lecturer_number, date"
+    DELETE = "DELETE FROM Appointments WHERE appointment_id = ? RETURNING lecturer_number, date"
+    # Cancelled appointments are kept, so the reports and a rebuild still count them
+    APPROVE_CANCELLATION = (
+        "UPDATE Appointments SET status = 'Cancelled' WHERE appointment_id = ? AND cancellation_requested = 1 "
+        "AND status IN ('Pending', 'Scheduled') RETURNING lecturer_number, date"
+    )
+    CANCEL_FOR_LECTURER = (
+        "UPDATE Appointments SET status = 'Cancelled' WHERE appointment_id = ? AND lecturer_number = ? "
+        "AND status IN ('Pending', 'Scheduled') RETURNING lecturer_number, date"
+    )
+    # Batch decisions. executemany cannot return rows, so the affected lecturer
+    # days are read first with one json_each lookup over the id list.
+    DAYS_FOR_IDS = (
+        "SELECT lecturer_number, date FROM Appointments "
+        "WHERE appointment_id IN (SELECT value FROM json_each(?))"
+    )
+    BATCH_APPROVE_CANCELLATION = (
+        "UPDATE Appointments SET status = 'Cancelled' "
+        "WHERE appointment_id = ? AND cancellation_requested = 1 AND status IN ('Pending', 'Scheduled')"
+    )
+    BATCH_REJECT_CANCELLATION = (
+        "UPDATE Appointments SET cancellation_requested = 0 "
+        "WHERE appointment_id = ? AND cancellation_requested = 1 AND status IN ('Pending', 'Scheduled')"
+    )
+    BATCH_SCHEDULE = (
+        "UPDATE Appointments SET status = 'Scheduled' "
+        "WHERE appointment_id = ? AND lecturer_number = ? AND status = 'Pending'"
+    )
+    BATCH_REJECT = "DELETE FROM Appointments WHERE appointment_id = ? AND lecturer_number = ? AND status = 'Pending'"
+    DELETE_MANY = (
+        "DELETE FROM Appointments WHERE appointment_id IN (SELECT value FROM json_each(?)) "
+        "RETURNING lecturer_number, date"
+    )
+
+    def __init__(self, db=manager):
+        super().__init__(db)
+        self.listeners = []
+
+    def add_listener(self, callback):
+        """
+        Register callback(lecturer_number, date) to run after each committed write.
+        date is None when every day of that lecturer may have changed.
+        """
+        self.listeners.append(callback)
+
+    def _notify(self, changed):
+        # Inside an enclosing transaction (the write queue's group commit) this
+        # waits for the commit, so listeners never act on uncommitted changes
+        self.db.after_commit(lambda: self._fire(set(changed)))
+
+    def _fire(self, changed):
+        for lecturer_number, date in changed:
+            for callback in self.listeners:
+                callback(lecturer_number, date)
+
+    def _write(self, sql, params):
+        # Notify only once the transaction has committed
+        with self.db.transaction() as conn:
+            changed = conn.execute(sql, params).fetchall()
+        self._notify(changed)
+        return len(changed)
+
+    def for_student(self, student_number):
+        return self._all(self.FOR_STUDENT, (student_number,), self.LIST_COLUMNS)
+
+    def for_lecturer(self, lecturer_number):
+        return self._all(self.FOR_LECTURER, (lecturer_number,), self.LIST_COLUMNS)
+
+    def student_between(self, student_number, start, end):
+        """
+        Return the student's appointments starting in [start, end) epoch minutes, in start order.
+        """
+        return self._all(self.STUDENT_BETWEEN, (student_number, start, end), self.LIST_COLUMNS)
+
+    def lecturer_between(self, lecturer_number, start, end):
+        """
+        Return the lecturer's appointments starting in [start, end) epoch minutes, in start order.
+        """
+        return self._all(self.LECTURER_BETWEEN, (lecturer_number, start, end), self.LIST_COLUMNS)
+
+    def upcoming_for_student(self, student_number, now, limit=100):
+        return self._all(self.UPCOMING_FOR_STUDENT, (student_number, now, limit), self.LIST_COLUMNS)
+
+    def upcoming_for_lecturer(self, lecturer_number, now, limit=100):
+        return self._all(self.UPCOMING_FOR_LECTURER, (lecturer_number, now, limit), self.LIST_COLUMNS)
+
+    def pending_for_lecturer(self, lecturer_number):
+        return self._all(self.PENDING, (lecturer_number,), self.PENDING_COLUMNS)
+
+    def cancellation_requests(self):
+        return self._all(self.CANCELLATION_REQUESTS, (), self.CANCELLATION_COLUMNS)
+
+    def conflicts(self, lecturer_number, starts_at, ends_at):
+        """
+        Return the lecturer's Pending or Scheduled appointments overlapping [starts_at, ends_at).
+        """
+        return self._all(self.CONFLICTS, (lecturer_number, starts_at - MAX_APPOINTMENT_MINUTES, ends_at, starts_at),
+                         self.ACTIVE_COLUMNS)
+
+    def active_between(self, lecturer_number, first_date, last_date):
+        start, end = day_range(first_date, last_date)
+        return self._all(self.ACTIVE_BETWEEN, (lecturer_number, start, end), self.ACTIVE_COLUMNS)
+
+    def update_field(self, key, field, value):
+        """
+        Set one editable column of one row. date, start_time and end_time are
+        parsed here and raise ValueError unless they are YYYY-MM-DD or HH:MM.
+        """
+        if field not in self.editable_fields:
+            raise ValueError(f"Invalid field: {field}")
+        if field in ("date", "start_time", "end_time", "status"):
+            return self._update_slot(key, field, value)
+        return self._write(
+            f"UPDATE Appointments SET {field} = ? WHERE appointment_id = ? RETURNING lecturer_number, date",
+            (value, key)
+        )
+
+    def _update_slot(self, key, field, value):
+        """
+        Move an appointment to another date or time, or change its status.
+
+        Like request(), the overlap check and the update run in one
+        transaction: a slot that becomes active, or an active slot that moves,
+        must not overlap the lecturer's other Pending or Scheduled appointments.
+        Raises BookingConflictError if it would, and ValueError if the edit would
+        leave the slot ending before it starts or running past midnight.
+        """
+        with self.db.transaction() as conn:
+            row = conn.execute(self.GET_SLOT, (key,)).fetchone()
+            if row is None:
+                return 0
+            appointment_id, lecturer_number, old_start, old_end, status = row
+            starts_at, ends_at = old_start, old_end
+            day = old_start - old_start % MINUTES_PER_DAY
+            if field == "date":
+                shift = epoch_minutes(value) - day
+                starts_at, ends_at = old_start + shift, old_end + shift
+            elif field == "start_time":
+                starts_at = day + parse_time(value)
+            elif field == "end_time":
+                ends_at = day + parse_time(value)
+            else:
+                if value not in self.STATUSES:
+                    raise ValueError(f"Invalid status '{value}', expected one of {', '.join(self.STATUSES)}.")
+                status = value
+            # The other bound was read in this transaction, so it is current
+            if ends_at <= starts_at:
+                raise ValueError("End time must be after start time.")
+            if ends_at > starts_at - starts_at % MINUTES_PER_DAY + MINUTES_PER_DAY:
+                raise ValueError("An appointment must end on the day it starts.")
+            if status in ("Pending", "Scheduled"):
+                conflicts = [c for c in self.conflicts(lecturer_number, starts_at, ends_at)
+                             if c.appointment_id != appointment_id]
+                if conflicts:
+                    raise BookingConflictError(conflicts)
+            conn.execute(self.SET_SLOT, (starts_at, ends_at, status, appointment_id))
+        self._notify([(lecturer_number, from_epoch_minutes(old_start)[0]),
+                      (lecturer_number, from_epoch_minutes(starts_at)[0])])
+        return 1
+
+    def request(self, student_number, lecturer_number, starts_at, ends_at):
+        """
+        Insert a Pending appointment and return its id.
+
+        The overlap check and the insert run in one IMMEDIATE transaction, so two
+        students submitting the same slot at the same moment cannot both get it.
+        Raises BookingConflictError if the slot is taken.
+        """
+        with self.db.transaction() as conn:
+            conflicts = self.conflicts(lecturer_number, starts_at, ends_at)
+            if conflicts:
+                raise BookingConflictError(conflicts)
+            appointment_id = conn.execute(self.INSERT, (student_number, lecturer_number, starts_at, ends_at)).lastrowid
+        self._notify([(lecturer_number, from_epoch_minutes(starts_at)[0])])
+        return appointment_id
+
+    def check_batch(self, lecturer_number, slots):
+        """
+        Check many (date, start_time, end_time) slots for one lecturer at once.
+
+        The lecturer's active appointments over the whole date range are loaded
+        with one query into an IntervalTree. Returns, for each slot, the list of
+        existing appointments and earlier slots of the batch that it overlaps;
+        batch slots are reported as AppointmentRecords without an id.
+        """
+        if not slots:
+            return []
+        dates = [slot[0] for slot in slots]
+        appointments = self.active_between(lecturer_number, min(dates), max(dates))
+        tree = IntervalTree((a.starts_at, a.ends_at, a) for a in appointments)
+
+        spans = [(epoch_minutes(date, start), epoch_minutes(date, end)) for date, start, end in slots]
+        batch_tree = IntervalTree((start, end, index) for index, (start, end) in enumerate(spans))
+        batch_records = [
+            AppointmentRecord(lecturer_number=lecturer_number, date=date, start_time=start,
+                              end_time=end, status="Pending")
+            for date, start, end in slots
+        ]
+
+        results = []
+        for index, (start, end) in enumerate(spans):
+            overlaps = [item[2] for item in tree.overlapping(start, end)]
+            overlaps.extend(batch_records[item[2]] for item in batch_tree.overlapping(start, end) if item[2] < index)
+            results.append(overlaps)
+        return results
+
+    def _write_batches(self, batches):
+        """
+        Run several (sql, params_seq) executemany batches in one transaction and
+        return the number of rows each changed.
+        """
+        ids = [params[0] for _, params_seq in batches for params in params_seq]
+        if not ids:
+            return [0] * len(batches)
+        with self.db.transaction() as conn:
+            changed = conn.execute(self.DAYS_FOR_IDS, (json.dumps(ids),)).fetchall()
+            counts = [conn.executemany(sql, params_seq).rowcount for sql, params_seq in batches]
+        self._notify(changed)
+        return counts
+
+    def decide_cancellations(self, approve_ids, reject_ids):
+        """
+        Approve (mark Cancelled) and reject cancellation requests in one transaction.
+        Returns (approved, rejected) counts; ids without a pending request are skipped.
+        """
+        return tuple(self._write_batches([
+            (self.BATCH_APPROVE_CANCELLATION, [(app_id,) for app_id in approve_ids]),
+            (self.BATCH_REJECT_CANCELLATION, [(app_id,) for app_id in reject_ids]),
+        ]))
+
+    def decide_pending(self, lecturer_number, accept_ids, reject_ids):
+        """
+        Schedule and reject a lecturer's Pending appointments in one transaction.
+        Returns (accepted, rejected) counts; ids that are not the lecturer's Pending appointments are skipped.
+        """
+        return tuple(self._write_batches([
+            (self.BATCH_SCHEDULE, [(app_id, lecturer_number) for app_id in accept_ids]),
+            (self.BATCH_REJECT, [(app_id, lecturer_number) for app_id in reject_ids]),
+        ]))
+
+    def request_cancellation(self, appointment_id, student_number):
+        return self._write(self.REQUEST_CANCELLATION, (appointment_id, student_number))
+
+    def approve_cancellation(self, appointment_id):
+        return self._write(self.APPROVE_CANCELLATION, (appointment_id,))
+
+    def reject_cancellation(self, appointment_id):
+        return self._write(self.CLEAR_CANCELLATION, (appointment_id,))
+
+    def schedule(self, appointment_id):
+        return self._write(self.SCHEDULE, (appointment_id,))
+
+    def reject(self, appointment_id):
+        return self._write(self.DELETE, (appointment_id,))
+
+    def cancel_for_lecturer(self, appointment_id, lecturer_number):
+        return self._write(self.CANCEL_FOR_LECTURER, (appointment_id, lecturer_number))
+
+    def delete_many(self, appointment_ids):
+        """
+        Delete appointments by id in one transaction, e.g. once they are archived.
+        Returns the number deleted.
+        """
+        return self._write(self.DELETE_MANY, (json.dumps(list(appointment_ids)),))
+
+def week_of(date):
+    """
+    The week key of the report summaries: its Monday in days since 1970-01-01.
+    """
+    day = epoch_minutes(date) // MINUTES_PER_DAY
+    return day - (day + 3) % 7
+
+class ReportRepo(Repository):
+    """
+    Management reports read from the LecturerLoad and WeeklyVolume summaries
+    that the triggers of migration 9 keep current, never from Appointments.
+
+    Archived appointments stay counted: the archiver deletes inside paused(),
+    and rebuild() counts the archive when it is attached to the connection.
+    """
+
+    # Pending, Scheduled and Cancelled counts of a group of summary rows
+    STATUS_COUNTS = (
+        "SUM(CASE WHEN s.status = 'Pending' THEN s.appointments ELSE 0 END), "
+        "SUM(CASE WHEN s.status = 'Scheduled' THEN s.appointments ELSE 0 END), "
+        "SUM(CASE WHEN s.status = 'Cancelled' THEN s.appointments ELSE 0 END)"
+    )
+    LECTURER_LOAD = (
+        "SELECT s.lecturer_number, l.name, l.surname, l.department, " + STATUS_COUNTS + ", "
+        "SUM(s.cancellation_requests) "
+        "FROM LecturerLoad s LEFT JOIN Lecturers l ON l.number = s.lecturer_number "
+        "GROUP BY s.lecturer_number HAVING SUM(s.appointments) > 0 ORDER BY SUM(s.appointments) DESC"
+    )
+    DEPARTMENT_LOAD = (
+        "SELECT ifnull(l.department, 'Unknown'), COUNT(DISTINCT s.lecturer_number), " + STATUS_COUNTS + ", "
+        "SUM(s.cancellation_requests) "
+        "FROM LecturerLoad s LEFT JOIN Lecturers l ON l.number = s.lecturer_number "
+        "GROUP BY 1 HAVING SUM(s.appointments) > 0 ORDER BY SUM(s.appointments) DESC"
+    )
+    WEEKLY_VOLUME = (
+        "SELECT date(s.week * 86400, 'unixepoch'), " + STATUS_COUNTS + ", SUM(s.appointments), "
+        "SUM(s.cancellation_requests), round(1.0 * SUM(s.cancellation_requests) / SUM(s.appointments), 4) "
+        "FROM WeeklyVolume s WHERE s.week BETWEEN ? AND ? "
+        "GROUP BY s.week HAVING SUM(s.appointments) > 0 ORDER BY s.week"
+    )
+    LOAD_COLUMNS = ("pending", "scheduled", "cancelled", "cancellation_requests")
+
+    # Without OR IGNORE: a flag that is already set is cleared first, not silently shared
+    PAUSE = "INSERT INTO ReportsPaused (flag) VALUES (1)"
+    RESUME = "DELETE FROM ReportsPaused"
+    PAUSE_FLAGS = "SELECT COUNT(*) FROM ReportsPaused"
+
+    HOT_SOURCE = "SELECT lecturer_number, starts_at, status, cancellation_requested FROM main.Appointments"
+    # Rows an interrupted archive run left in both files are counted once
+    ARCHIVE_SOURCE = (
+        HOT_SOURCE + " UNION ALL "
+        "SELECT lecturer_number, starts_at, status, cancellation_requested FROM archive.Appointments "
+        "WHERE appointment_id NOT IN (SELECT appointment_id FROM main.Appointments)"
+    )
+    FILL_LECTURER_LOAD = (
+        "INSERT INTO LecturerLoad SELECT lecturer_number, status, COUNT(*), SUM(ifnull(cancellation_requested, 0)) "
+        "FROM ({}) GROUP BY lecturer_number, status"
+    )
+    FILL_WEEKLY_VOLUME = (
+        "INSERT INTO WeeklyVolume SELECT starts_at / 1440 - (starts_at / 1440 + 3) % 7, status, COUNT(*), "
+        "SUM(ifnull(cancellation_requested, 0)) FROM ({}) GROUP BY 1, 2"
+    )
+    # Whether the archive is attached -> the statements that recount the summaries
+    REBUILD = {
+        False: ("DELETE FROM LecturerLoad", "DELETE FROM WeeklyVolume",
+                FILL_LECTURER_LOAD.format(HOT_SOURCE), FILL_WEEKLY_VOLUME.format(HOT_SOURCE)),
+        True: ("DELETE FROM LecturerLoad", "DELETE FROM WeeklyVolume",
+               FILL_LECTURER_LOAD.format(ARCHIVE_SOURCE), FILL_WEEKLY_VOLUME.format(ARCHIVE_SOURCE)),
+    }
+    COUNTED = "SELECT ifnull(SUM(appointments), 0) FROM LecturerLoad"
+
+    def lecturer_load(self):
+        """
+        Appointments per lecturer and status, busiest lecturer first.
+        """
+        return [LecturerLoadRecord.from_row(("number", "name", "surname", "department") + self.LOAD_COLUMNS, row)
+                for row in self.db.connection().execute(self.LECTURER_LOAD).fetchall()]
+
+    def department_load(self):
+        """
+        Appointments per department and status, busiest department first.
+        """
+        return [DepartmentLoadRecord.from_row(("department", "lecturers") + self.LOAD_COLUMNS, row)
+                for row in self.db.connection().execute(self.DEPARTMENT_LOAD).fetchall()]
+
+    def weekly_volume(self, first_date, last_date):
+        """
+        Appointments per status and the share with a cancellation request, for
+        each week from the one holding first_date to the one holding last_date.
+        """
+        columns = ("week_start", "pending", "scheduled", "cancelled", "appointments",
+                   "cancellation_requests", "cancellation_rate")
+        rows = self.db.connection().execute(self.WEEKLY_VOLUME, (week_of(first_date), week_of(last_date))).fetchall()
+        return [WeeklyVolumeRecord.from_row(columns, row) for row in rows]
+
+    @contextmanager
+    def paused(self):
+        """
+        Run a block in a transaction whose deletes leave the summaries as they are.
+        The pause flag never outlives the transaction, so no other connection sees
+        it. Not reentrant: a flag found already set is treated as left over and cleared.
+        """
+        with self.db.transaction() as conn:
+            if conn.execute(self.PAUSE_FLAGS).fetchone()[0]:
+                logging.warning("Cleared a report pause flag left set by an earlier transaction")
+                conn.execute(self.RESUME)
+            conn.execute(self.PAUSE)
+            try:
+                yield conn
+            finally:
+                conn.execute(self.RESUME)
+
+    def check_not_paused(self):
+        """
+        Raise RuntimeError if the pause flag is set outside an archiver
+        transaction. While it is, deletes are left out of the summaries, so
+        they can only be trusted again after a rebuild.
+        """
+        if self.db.connection().execute(self.PAUSE_FLAGS).fetchone()[0]:
+            message = "Report summaries are paused; run python reports.py --rebuild to recount and resume them"
+            logging.critical(message)
+            raise RuntimeError(message)
+
+    def rebuild(self):
+        """
+        Recount both summaries from scratch, including the archive when the
+        connection has it attached, and clear a left-over pause flag. Returns
+        the number of appointments counted.
+        """
+        with self.db.transaction() as conn:
+            conn.execute(self.RESUME)
+            attached = any(row[1] == "archive" for row in conn.execute("PRAGMA database_list"))
+            for statement in self.REBUILD[attached]:
+                conn.execute(statement)
+            return conn.execute(self.COUNTED).fetchone()[0]
+
+change_counter_repo = ChangeCounterRepo()
+# Users, Students, Lecturers and TokenEpochs lookups, valid until their table's change counter moves
+reference_cache = ReferenceCache(change_counter_repo.versions)
+user_repo = UserRepo(cache=reference_cache)
+token_epoch_repo = TokenEpochRepo(cache=reference_cache)
+student_repo = StudentRepo(cache=reference_cache)
+lecturer_repo = LecturerRepo(cache=reference_cache)
+report_repo = ReportRepo()
+appointment_repo = AppointmentRepo()
+
+# Free-slot finder; its per-day cache goes stale on every appointment write, in any process
+availability = AvailabilityEngine(appointment_repo, versions=change_counter_repo.versions)
+appointment_repo.add_listener(availability.invalidate)
+
+# Repository owning each table that Admin.edit_database can change
+EDITABLE_REPOS = {
+    "Students": student_repo,
+    "Lecturers": lecturer_repo,
+    "Appointments": appointment_repo,
+}
+
+# Queries issued by the GUI on every screen open. main() refuses to start if
+# any of them would fall back to a full table scan.
+HOT_QUERIES = {
+    "login": (UserRepo.GET, ("",)),
+    "student_appointments": (AppointmentRepo.FOR_STUDENT, ("",)),
+    "lecturer_appointments": (AppointmentRepo.FOR_LECTURER, ("",)),
+    "pending_appointments": (AppointmentRepo.PENDING, ("",)),
+    "booking_conflicts": (AppointmentRepo.CONFLICTS, ("", 0, 0, 0)),
+    "student_upcoming": (AppointmentRepo.UPCOMING_FOR_STUDENT, ("", 0, 100)),
+    "lecturer_upcoming": (AppointmentRepo.UPCOMING_FOR_LECTURER, ("", 0, 100)),
+    "lecturer_week": (AppointmentRepo.LECTURER_BETWEEN, ("", 0, 0)),
+    "cancellation_requests": (AppointmentRepo.CANCELLATION_REQUESTS, ()),
+    "token_epoch": (TokenEpochRepo.GET, ("",)),
+    "change_counters": (ChangeCounterRepo.GET, ('["Appointments"]',)),
+    "lecturer_search": (LecturerRepo.SEARCH, ('"a"*', SEARCH_LIMIT)),
+    "student_search": (StudentRepo.SEARCH, ('"a"*', SEARCH_LIMIT)),
+    "weekly_volume": (ReportRepo.WEEKLY_VOLUME, (0, 0)),
+}
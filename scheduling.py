@@ -0,0 +1,250 @@
+# scheduling.py
+
+import threading
+from collections import OrderedDict
+from datetime import date as Date, datetime, timedelta
+
+
+MINUTES_PER_DAY = 24 * 60
+# Appointments.starts_at/ends_at count minutes of wall-clock time since 1970-01-01 00:00
+EPOCH_ORDINAL = Date(1970, 1, 1).toordinal()
+# Longest appointment; bounds the index range an overlap check has to read
+MAX_APPOINTMENT_MINUTES = MINUTES_PER_DAY
+
+def parse_date(text):
+    """
+    Parse a YYYY-MM-DD date, raising ValueError with a readable message.
+    """
+    try:
+        return Date.fromisoformat(text.strip())
+    except ValueError:
+        raise ValueError(f"Invalid date '{text}', expected YYYY-MM-DD.")
+
+def parse_time(text):
+    """
+    Parse H:MM or HH:MM into minutes after midnight.
+    """
+    hours, _, minutes = text.strip().partition(":")
+    if not (hours.isdigit() and minutes.isdigit() and len(minutes) == 2):
+        raise ValueError(f"Invalid time '{text}', expected HH:MM.")
+    hours, minutes = int(hours), int(minutes)
+    if hours > 23 or minutes > 59:
+        raise ValueError(f"Invalid time '{text}', expected HH:MM.")
+    return hours * 60 + minutes
+
+def format_time(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def normalize_slot(date, start_time, end_time):
+    """
+    Validate a requested slot and return it as zero-padded (YYYY-MM-DD, HH:MM, HH:MM)
+    strings, which compare correctly as text in SQL.
+    """
+    day = parse_date(date)
+    start = parse_time(start_time)
+    end = parse_time(end_time)
+    if end <= start:
+        raise ValueError("End time must be after start time.")
+    return day.isoformat(), format_time(start), format_time(end)
+
+def epoch_minutes(date, time="00:00"):
+    """
+    Epoch minutes (as stored in Appointments) of a YYYY-MM-DD date and HH:MM time.
+    """
+    days = parse_date(date).toordinal() - EPOCH_ORDINAL
+    if days < 0:
+        raise ValueError(f"Invalid date '{date}', dates before 1970-01-01 are not supported.")
+    return days * MINUTES_PER_DAY + parse_time(time)
+
+def from_epoch_minutes(minutes):
+    """
+    Return the (YYYY-MM-DD, HH:MM) strings of an epoch minute.
+    """
+    days, minutes = divmod(minutes, MINUTES_PER_DAY)
+    return Date.fromordinal(EPOCH_ORDINAL + days).isoformat(), format_time(minutes)
+
+def slot_minutes(date, start_time, end_time):
+    """
+    Validate a requested slot and return it as (starts_at, ends_at) epoch minutes.
+    """
+    day, start, end = normalize_slot(date, start_time, end_time)
+    return epoch_minutes(day, start), epoch_minutes(day, end)
+
+def day_range(first_date, last_date):
+    """
+    Half-open [start, end) epoch minutes covering every day from first_date to last_date.
+    """
+    last = parse_date(last_date) + timedelta(days=1)
+    return epoch_minutes(first_date), epoch_minutes(last.isoformat())
+
+def now_minutes():
+    """
+    The current local time in epoch minutes.
+    """
+    now = datetime.now()
+    return epoch_minutes(now.date().isoformat()) + now.hour * 60 + now.minute
+
+class IntervalTree:
+    """
+    Static interval tree over half-open [start, end) intervals.
+
+    Intervals are kept sorted by start in an implicit balanced tree; each node
+    also stores the largest end in its subtree so whole subtrees that finish
+    before a query starts are skipped. Queries cost O(log n + k).
+    """
+
+    def __init__(self, intervals):
+        # intervals: iterable of (start, end, value)
+        self.items = sorted(intervals, key=lambda item: (item[0], item[1]))
+        self.max_end = [0] * len(self.items)
+        self._build(0, len(self.items))
+
+    def __len__(self):
+        return len(self.items)
+
+    def _build(self, lo, hi):
+        if lo >= hi:
+            return float("-inf")
+        mid = (lo + hi) // 2
+        self.max_end[mid] = max(self.items[mid][1], self._build(lo, mid), self._build(mid + 1, hi))
+        return self.max_end[mid]
+
+    def overlapping(self, start, end):
+        """
+        Return the (start, end, value) items overlapping [start, end), ordered by start.
+        """
+        found = []
+        self._query(0, len(self.items), start, end, found)
+        return found
+
+    def _query(self, lo, hi, start, end, found):
+        if lo >= hi:
+            return
+        mid = (lo + hi) // 2
+        if self.max_end[mid] <= start:
+            return
+        self._query(lo, mid, start, end, found)
+        item = self.items[mid]
+        if item[0] < end:
+            if item[1] > start:
+                found.append(item)
+            self._query(mid + 1, hi, start, end, found)
+
+class AvailabilityEngine:
+    """
+    Find a lecturer's open slots over a date range.
+
+    Busy intervals are cached per (lecturer, date), each entry stamped with the
+    lecturer's generation at the time its rows were read, like ReferenceCache.
+    The generation pairs a local counter, which invalidate() bumps after every
+    write through the appointment repository, with the lecturer's change
+    counter (versions, e.g. ChangeCounterRepo.versions), which the triggers of
+    migration 7 bump on writes from any process. Because the generation is
+    read before the rows, a write landing during the read leaves the stored
+    entry stale on the next lookup, never served as current.
+    """
+
+    def __init__(self, repo, day_start="09:00", day_end="17:00", max_entries=10000, versions=None):
+        self.repo = repo
+        self.day_start = parse_time(day_start)
+        self.day_end = parse_time(day_end)
+        self.max_entries = max_entries
+        self.versions = versions
+        # (lecturer, date) -> (generation, merged intervals), least recently used first
+        self.cache = OrderedDict()
+        self.generations = {}
+        self.lock = threading.Lock()
+
+    def _generation(self, lecturer_number):
+        with self.lock:
+            local = self.generations.get(lecturer_number, 0)
+        if self.versions is None:
+            return local, None
+        name = f"lecturer:{lecturer_number}"
+        return local, self.versions([name])[name]
+
+    def invalidate(self, lecturer_number, date=None):
+        """
+        Drop cached days for a lecturer; all of them when date is None. Days
+        being loaded meanwhile are stored under the old generation and reloaded.
+        """
+        with self.lock:
+            self.generations[lecturer_number] = self.generations.get(lecturer_number, 0) + 1
+            if date is not None:
+                self.cache.pop((lecturer_number, date), None)
+                return
+            for key in [key for key in self.cache if key[0] == lecturer_number]:
+                del self.cache[key]
+
+    def busy(self, lecturer_number, first_date, last_date):
+        """
+        Return {date: [(start, end), ...]} of merged busy minutes for each day in the range.
+        """
+        first, last = parse_date(first_date), parse_date(last_date)
+        days = [Date.fromordinal(n).isoformat() for n in range(first.toordinal(), last.toordinal() + 1)]
+        generation = self._generation(lecturer_number)
+        result = {}
+        with self.lock:
+            for day in days:
+                entry = self.cache.get((lecturer_number, day))
+                if entry is not None and entry[0] == generation:
+                    self.cache.move_to_end((lecturer_number, day))
+                    result[day] = entry[1]
+        missing = [day for day in days if day not in result]
+        if not missing:
+            return result
+
+        # One range query fills every uncached day, including the empty ones
+        loaded = {day: [] for day in missing}
+        for appointment in self.repo.active_between(lecturer_number, missing[0], missing[-1]):
+            if appointment.date not in loaded:
+                continue
+            start = appointment.starts_at % MINUTES_PER_DAY
+            loaded[appointment.date].append((start, start + appointment.ends_at - appointment.starts_at))
+        with self.lock:
+            for day, intervals in loaded.items():
+                merged = merge_intervals(intervals)
+                self.cache[(lecturer_number, day)] = (generation, merged)
+                self.cache.move_to_end((lecturer_number, day))
+                result[day] = merged
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+        return result
+
+    def free_slots(self, lecturer_number, first_date, last_date, length, step=None, limit=50):
+        """
+        Return up to limit open (date, start_time, end_time) slots of length minutes.
+
+        Candidate starts are every step minutes (default: length) from the start
+        of the working day.
+        """
+        step = step or length
+        busy = self.busy(lecturer_number, first_date, last_date)
+        slots = []
+        for day in sorted(busy):
+            intervals = busy[day]
+            index = 0
+            start = self.day_start
+            while start + length <= self.day_end:
+                end = start + length
+                # Skip busy intervals that finish before this candidate
+                while index < len(intervals) and intervals[index][1] <= start:
+                    index += 1
+                if index == len(intervals) or intervals[index][0] >= end:
+                    slots.append((day, format_time(start), format_time(end)))
+                    if len(slots) >= limit:
+                        return slots
+                start += step
+        return slots
+
+def merge_intervals(intervals):
+    """
+    Sort and merge overlapping (start, end) intervals.
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
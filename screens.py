@@ -0,0 +1,120 @@
+# screens.py
+
+import logging
+import os
+from collections import OrderedDict
+import customtkinter as ctk
+
+# Milliseconds between checks of whether the visible screen's data changed
+WATCH_INTERVAL_MS = int(os.environ.get("FACULTYONSITE_WATCH_MS", 1000))
+
+class ScreenManager:
+    """
+    Build each screen once and switch between them by hiding and showing frames.
+
+    A screen is built by build(screen_frame), which may return a refresh
+    callable. Later visits to the same key reuse the cached frame and only call
+    refresh to rebind its data. At most capacity screens are kept; the least
+    recently shown one is destroyed when another is built.
+
+    A screen shown with watch (a callable returning change counter versions)
+    also refreshes itself while visible, whenever the versions move.
+    """
+
+    def __init__(self, container, capacity=12):
+        self.container = container
+        self.capacity = capacity
+        self.screens = OrderedDict()
+        self.current = None
+        self.current_key = None
+        self.seen = {}
+        self.polling = None
+
+    def show(self, key, build, watch=None):
+        entry = self.screens.get(key)
+        if entry is None:
+            # Versions are read before the data, so a change in between is refreshed, not missed
+            self.seen[key] = self._versions(key, watch)
+            screen = ctk.CTkFrame(self.container, fg_color="transparent")
+            try:
+                refresh = build(screen)
+            except Exception:
+                screen.destroy()
+                raise
+            entry = (screen, refresh, watch)
+            self.screens[key] = entry
+            logging.debug(f"Built screen {key}")
+        else:
+            self.screens.move_to_end(key)
+            if entry[1] is not None:
+                self.seen[key] = self._versions(key, entry[2])
+                entry[1]()
+
+        screen = entry[0]
+        if self.current is not None and self.current is not screen and self.current.winfo_exists():
+            self.current.pack_forget()
+        screen.pack(fill="both", expand=True)
+        self.current = screen
+        self.current_key = key
+        self._evict()
+        if entry[2] is not None and entry[1] is not None and self.polling is None:
+            self.polling = self.container.after(WATCH_INTERVAL_MS, self._poll)
+
+    def _versions(self, key, watch):
+        if watch is None:
+            return None
+        try:
+            return watch()
+        except Exception as e:
+            logging.debug(f"Could not check screen {key} for changes: {e}")
+            return None
+
+    def _poll(self):
+        self.polling = None
+        key = self.current_key
+        entry = self.screens.get(key)
+        if entry is None or entry[2] is None or entry[1] is None or not self.container.winfo_exists():
+            return
+        screen, refresh, watch = entry
+        versions = self._versions(key, watch)
+        if versions is not None and versions != self.seen.get(key):
+            self.seen[key] = versions
+            logging.debug(f"Refreshing screen {key} after a change")
+            try:
+                refresh()
+            except Exception as e:
+                logging.error(f"Error refreshing screen {key}: {e}")
+        self.polling = self.container.after(WATCH_INTERVAL_MS, self._poll)
+
+    def _evict(self):
+        while len(self.screens) > self.capacity:
+            key, (screen, _, _) = next(iter(self.screens.items()))
+            if screen is self.current:
+                break
+            del self.screens[key]
+            self.seen.pop(key, None)
+            screen.destroy()
+            logging.debug(f"Evicted screen {key}")
+
+    def discard(self, keep=()):
+        """
+        Destroy every cached screen except the current one and those in keep,
+        e.g. on logout so the next user does not see the previous user's screens.
+        """
+        for key in [key for key in self.screens if key not in keep]:
+            screen, _, _ = self.screens[key]
+            if screen is self.current:
+                continue
+            del self.screens[key]
+            self.seen.pop(key, None)
+            screen.destroy()
+
+def get_screen_manager(container):
+    """
+    Return the ScreenManager for a container frame, creating it on first use.
+    """
+    manager = getattr(container, "screen_manager", None)
+    if manager is None:
+        manager = ScreenManager(container)
+        container.screen_manager = manager
+    return manager
@@ -0,0 +1,407 @@
+# server.py
+
+import argparse
+import asyncio
+import json
+import logging
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs, unquote
+
+from database import db_connection, manager, close_connection
+from log_config import configure_logging
+from migrations import apply_migrations, verify_query_plans
+from repositories import Record, BookingConflictError, HOT_QUERIES, report_repo
+from services import service, ServiceError, AuthenticationError, ValidationError
+from session import Session
+from tokens import create_authority
+from write_queue import write_queue
+from snapshots import snapshot_scheduler
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BODY = 1024 * 1024
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found",
+    405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def to_json(value):
+    """
+    JSON default hook: records and sessions become objects, tuples stay lists.
+    """
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, Session):
+        return dict(value.to_dict(), token=value.token, token_expires=value.token_expires)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+class ApiServer:
+    """
+    HTTP/JSON front end of the Service layer on asyncio.
+
+    The event loop only parses requests and writes responses; every service
+    call runs on a bounded thread pool, each worker with its own SQLite
+    connection from the ConnectionManager. bcrypt-bound calls (login, password
+    change) use a separate small pool so they cannot starve ordinary queries.
+    Requests beyond max_pending are answered 503 at once instead of queueing
+    without bound. Connections are kept alive between requests.
+    """
+
+    def __init__(self, service=service, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=8, auth_workers=2,
+                 max_pending=256):
+        self.service = service
+        self.host = host
+        self.port = port
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api-db")
+        self.auth_pool = ThreadPoolExecutor(max_workers=auth_workers, thread_name_prefix="api-auth")
+        self.max_pending = max_pending
+        self.pending = 0
+        # Signed tokens: checking one costs an HMAC, not a bcrypt verification
+        self.tokens = create_authority()
+        self.server = None
+        # (method, path pattern, handler, pool)
+        self.routes = [
+            ("GET", r"/health", self.health, None),
+            ("POST", r"/login", self.login, self.auth_pool),
+            ("POST", r"/logout", self.logout, self.pool),
+            ("POST", r"/token/refresh", self.refresh_token, self.pool),
+            ("POST", r"/password", self.change_password, self.auth_pool),
+            ("GET", r"/changes", self.change_versions, self.pool),
+            ("GET", r"/cancellation-requests", self.cancellation_requests, self.pool),
+            ("POST", r"/cancellation-requests/decide", self.decide_cancellations, self.pool),
+            ("PATCH", r"/records/(?P<table>\w+)/(?P<key>[^/]+)", self.edit_record, self.pool),
+            ("GET", r"/diagnostics/queries", self.query_statistics, self.pool),
+            ("DELETE", r"/diagnostics/queries", self.reset_query_statistics, self.pool),
+            ("GET", r"/diagnostics/cache", self.cache_statistics, self.pool),
+            ("GET", r"/reports/lecturers", self.lecturer_load, self.pool),
+            ("GET", r"/reports/departments", self.department_load, self.pool),
+            ("GET", r"/reports/weekly", self.weekly_volume, self.pool),
+            ("GET", r"/appointments", self.student_appointments, self.pool),
+            ("POST", r"/appointments", self.request_appointment, self.pool),
+            ("POST", r"/appointments/(?P<appointment_id>\d+)/cancellation-request", self.request_cancellation, self.pool),
+            ("DELETE", r"/appointments/(?P<appointment_id>\d+)", self.cancel_appointment, self.pool),
+            ("GET", r"/lecturers", self.lecturer_choices, self.pool),
+            ("GET", r"/lecturers/search", self.search_lecturers, self.pool),
+            ("GET", r"/students/search", self.search_students, self.pool),
+            ("GET", r"/lecturers/(?P<lecturer>[^/]+)/free-slots", self.free_slots, self.pool),
+            ("GET", r"/counseling-hours", self.counseling_hours, self.pool),
+            ("GET", r"/pending", self.pending_appointments, self.pool),
+            ("POST", r"/pending/decide", self.decide_pending, self.pool),
+        ]
+        self.routes = [(method, re.compile(pattern + r"$"), handler, pool) for method, pattern, handler, pool in self.routes]
+
+    # Sessions
+
+    def _session(self, headers):
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            raise AuthenticationError("Authentication required.")
+        return self.tokens.authenticate(token)
+
+    # Handlers; each runs on a pool thread and returns a JSON-serializable value
+
+    def health(self, request):
+        return {"status": "ok"}
+
+    def login(self, request):
+        body = request["body"]
+        session = self.service.login(_field(body, "username").strip(), _field(body, "password"))
+        self.tokens.issue(session)
+        return session
+
+    def logout(self, request):
+        session = self._session(request["headers"])
+        self.tokens.revoke(session.token)
+        self.service.logout(session)
+        return {}
+
+    def refresh_token(self, request):
+        session = self._session(request["headers"])
+        self.tokens.refresh(session)
+        return {"token": session.token, "token_expires": session.token_expires}
+
+    def change_password(self, request):
+        body = request["body"]
+        self.service.change_password(self._session(request["headers"]), _field(body, "old_password"),
+                                     _field(body, "new_password"))
+        return {}
+
+    def cancellation_requests(self, request):
+        return self.service.cancellation_requests(self._session(request["headers"]))
+
+    def decide_cancellations(self, request):
+        body = request["body"]
+        approved, rejected = self.service.decide_cancellations(
+            self._session(request["headers"]), _ids(body, "approve"), _ids(body, "reject")
+        )
+        return {"approved": approved, "rejected": rejected}
+
+    def edit_record(self, request):
+        body, match = request["body"], request["match"]
+        changed = self.service.edit_record(
+            self._session(request["headers"]), match["table"], unquote(match["key"]),
+            _field(body, "field"), _field(body, "value", (str, int, float), None)
+        )
+        return {"changed": changed}
+
+    def query_statistics(self, request):
+        return self.service.query_statistics(self._session(request["headers"]))
+
+    def cache_statistics(self, request):
+        return self.service.cache_statistics(self._session(request["headers"]))
+
+    def reset_query_statistics(self, request):
+        self.service.reset_query_statistics(self._session(request["headers"]))
+        return {}
+
+    def lecturer_load(self, request):
+        return self.service.lecturer_load(self._session(request["headers"]))
+
+    def department_load(self, request):
+        return self.service.department_load(self._session(request["headers"]))
+
+    def weekly_volume(self, request):
+        query = request["query"]
+        return self.service.weekly_volume(self._session(request["headers"]), query.get("first", ""), query.get("last", ""))
+
+    def change_versions(self, request):
+        names = request["query"].get("names", "")
+        return self.service.change_versions(self._session(request["headers"]), [n for n in names.split(",") if n])
+
+    def student_appointments(self, request):
+        return self.service.student_appointments(self._session(request["headers"]), request["query"].get("upcoming") == "1")
+
+    def request_appointment(self, request):
+        body = request["body"]
+        appointment_id = self.service.request_appointment(
+            self._session(request["headers"]), _field(body, "lecturer_number"), _field(body, "date"),
+            _field(body, "start_time"), _field(body, "end_time")
+        )
+        return {"appointment_id": appointment_id}
+
+    def request_cancellation(self, request):
+        self.service.request_cancellation(self._session(request["headers"]), int(request["match"]["appointment_id"]))
+        return {}
+
+    def cancel_appointment(self, request):
+        self.service.cancel_appointment(self._session(request["headers"]), int(request["match"]["appointment_id"]))
+        return {}
+
+    def lecturer_choices(self, request):
+        return self.service.lecturer_choices(self._session(request["headers"]))
+
+    def search_lecturers(self, request):
+        query = request["query"]
+        return self.service.search_lecturers(self._session(request["headers"]), query.get("q", ""), query.get("limit", 20))
+
+    def search_students(self, request):
+        query = request["query"]
+        return self.service.search_students(self._session(request["headers"]), query.get("q", ""), query.get("limit", 20))
+
+    def free_slots(self, request):
+        query = request["query"]
+        return self.service.free_slots(
+            self._session(request["headers"]), unquote(request["match"]["lecturer"]),
+            query.get("first", ""), query.get("last", ""), query.get("length", "30")
+        )
+
+    def counseling_hours(self, request):
+        return self.service.counseling_hours(self._session(request["headers"]), request["query"].get("upcoming") == "1")
+
+    def pending_appointments(self, request):
+        return self.service.pending_appointments(self._session(request["headers"]))
+
+    def decide_pending(self, request):
+        body = request["body"]
+        accepted, rejected = self.service.decide_pending(
+            self._session(request["headers"]), _ids(body, "accept"), _ids(body, "reject")
+        )
+        return {"accepted": accepted, "rejected": rejected}
+
+    # HTTP plumbing
+
+    async def _read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HttpError(400, "Malformed request line.")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise HttpError(400, "Invalid Content-Length header.")
+        if length > MAX_BODY:
+            raise HttpError(413, "Request body too large.")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target, version, headers, body
+
+    def _route(self, method, path):
+        allowed = False
+        for route_method, pattern, handler, pool in self.routes:
+            match = pattern.match(path)
+            if match:
+                if route_method == method:
+                    return handler, pool, match.groupdict()
+                allowed = True
+        if allowed:
+            raise HttpError(405, "Method not allowed.")
+        raise HttpError(404, "No such endpoint.")
+
+    async def _dispatch(self, method, target, headers, body):
+        url = urlsplit(target)
+        handler, pool, match = self._route(method, url.path)
+        try:
+            payload = json.loads(body) if body else {}
+        except ValueError:
+            raise HttpError(400, "Request body is not valid JSON.")
+        if not isinstance(payload, dict):
+            raise HttpError(400, "Request body must be a JSON object.")
+        request = {
+            "headers": headers,
+            "query": {name: values[-1] for name, values in parse_qs(url.query).items()},
+            "body": payload,
+            "match": match,
+        }
+        if pool is None:
+            return handler(request)
+        if self.pending >= self.max_pending:
+            raise HttpError(503, "Server is busy, try again shortly.")
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, handler, request)
+        finally:
+            self.pending -= 1
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, default=to_json).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, target, version, headers, body = request
+                    keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                    status, payload = 200, await self._dispatch(method, target, headers, body)
+                except HttpError as e:
+                    status, payload = e.status, {"error": "HttpError", "message": str(e)}
+                except BookingConflictError as e:
+                    status, payload = 409, {"error": "BookingConflictError", "message": str(e), "conflicts": e.conflicts}
+                except ServiceError as e:
+                    status, payload = e.status, {"error": type(e).__name__, "message": str(e)}
+                except sqlite3.IntegrityError as e:
+                    status, payload = 409, {"error": "IntegrityError", "message": f"An integrity error occurred: {e}"}
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                except Exception as e:
+                    logging.exception(f"Unhandled error serving request: {e}")
+                    status, payload = 500, {"error": "ServiceError", "message": f"An error occurred: {e}"}
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        logging.info(f"API server listening on {self.host}:{self.port}")
+        return self.server
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        for pool in (self.pool, self.auth_pool):
+            pool.shutdown(wait=True)
+        manager.close_all()
+
+# JSON type names for the messages of _field
+TYPE_NAMES = {str: "a string", int: "a number", float: "a number", list: "a list"}
+
+def _field(body, name, kinds=(str,), default=""):
+    """
+    body[name], or default if it is missing. Raises ValidationError (400) unless
+    the value is one of kinds, so the service never sees e.g. a list for a password.
+    """
+    value = body.get(name, default)
+    # type(), not isinstance(): JSON true and false must not pass as numbers
+    if type(value) not in kinds:
+        expected = " or ".join(dict.fromkeys(TYPE_NAMES[kind] for kind in kinds))
+        raise ValidationError(f"{name} must be {expected}.")
+    return value
+
+def _ids(body, name):
+    ids = _field(body, name, (list,), [])
+    try:
+        if all(type(app_id) in (int, str) for app_id in ids):
+            return [int(app_id) for app_id in ids]
+    except ValueError:
+        pass
+    raise ValidationError(f"{name} must be a list of appointment ids.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the FacultyOnSite API over HTTP/JSON.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=8, help="Threads running database work")
+    parser.add_argument("--auth-workers", type=int, default=2, help="Threads running bcrypt")
+    parser.add_argument("--max-pending", type=int, default=256, help="Requests in flight before answering 503")
+    args = parser.parse_args()
+    configure_logging()
+
+    apply_migrations(db_connection)
+    verify_query_plans(db_connection, HOT_QUERIES)
+    report_repo.check_not_paused()
+    snapshot_scheduler.start()
+    server = ApiServer(service, args.host, args.port, args.workers, args.auth_workers, args.max_pending)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        snapshot_scheduler.close()
+        write_queue.close()
+        close_connection()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+# services.py
+
+import logging
+import sqlite3
+
+from archive import history_repo
+from passwords import check_password, hash_password, needs_rehash
+from query_stats import stats
+from repositories import user_repo, student_repo, lecturer_repo, appointment_repo, availability, EDITABLE_REPOS
+from repositories import SEARCH_LIMIT, change_counter_repo, reference_cache, report_repo, token_epoch_repo
+from repositories import BookingConflictError
+from scheduling import slot_minutes, parse_date, now_minutes
+from session import sessions
+from write_queue import write_queue
+
+class ServiceError(Exception):
+    """
+    Base class of the errors the service layer reports to its callers.
+    status is the HTTP status the API server answers with.
+    """
+    status = 500
+
+class ValidationError(ServiceError):
+    status = 400
+
+class AuthenticationError(ServiceError):
+    status = 401
+
+class PermissionDenied(ServiceError):
+    status = 403
+
+class NotFound(ServiceError):
+    status = 404
+
+class Service:
+    """
+    Every Admin, Student and Faculty operation, independent of any UI.
+
+    Methods take the caller's Session and check its role, so the desktop app
+    (in-process) and the API server share the same rules. BookingConflictError
+    is passed through unchanged; sqlite3 errors propagate as they are.
+    Mutations run on the write queue and return once their group has committed.
+    """
+
+    def _require(self, session, *roles):
+        if session is None or not session.valid:
+            raise AuthenticationError("Your session has expired. Please log in again.")
+        if roles and session.role not in roles:
+            raise PermissionDenied(f"This operation is not available to {session.role} users.")
+
+    # Authentication
+
+    def login(self, username, password):
+        """
+        Verify a username and password and start a session. Runs bcrypt; call it off the UI thread.
+        """
+        user = user_repo.get(username)
+        # Unknown users and wrong passwords get the same answer
+        if not user or not check_password(password, user.password):
+            logging.info(f"Failed login for user: {username}")
+            raise AuthenticationError("Invalid username or password.")
+        if user.role not in ("admin", "student", "faculty"):
+            raise AuthenticationError("Role not recognized.")
+        if needs_rehash(user.password):
+            # The work factor changed since this hash was made; the password is known now
+            write_queue.call(user_repo.update_password, user.username, hash_password(password))
+            logging.info(f"Rehashed password of {user.username} with the current work factor")
+        logging.info(f"User {user.username} logged in as {user.role}")
+        return sessions.start(user)
+
+    def logout(self, session):
+        if session is not None:
+            sessions.end(session)
+
+    def change_password(self, session, old_password, new_password):
+        """
+        Replace the session user's password, end all of their sessions and
+        revoke every API token issued to them. Runs bcrypt twice.
+        """
+        self._require(session)
+        if not new_password:
+            raise ValidationError("New password must not be empty.")
+        user = user_repo.get(session.username)
+        if not user or not check_password(old_password, user.password):
+            raise AuthenticationError("Old password is incorrect.")
+        write_queue.call(_replace_password, session.username, hash_password(new_password))
+        # The old session must not outlive the password it was opened with
+        sessions.invalidate(session.username)
+
+    # Change notification
+
+    def change_versions(self, session, names):
+        """
+        Return {name: version} of change counters, for screens that refresh
+        only when what they show has changed. Cheap enough to poll.
+        """
+        self._require(session)
+        if not isinstance(names, (list, tuple)) or not all(isinstance(name, str) for name in names):
+            raise ValidationError("names must be a list of counter names.")
+        if len(names) > 50:
+            raise ValidationError("At most 50 counters can be read at once.")
+        return change_counter_repo.versions(list(names))
+
+    # Admin
+
+    def cancellation_requests(self, session):
+        self._require(session, "admin")
+        return appointment_repo.cancellation_requests()
+
+    def decide_cancellations(self, session, approve_ids, reject_ids):
+        self._require(session, "admin")
+        if not (approve_ids or reject_ids):
+            raise ValidationError("No requests selected.")
+        return write_queue.call(appointment_repo.decide_cancellations, list(approve_ids), list(reject_ids))
+
+    def edit_record(self, session, table, key, field, value):
+        """
+        Set one editable field of one row. Returns the number of rows changed.
+        """
+        self._require(session, "admin")
+        # Validate table and field names to prevent SQL injection
+        if table not in EDITABLE_REPOS:
+            raise ValidationError("Invalid table selected.")
+        repo = EDITABLE_REPOS[table]
+        if field not in repo.editable_fields:
+            raise ValidationError("Invalid field selected.")
+        if table == "Appointments" and field != "cancellation_requested" and not isinstance(value, str):
+            raise ValidationError(f"{field} must be text.")
+        try:
+            # Appointment dates and times are parsed by the repository
+            changed = write_queue.call(repo.update_field, key, field, value)
+        except ValueError as ve:
+            raise ValidationError(str(ve))
+        # A user whose profile row changed must log in again to see it
+        if changed and table in ("Students", "Lecturers"):
+            sessions.invalidate(key)
+        return changed
+
+    def search_students(self, session, text, limit=SEARCH_LIMIT):
+        self._require(session, "admin")
+        return student_repo.search(text, _search_limit(limit))
+
+    def query_statistics(self, session):
+        self._require(session, "admin")
+        return stats.snapshot()
+
+    def cache_statistics(self, session):
+        """
+        Hit rates of the reference data cache, one dict per table.
+        """
+        self._require(session, "admin")
+        return reference_cache.snapshot()
+
+    def reset_query_statistics(self, session):
+        """
+        Start the query and cache statistics over.
+        """
+        self._require(session, "admin")
+        stats.reset()
+        reference_cache.reset_statistics()
+
+    def lecturer_load(self, session):
+        self._require(session, "admin")
+        return report_repo.lecturer_load()
+
+    def department_load(self, session):
+        self._require(session, "admin")
+        return report_repo.department_load()
+
+    def weekly_volume(self, session, first_date, last_date):
+        """
+        Appointment counts and cancellation-request rate per week between two dates.
+        """
+        self._require(session, "admin")
+        try:
+            first, last = parse_date(first_date), parse_date(last_date)
+        except (TypeError, ValueError) as e:
+            raise ValidationError(str(e))
+        if last < first:
+            raise ValidationError("The last day must not be before the first day.")
+        return report_repo.weekly_volume(first.isoformat(), last.isoformat())
+
+    # Student
+
+    def student_appointments(self, session, upcoming=False):
+        """
+        The session student's appointments in start order; only those not yet started if upcoming.
+        Without upcoming the archive is included.
+        """
+        self._require(session, "student")
+        if upcoming:
+            return appointment_repo.upcoming_for_student(session.username, now_minutes())
+        return history_repo.for_student(session.username)
+
+    def lecturer_choices(self, session):
+        self._require(session)
+        return lecturer_repo.choices()
+
+    def search_lecturers(self, session, text, limit=SEARCH_LIMIT):
+        self._require(session)
+        return lecturer_repo.search(text, _search_limit(limit))
+
+    def free_slots(self, session, lecturer_number, first_date, last_date, length):
+        """
+        Return the lecturer's open (date, start_time, end_time) slots of length minutes.
+        """
+        self._require(session)
+        try:
+            first, last = parse_date(first_date), parse_date(last_date)
+            length = int(length)
+        except (TypeError, ValueError) as e:
+            raise ValidationError(str(e))
+        if length <= 0:
+            raise ValidationError("Length must be a positive number of minutes.")
+        if last < first:
+            raise ValidationError("The last day must not be before the first day.")
+        return availability.free_slots(lecturer_number, first.isoformat(), last.isoformat(), length)
+
+    def request_appointment(self, session, lecturer_number, date, start_time, end_time):
+        """
+        Book a Pending appointment for the session's student and return its id.
+        Raises BookingConflictError if the slot overlaps the lecturer's bookings.
+        """
+        self._require(session, "student")
+        if not (lecturer_number and date and start_time and end_time):
+            raise ValidationError("All fields are required.")
+        try:
+            starts_at, ends_at = slot_minutes(date, start_time, end_time)
+        except (AttributeError, ValueError) as ve:
+            raise ValidationError(str(ve))
+        if not lecturer_repo.exists(lecturer_number):
+            raise NotFound("Selected lecturer does not exist.")
+        # The student's profile was loaded with the session at login
+        if session.profile is None:
+            raise NotFound("Student record does not exist.")
+        return write_queue.call(appointment_repo.request, session.username, lecturer_number, starts_at, ends_at)
+
+    def request_cancellation(self, session, appointment_id):
+        self._require(session, "student")
+        if not appointment_id:
+            raise ValidationError("Appointment ID is required.")
+        if write_queue.call(appointment_repo.request_cancellation, appointment_id, session.username) == 0:
+            raise NotFound("No such appointment found or you are not authorized to cancel it.")
+
+    # Faculty
+
+    def counseling_hours(self, session, upcoming=False):
+        """
+        The session lecturer's appointments in start order; only those not yet started if upcoming.
+        Without upcoming the archive is included.
+        """
+        self._require(session, "faculty")
+        if upcoming:
+            return appointment_repo.upcoming_for_lecturer(session.username, now_minutes())
+        return history_repo.for_lecturer(session.username)
+
+    def pending_appointments(self, session):
+        self._require(session, "faculty")
+        return appointment_repo.pending_for_lecturer(session.username)
+
+    def decide_pending(self, session, accept_ids, reject_ids):
+        self._require(session, "faculty")
+        if not (accept_ids or reject_ids):
+            raise ValidationError("No appointments selected.")
+        return write_queue.call(appointment_repo.decide_pending, session.username, list(accept_ids), list(reject_ids))
+
+    def cancel_appointment(self, session, appointment_id):
+        self._require(session, "faculty")
+        if not appointment_id:
+            raise ValidationError("Appointment ID is required.")
+        if write_queue.call(appointment_repo.cancel_for_lecturer, appointment_id, session.username) == 0:
+            raise NotFound("No such appointment found or you are not authorized to cancel it.")
+
+def _replace_password(username, hashed):
+    # One write-queue operation: the new password and the epoch bump that
+    # rejects older tokens commit together, with or without an API server
+    user_repo.update_password(username, hashed)
+    token_epoch_repo.bump(username)
+
+def _search_limit(limit):
+    try:
+        return max(1, min(int(limit), 100))
+    except (TypeError, ValueError):
+        raise ValidationError("Search limit must be a number.")
+
+service = Service()
+
+def describe_error(e):
+    """
+    Message for an error raised by a service call, for display to the user.
+    """
+    if isinstance(e, (ServiceError, BookingConflictError)):
+        return str(e)
+    if isinstance(e, sqlite3.IntegrityError):
+        return f"An integrity error occurred: {e}"
+    return f"An error occurred: {e}"
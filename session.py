@@ -0,0 +1,98 @@
+# session.py
+
+import logging
+import threading
+
+from repositories import student_repo, lecturer_repo
+
+class Session:
+    """
+    Identity of a logged-in user, loaded once at login.
+
+    Holds the username, role and profile row (StudentRecord, LecturerRecord or
+    None for admins) so navigation and submissions do not look them up again.
+    A session stops being valid when its password changes or an admin edits
+    the user's profile; the holder must then log in again.
+    """
+
+    def __init__(self, user, profile=None):
+        self.username = user.username
+        self.role = user.role
+        self.profile = profile
+        self.valid = True
+        # Signed token and its expiry (epoch seconds), set by the API server
+        # and client; None for in-process sessions
+        self.token = None
+        self.token_expires = None
+
+    def invalidate(self):
+        self.valid = False
+
+    def to_dict(self):
+        return {
+            "username": self.username,
+            "role": self.role,
+            "profile": None if self.profile is None else self.profile.to_dict(),
+        }
+
+    def __repr__(self):
+        return f"Session(username={self.username!r}, role={self.role!r}, valid={self.valid})"
+
+class SessionRegistry:
+    """
+    Active sessions by username, so a change to one user's identity can reach
+    every session that cached it. A user may hold several sessions at once,
+    e.g. the desktop app and API clients.
+    """
+
+    def __init__(self):
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.listeners = []
+
+    def add_listener(self, callback):
+        """
+        Register callback(username) to run whenever a user's sessions are invalidated,
+        e.g. to revoke the API tokens issued to them.
+        """
+        self.listeners.append(callback)
+
+    def start(self, user):
+        """
+        Create a session for a user who has just logged in, loading their profile row.
+        """
+        if user.role == "student":
+            profile = student_repo.get(user.username)
+        elif user.role == "faculty":
+            profile = lecturer_repo.get(user.username)
+        else:
+            profile = None
+        session = Session(user, profile)
+        with self.lock:
+            self.sessions.setdefault(user.username, set()).add(session)
+        logging.debug(f"Started session for {user.username} ({user.role})")
+        return session
+
+    def invalidate(self, username):
+        """
+        End every session of a user.
+        """
+        with self.lock:
+            active = self.sessions.pop(username, set())
+        for session in active:
+            session.invalidate()
+        if active:
+            logging.debug(f"Invalidated {len(active)} session(s) for {username}")
+        for callback in self.listeners:
+            callback(username)
+
+    def end(self, session):
+        with self.lock:
+            active = self.sessions.get(session.username)
+            if active is not None:
+                active.discard(session)
+                if not active:
+                    del self.sessions[session.username]
+        session.invalidate()
+
+sessions = SessionRegistry()
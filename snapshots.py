@@ -0,0 +1,268 @@
+# snapshots.py
+
+import argparse
+import glob
+import logging
+import os
+import sqlite3
+import stat
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+from database import ConnectionManager, db_path
+from log_config import configure_logging
+from query_stats import InstrumentedConnection, stats
+
+# Snapshots are written here as <database>-snapshot-YYYYMMDD-HHMMSS.db
+SNAPSHOT_DIR = os.environ.get("FACULTYONSITE_SNAPSHOT_DIR", os.path.join(os.path.dirname(db_path), "snapshots"))
+# Minutes between scheduled snapshots in the app and the API server; 0 turns them off
+SNAPSHOT_MINUTES = float(os.environ.get("FACULTYONSITE_SNAPSHOT_MINUTES", 0))
+# Snapshots kept by prune(); the oldest are deleted first
+SNAPSHOT_KEEP = int(os.environ.get("FACULTYONSITE_SNAPSHOT_KEEP", 24))
+# Readers such as the table viewer use the latest snapshot only while it is
+# younger than this many minutes, and the live database otherwise. The default
+# allows one missed scheduled run; with the scheduler off it is 0, so a
+# snapshot taken by hand never stands in for live data.
+SNAPSHOT_MAX_AGE_MINUTES = float(os.environ.get("FACULTYONSITE_SNAPSHOT_MAX_AGE_MINUTES", 2 * SNAPSHOT_MINUTES))
+# Pages copied per backup step, and the pause after each step
+SNAPSHOT_PAGES = int(os.environ.get("FACULTYONSITE_SNAPSHOT_PAGES", 256))
+SNAPSHOT_PAUSE_MS = float(os.environ.get("FACULTYONSITE_SNAPSHOT_PAUSE_MS", 5))
+
+# Settings of connections to a snapshot. The file is opened immutable, so
+# reading it takes no locks and never touches the live database.
+SNAPSHOT_PRAGMAS = {
+    "query_only": "ON",
+    "cache_size": -16000,
+    "mmap_size": 268435456,
+    "temp_store": "MEMORY",
+}
+
+def snapshot_uri(path):
+    """
+    Read-only, lock-free URI of a snapshot file.
+    """
+    return f"file:{quote(os.path.abspath(path))}?mode=ro&immutable=1"
+
+def snapshot_manager_for(path):
+    """
+    ConnectionManager reading the snapshot at path.
+    """
+    return ConnectionManager(snapshot_uri(path), pragmas=SNAPSHOT_PRAGMAS)
+
+def open_snapshot(path):
+    """
+    One read-only connection to the snapshot at path, e.g. for a table viewer.
+    """
+    conn = sqlite3.connect(snapshot_uri(path), uri=True, check_same_thread=False, factory=InstrumentedConnection)
+    for name, value in SNAPSHOT_PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value};")
+    return conn
+
+class Snapshotter:
+    """
+    Point-in-time copies of a live database through the online backup API.
+
+    The source connection opens one read transaction and keeps it for the
+    whole copy, which advances pages_per_step pages at a time with a short
+    pause after each step. Under WAL a reader never blocks writers, so the
+    write path carries on; and because the snapshot is pinned, a commit
+    during the copy neither restarts it nor tears it. The WAL cannot be
+    checkpointed past the pinned snapshot until the copy finishes.
+
+    Copies are written to a .partial file, checked with quick_check, switched
+    from WAL to a single rollback-journal file, marked read-only and only then
+    renamed into place, so every listed snapshot is complete.
+    """
+
+    def __init__(self, path=db_path, directory=SNAPSHOT_DIR, pages_per_step=SNAPSHOT_PAGES,
+                 pause_ms=SNAPSHOT_PAUSE_MS, keep=SNAPSHOT_KEEP):
+        self.path = path
+        self.directory = directory
+        self.pages_per_step = pages_per_step
+        self.pause = pause_ms / 1000
+        self.keep = keep
+        self.prefix = os.path.splitext(os.path.basename(path))[0] + "-snapshot-"
+        self.lock = threading.Lock()
+
+    def snapshots(self):
+        """
+        Paths of the finished snapshots, newest first.
+        """
+        paths = glob.glob(os.path.join(glob.escape(self.directory), self.prefix + "*.db"))
+        # By name without ".db", so "...-120000-2" sorts after "...-120000"
+        return sorted(paths, key=lambda path: os.path.splitext(path)[0], reverse=True)
+
+    def latest(self):
+        snapshots = self.snapshots()
+        return snapshots[0] if snapshots else None
+
+    def fresh(self, max_age_minutes=SNAPSHOT_MAX_AGE_MINUTES):
+        """
+        The latest snapshot if it was taken less than max_age_minutes ago, else None.
+        """
+        latest = self.latest()
+        if latest is None or max_age_minutes <= 0:
+            return None
+        if datetime.now() - self.taken_at(latest) >= timedelta(minutes=max_age_minutes):
+            return None
+        return latest
+
+    @staticmethod
+    def taken_at(path):
+        """
+        The time a snapshot was taken, from its file name.
+        """
+        stamp = os.path.splitext(os.path.basename(path))[0].rsplit("-snapshot-", 1)[1]
+        return datetime.strptime(stamp[:15], "%Y%m%d-%H%M%S")
+
+    def take(self):
+        """
+        Copy the database to a new snapshot and return its path.
+        """
+        # One copy at a time: the scheduler and an explicit request may overlap
+        with self.lock, stats.timed("snapshot.take"):
+            os.makedirs(self.directory, exist_ok=True)
+            name = self.prefix + datetime.now().strftime("%Y%m%d-%H%M%S")
+            target = os.path.join(self.directory, name + ".db")
+            suffix = 1
+            while os.path.exists(target):
+                suffix += 1
+                target = os.path.join(self.directory, f"{name}-{suffix}.db")
+            partial = target + ".partial"
+            start = time.perf_counter()
+
+            source = sqlite3.connect(self.path, isolation_level=None)
+            destination = sqlite3.connect(partial, isolation_level=None)
+            try:
+                source.execute("PRAGMA busy_timeout = 5000")
+                # Pin the snapshot every step copies from
+                source.execute("BEGIN")
+                source.execute("SELECT COUNT(*) FROM sqlite_schema").fetchone()
+                source.backup(destination, pages=self.pages_per_step, progress=self._progress)
+                source.execute("COMMIT")
+                result = destination.execute("PRAGMA quick_check").fetchone()[0]
+                if result != "ok":
+                    raise sqlite3.DatabaseError(f"Snapshot failed its integrity check: {result}")
+                # A single self-contained file that opens without -wal or -shm
+                destination.execute("PRAGMA journal_mode = DELETE").fetchone()
+            except BaseException:
+                destination.close()
+                source.close()
+                _remove(partial)
+                raise
+            destination.close()
+            source.close()
+            os.chmod(partial, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+            os.replace(partial, target)
+            logging.info(f"Snapshot of {self.path} written to {target} "
+                         f"({os.path.getsize(target)} bytes in {time.perf_counter() - start:.1f} s)")
+            return target
+
+    def _progress(self, status, remaining, total):
+        # Between steps the source holds only its read snapshot; let the
+        # other threads of this process use the disk meanwhile
+        if remaining and self.pause:
+            time.sleep(self.pause)
+
+    def prune(self, keep=None):
+        """
+        Delete all but the newest keep snapshots and any leftover partial copies.
+        Returns the paths deleted. A snapshot still open elsewhere (Windows) is
+        left for the next run.
+        """
+        keep = self.keep if keep is None else keep
+        deleted = []
+        # Under the lock, so a copy in progress is not mistaken for a leftover
+        with self.lock:
+            partials = glob.glob(os.path.join(glob.escape(self.directory), self.prefix + "*.partial"))
+            for path in self.snapshots()[keep:] + partials:
+                if _remove(path):
+                    deleted.append(path)
+        if deleted:
+            logging.info(f"Deleted {len(deleted)} old snapshots of {self.path}")
+        return deleted
+
+def _remove(path):
+    try:
+        os.chmod(path, stat.S_IRUSR | stat.S_IWUSR)
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        logging.warning(f"Could not delete snapshot {path}: {e}")
+        return False
+
+class SnapshotScheduler:
+    """
+    Background thread taking a snapshot every interval minutes and pruning old ones.
+    """
+
+    def __init__(self, snapshotter, minutes=SNAPSHOT_MINUTES):
+        self.snapshotter = snapshotter
+        self.interval = minutes * 60
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.interval <= 0 or self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self._run, name="snapshots", daemon=True)
+        self.thread.start()
+        logging.info(f"Taking a snapshot every {self.interval / 60:g} minutes into {self.snapshotter.directory}")
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.snapshotter.take()
+                self.snapshotter.prune()
+            except Exception as e:
+                logging.error(f"Scheduled snapshot failed: {e}")
+
+    def close(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+snapshotter = Snapshotter()
+snapshot_scheduler = SnapshotScheduler(snapshotter)
+
+def main():
+    parser = argparse.ArgumentParser(description="Take, list and prune read-only snapshots of the database.")
+    parser.add_argument("command", choices=("take", "list", "prune", "run"),
+                        help="run: take a snapshot every --every minutes until interrupted")
+    parser.add_argument("--database", default=db_path)
+    parser.add_argument("--directory", default=SNAPSHOT_DIR)
+    parser.add_argument("--keep", type=int, default=SNAPSHOT_KEEP, help="Snapshots kept when pruning")
+    parser.add_argument("--every", type=float, default=SNAPSHOT_MINUTES or 60, help="Minutes between snapshots")
+    parser.add_argument("--pages", type=int, default=SNAPSHOT_PAGES, help="Pages copied per backup step")
+    args = parser.parse_args()
+    configure_logging()
+
+    snapshots = Snapshotter(args.database, args.directory, args.pages, keep=args.keep)
+    if args.command == "take":
+        print(snapshots.take())
+        snapshots.prune()
+    elif args.command == "list":
+        for path in snapshots.snapshots():
+            print(f"{Snapshotter.taken_at(path):%Y-%m-%d %H:%M:%S}  {os.path.getsize(path):>12}  {path}")
+    elif args.command == "prune":
+        for path in snapshots.prune():
+            print(f"Deleted {path}")
+    else:
+        print(snapshots.take())
+        snapshots.prune()
+        scheduler = SnapshotScheduler(snapshots, args.every)
+        scheduler.start()
+        try:
+            scheduler.thread.join()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            scheduler.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+# table_viewer.py
+
+import logging
+import customtkinter as ctk
+from tkinter import messagebox
+
+# Primary key used as the keyset tie-breaker for each viewable table
+PRIMARY_KEYS = {
+    "Students": "number",
+    "Lecturers": "number",
+    "Appointments": "appointment_id",
+}
+
+class KeysetPager:
+    """
+    Fetch pages of a table ordered by (sort column, primary key).
+
+    Pages are located with a keyset condition on the last row seen instead of
+    OFFSET, so fetching page 1000 costs the same as fetching page 1. Sorting and
+    filtering are pushed down into SQL.
+    """
+
+    def __init__(self, conn, table_name, page_size=50):
+        if table_name not in PRIMARY_KEYS:
+            raise ValueError(f"Invalid table name: {table_name}")
+        self.conn = conn
+        self.table_name = table_name
+        self.page_size = page_size
+        self.primary_key = PRIMARY_KEYS[table_name]
+        # table_xinfo also lists generated columns, which SELECT * returns
+        self.columns = [row[1] for row in conn.execute(f"PRAGMA table_xinfo({table_name})") if row[6] != 1]
+        self.sort_column = self.primary_key
+        self.descending = False
+        self.filter_column = None
+        self.filter_text = ""
+
+    def set_sort(self, column, descending=False):
+        if column not in self.columns:
+            raise ValueError(f"Invalid sort column: {column}")
+        self.sort_column = column
+        self.descending = descending
+
+    def set_filter(self, column, text):
+        """
+        Only return rows whose column contains text. An empty text clears the filter.
+        """
+        if column is not None and column not in self.columns:
+            raise ValueError(f"Invalid filter column: {column}")
+        self.filter_column = column if text else None
+        self.filter_text = text
+
+    def _key(self, row):
+        return (row[self.columns.index(self.sort_column)], row[self.columns.index(self.primary_key)])
+
+    def _fetch(self, after=None, before=None, reverse=False):
+        # Rows come back in display order unless reverse is set, in which case
+        # they are read backwards from the anchor and flipped afterwards.
+        ascending = self.descending == reverse
+        direction = "ASC" if ascending else "DESC"
+        conditions = []
+        params = []
+        if self.filter_column:
+            conditions.append(f"CAST({self.filter_column} AS TEXT) LIKE ? ESCAPE '\\'")
+            escaped = self.filter_text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"%{escaped}%")
+        anchor = after if after is not None else before
+        if anchor is not None:
+            operator = ">" if ascending else "<"
+            conditions.append(f"({self.sort_column}, {self.primary_key}) {operator} (?, ?)")
+            params.extend(anchor)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        sql = (
+            f"SELECT * FROM {self.table_name} {where} "
+            f"ORDER BY {self.sort_column} {direction}, {self.primary_key} {direction} LIMIT ?"
+        )
+        params.append(self.page_size)
+        rows = self.conn.execute(sql, params).fetchall()
+        if reverse:
+            rows.reverse()
+        return rows
+
+    def first_page(self):
+        return self._fetch()
+
+    def last_page(self):
+        return self._fetch(reverse=True)
+
+    def next_page(self, last_row):
+        """
+        Return the page that follows last_row in display order.
+        """
+        return self._fetch(after=self._key(last_row))
+
+    def previous_page(self, first_row):
+        """
+        Return the page that precedes first_row in display order.
+        """
+        return self._fetch(before=self._key(first_row), reverse=True)
+
+class TableViewer(ctk.CTkFrame):
+    """
+    Virtual-scrolling grid over a table.
+
+    Only visible_rows rows of label widgets are ever created; scrolling rebinds
+    their text. At most max_pages pages of rows are held in memory, so memory
+    stays flat however large the table is. With owns_connection the viewer
+    closes conn when it is destroyed, e.g. a snapshot connection opened for it.
+    """
+
+    def __init__(self, master, conn, table_name, visible_rows=12, page_size=50, max_pages=3,
+                 owns_connection=False):
+        super().__init__(master)
+        self.conn = conn
+        self.owns_connection = owns_connection
+        self.pager = KeysetPager(conn, table_name, page_size)
+        self.visible_rows = visible_rows
+        self.max_rows = page_size * max_pages
+        self.buffer = []
+        self.top = 0
+        self.at_start = True
+        self.at_end = True
+
+        columns = self.pager.columns
+
+        controls = ctk.CTkFrame(self)
+        controls.pack(fill="x", pady=5)
+        self.filter_column = ctk.CTkComboBox(controls, values=columns, width=140)
+        self.filter_column.set(columns[0])
+        self.filter_column.pack(side="left", padx=5)
+        self.filter_entry = ctk.CTkEntry(controls, placeholder_text="Filter")
+        self.filter_entry.pack(side="left", padx=5, fill="x", expand=True)
+        self.filter_entry.bind("<Return>", lambda event: self.apply_filter())
+        ctk.CTkButton(controls, text="Filter", width=70, command=self.apply_filter).pack(side="left", padx=5)
+
+        grid = ctk.CTkFrame(self)
+        grid.pack(fill="both", expand=True)
+        self.header_buttons = []
+        for col, name in enumerate(columns):
+            button = ctk.CTkButton(grid, text=name, width=60, command=lambda c=name: self.toggle_sort(c))
+            button.grid(row=0, column=col, sticky="ew", padx=1, pady=1)
+            grid.grid_columnconfigure(col, weight=1)
+            self.header_buttons.append(button)
+        self.cells = []
+        for row in range(visible_rows):
+            labels = []
+            for col in range(len(columns)):
+                label = ctk.CTkLabel(grid, text="", anchor="w")
+                label.grid(row=row + 1, column=col, sticky="ew", padx=2)
+                labels.append(label)
+            self.cells.append(labels)
+
+        navigation = ctk.CTkFrame(self)
+        navigation.pack(fill="x", pady=5)
+        ctk.CTkButton(navigation, text="First", width=60, command=self.go_first).pack(side="left", padx=5)
+        ctk.CTkButton(navigation, text="Prev", width=60, command=lambda: self.scroll(-visible_rows)).pack(side="left", padx=5)
+        ctk.CTkButton(navigation, text="Next", width=60, command=lambda: self.scroll(visible_rows)).pack(side="left", padx=5)
+        ctk.CTkButton(navigation, text="Last", width=60, command=self.go_last).pack(side="left", padx=5)
+        self.status_label = ctk.CTkLabel(navigation, text="")
+        self.status_label.pack(side="right", padx=5)
+
+        for widget in [grid] + [label for labels in self.cells for label in labels]:
+            widget.bind("<MouseWheel>", self._on_mousewheel)
+            widget.bind("<Button-4>", lambda event: self.scroll(-1))
+            widget.bind("<Button-5>", lambda event: self.scroll(1))
+
+        self.go_first()
+
+    def destroy(self):
+        # Also runs when the ScreenManager evicts or discards the screen
+        if self.owns_connection and self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        super().destroy()
+
+    def _on_mousewheel(self, event):
+        self.scroll(-1 if event.delta > 0 else 1)
+
+    def _load(self, rows, at_start, at_end, top):
+        self.buffer = rows
+        self.at_start = at_start
+        self.at_end = at_end
+        self.top = top
+        self.render()
+
+    def go_first(self):
+        rows = self.pager.first_page()
+        self._load(rows, True, len(rows) < self.pager.page_size, 0)
+
+    def go_last(self):
+        rows = self.pager.last_page()
+        self._load(rows, len(rows) < self.pager.page_size, True, max(0, len(rows) - self.visible_rows))
+
+    def scroll(self, delta):
+        """
+        Move the visible window by delta rows, fetching neighbouring pages by keyset as needed.
+        """
+        try:
+            top = self.top + delta
+            if top + self.visible_rows > len(self.buffer) and not self.at_end and self.buffer:
+                page = self.pager.next_page(self.buffer[-1])
+                self.at_end = len(page) < self.pager.page_size
+                self.buffer.extend(page)
+                overflow = len(self.buffer) - self.max_rows
+                if overflow > 0:
+                    del self.buffer[:overflow]
+                    top -= overflow
+                    self.at_start = False
+            if top < 0 and not self.at_start and self.buffer:
+                page = self.pager.previous_page(self.buffer[0])
+                self.at_start = len(page) < self.pager.page_size
+                self.buffer[:0] = page
+                top += len(page)
+                overflow = len(self.buffer) - self.max_rows
+                if overflow > 0:
+                    del self.buffer[-overflow:]
+                    self.at_end = False
+            self.top = max(0, min(top, len(self.buffer) - self.visible_rows))
+            self.render()
+        except Exception as e:
+            messagebox.showerror("Error", f"An error occurred: {e}")
+            logging.error(f"Error scrolling {self.pager.table_name}: {e}")
+
+    def toggle_sort(self, column):
+        descending = self.pager.sort_column == column and not self.pager.descending
+        self.pager.set_sort(column, descending)
+        for button in self.header_buttons:
+            name = button.cget("text").rstrip(" ▲▼")
+            marker = (" ▼" if descending else " ▲") if name == column else ""
+            button.configure(text=name + marker)
+        self.go_first()
+
+    def apply_filter(self):
+        self.pager.set_filter(self.filter_column.get(), self.filter_entry.get().strip())
+        self.go_first()
+
+    def render(self):
+        window = self.buffer[self.top:self.top + self.visible_rows]
+        for index, labels in enumerate(self.cells):
+            row = window[index] if index < len(window) else None
+            for col, label in enumerate(labels):
+                label.configure(text="" if row is None else str(row[col]))
+        if window:
+            self.status_label.configure(text=f"Showing {len(window)} rows")
+        else:
+            self.status_label.configure(text="No data found.")
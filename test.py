@@ -1,32 +1,40 @@
 # test.py
 
 import sqlite3
-from database import db_connection, cursor, hash_password, close_connection
+from database import db_connection, cursor, close_connection
+from bulk_import import hash_passwords
 import logging
+from log_config import configure_logging
+from migrations import apply_migrations
+from scheduling import slot_minutes
 
 def insert_users():
     """
     Insert users into the Users table.
     """
-    users = [
+    accounts = [
         # Admin Users
-        ('admin1', hash_password('Admin@123'), 'admin'),
-        ('admin2', hash_password('Admin@456'), 'admin'),
-        ('admin3', hash_password('Admin@789'), 'admin'),
+        ('admin1', 'Admin@123', 'admin'),
+        ('admin2', 'Admin@456', 'admin'),
+        ('admin3', 'Admin@789', 'admin'),
         
         # Student Users
-        ('student1', hash_password('Student@123'), 'student'),
-        ('student2', hash_password('Student@123'), 'student'),
-        ('student3', hash_password('Student@123'), 'student'),
-        ('student4', hash_password('Student@123'), 'student'),
+        ('student1', 'Student@123', 'student'),
+        ('student2', 'Student@123', 'student'),
+        ('student3', 'Student@123', 'student'),
+        ('student4', 'Student@123', 'student'),
         
         # Faculty Users
-        ('faculty1', hash_password('Faculty@123'), 'faculty'),
-        ('faculty2', hash_password('Faculty@123'), 'faculty'),
-        ('faculty3', hash_password('Faculty@123'), 'faculty'),
-        ('faculty4', hash_password('Faculty@123'), 'faculty'),
+        ('faculty1', 'Faculty@123', 'faculty'),
+        ('faculty2', 'Faculty@123', 'faculty'),
+        ('faculty3', 'Faculty@123', 'faculty'),
+        ('faculty4', 'Faculty@123', 'faculty'),
     ]
     
+    # Hash across all cores instead of one bcrypt call at a time
+    hashes = hash_passwords([password for _, password, _ in accounts])
+    users = [(username, hashed, role) for (username, _, role), hashed in zip(accounts, hashes)]
+
     try:
         cursor.executemany("INSERT INTO Users (username, password, role) VALUES (?, ?, ?);", users)
         logging.debug("Inserted users into Users table.")
@@ -93,10 +101,14 @@ def insert_appointments():
         ('student4', 'faculty4', '2024-05-13', '16:00', '17:00', 'Pending'),
     ]
     
+    # Appointments store their slot as epoch minutes (migration 5)
+    appointments = [(student, lecturer, *slot_minutes(date, start, end), status)
+                    for student, lecturer, date, start, end, status in appointments]
+
     try:
         cursor.executemany("""
-            INSERT INTO Appointments (student_number, lecturer_number, date, start_time, end_time, status)
-            VALUES (?, ?, ?, ?, ?, ?);
+            INSERT INTO Appointments (student_number, lecturer_number, starts_at, ends_at, status)
+            VALUES (?, ?, ?, ?, ?);
         """, appointments)
         logging.debug("Inserted appointments into Appointments table.")
     except sqlite3.IntegrityError as ie:
@@ -106,7 +118,9 @@ def insert_appointments():
         raise e
 
 def main():
+    configure_logging()
     try:
+        apply_migrations(db_connection)
         insert_users()
         insert_students()
         insert_lecturers()
@@ -0,0 +1,150 @@
+# test_repositories.py
+
+import sqlite3
+
+import pytest
+
+from repositories import AppointmentRepo, BookingConflictError, ChangeCounterRepo, ReportRepo
+from scheduling import AvailabilityEngine, epoch_minutes
+
+def slot(date, start_time, end_time):
+    return epoch_minutes(date, start_time), epoch_minutes(date, end_time)
+
+def summaries(conn):
+    # Counts that dropped to zero are kept by the triggers but not by a rebuild
+    return (conn.execute("SELECT * FROM LecturerLoad WHERE appointments != 0 ORDER BY 1, 2").fetchall(),
+            conn.execute("SELECT * FROM WeeklyVolume WHERE appointments != 0 ORDER BY 1, 2").fetchall())
+
+@pytest.fixture
+def appointments(db):
+    return AppointmentRepo(db)
+
+@pytest.fixture
+def reports(db):
+    return ReportRepo(db)
+
+# Overlap check
+
+def test_request_rejects_overlapping_slot(appointments):
+    first = appointments.request("S1", "L1", *slot("2031-01-06", "10:00", "11:00"))
+    with pytest.raises(BookingConflictError) as raised:
+        appointments.request("S2", "L1", *slot("2031-01-06", "10:30", "11:30"))
+    assert [c.appointment_id for c in raised.value.conflicts] == [first]
+
+def test_request_allows_touching_slots_and_other_lecturers(appointments):
+    appointments.request("S1", "L1", *slot("2031-01-06", "10:00", "11:00"))
+    # Slots are half-open, so back-to-back appointments do not overlap
+    appointments.request("S2", "L1", *slot("2031-01-06", "11:00", "12:00"))
+    appointments.request("S2", "L1", *slot("2031-01-06", "09:00", "10:00"))
+    appointments.request("S2", "L2", *slot("2031-01-06", "10:00", "11:00"))
+
+def test_cancelled_appointment_frees_its_slot(appointments):
+    first = appointments.request("S1", "L1", *slot("2031-01-06", "10:00", "11:00"))
+    assert appointments.cancel_for_lecturer(first, "L1") == 1
+    appointments.request("S2", "L1", *slot("2031-01-06", "10:00", "11:00"))
+
+def test_edit_cannot_move_onto_another_booking(appointments):
+    first = appointments.request("S1", "L1", *slot("2031-01-06", "10:00", "11:00"))
+    second = appointments.request("S2", "L1", *slot("2031-01-06", "12:00", "13:00"))
+    with pytest.raises(BookingConflictError):
+        appointments.update_field(second, "start_time", "10:30")
+    # The appointment's own slot never conflicts with itself
+    assert appointments.update_field(second, "start_time", "11:00") == 1
+    assert appointments.update_field(first, "end_time", "10:45") == 1
+    third = appointments.request("S1", "L1", *slot("2031-01-07", "10:30", "11:30"))
+    with pytest.raises(BookingConflictError):
+        appointments.update_field(first, "date", "2031-01-07")
+    appointments.update_field(third, "status", "Cancelled")
+    assert appointments.update_field(first, "date", "2031-01-07") == 1
+    with pytest.raises(BookingConflictError):
+        appointments.update_field(third, "status", "Pending")
+
+def test_edit_rejects_inverted_slot(db, appointments):
+    first = appointments.request("S1", "L1", *slot("2031-01-06", "10:00", "11:00"))
+    with pytest.raises(ValueError):
+        appointments.update_field(first, "end_time", "09:00")
+    with pytest.raises(ValueError):
+        appointments.update_field(first, "start_time", "11:00")
+    row = db.connection().execute("SELECT start_time, end_time FROM Appointments WHERE appointment_id = ?",
+                                  (first,)).fetchone()
+    assert tuple(row) == ("10:00", "11:00")
+
+# Availability cache
+
+def test_availability_sees_bookings_from_another_connection(db, appointments):
+    engine = AvailabilityEngine(appointments, versions=ChangeCounterRepo(db).versions)
+    assert engine.busy("L1", "2031-01-06", "2031-01-06") == {"2031-01-06": []}
+    other = sqlite3.connect(db.path)
+    try:
+        other.execute("INSERT INTO Appointments (student_number, lecturer_number, starts_at, ends_at, status) "
+                      "VALUES ('S1', 'L1', ?, ?, 'Pending')", slot("2031-01-06", "10:00", "11:00"))
+        other.commit()
+    finally:
+        other.close()
+    assert engine.busy("L1", "2031-01-06", "2031-01-06") == {"2031-01-06": [(600, 660)]}
+
+def test_availability_does_not_keep_days_invalidated_while_loading(appointments):
+    class RacingRepo:
+        # The first read is overtaken by a write that invalidates the lecturer
+        def __init__(self):
+            self.reads = 0
+
+        def active_between(self, lecturer_number, first_date, last_date):
+            self.reads += 1
+            if self.reads == 1:
+                engine.invalidate(lecturer_number)
+            return appointments.active_between(lecturer_number, first_date, last_date)
+
+    repo = RacingRepo()
+    engine = AvailabilityEngine(repo)
+    engine.busy("L1", "2031-01-06", "2031-01-06")
+    engine.busy("L1", "2031-01-06", "2031-01-06")
+    assert repo.reads == 2
+    engine.busy("L1", "2031-01-06", "2031-01-06")
+    assert repo.reads == 2
+
+# Report summaries
+
+def test_rebuild_matches_trigger_maintained_summaries(db, appointments, reports):
+    ids = []
+    for day in range(20):
+        date = f"2031-01-{day + 1:02d}"
+        ids.append(appointments.request("S1", "L1", *slot(date, "10:00", "11:00")))
+        ids.append(appointments.request("S2", "L2", *slot(date, "14:00", "15:00")))
+    appointments.decide_pending("L1", ids[0:10:2], ids[10:14:2])
+    for app_id in ids[20:30]:
+        appointments.request_cancellation(app_id, "S1" if app_id in ids[::2] else "S2")
+    appointments.decide_cancellations(ids[20:24], ids[24:26])
+    appointments.approve_cancellation(ids[26])
+    appointments.cancel_for_lecturer(ids[31], "L2")
+    appointments.update_field(ids[32], "date", "2031-02-20")
+    appointments.update_field(ids[33], "status", "Scheduled")
+    appointments.delete_many(ids[36:38])
+
+    maintained = summaries(db.connection())
+    assert reports.rebuild() == len(ids) - 2 - 2
+    assert summaries(db.connection()) == maintained
+    weeks = reports.weekly_volume("2031-01-01", "2031-02-28")
+    assert sum(w.cancelled for w in weeks) == 6
+    assert sum(w.cancellation_requests for w in weeks) == 8
+
+def test_paused_deletes_leave_summaries(db, appointments, reports):
+    ids = [appointments.request("S1", "L1", *slot(f"2031-01-{day:02d}", "10:00", "11:00")) for day in range(1, 6)]
+    before = summaries(db.connection())
+    with reports.paused():
+        appointments.delete_many(ids[:3])
+    assert summaries(db.connection()) == before
+    assert db.connection().execute("SELECT COUNT(*) FROM ReportsPaused").fetchone()[0] == 0
+    appointments.delete_many(ids[3:])
+    assert summaries(db.connection()) != before
+
+def test_left_over_pause_flag_is_reported_and_cleared(db, reports):
+    conn = db.connection()
+    reports.check_not_paused()
+    conn.execute(ReportRepo.PAUSE)
+    conn.commit()
+    with pytest.raises(RuntimeError):
+        reports.check_not_paused()
+    with reports.paused():
+        pass
+    reports.check_not_paused()
@@ -0,0 +1,69 @@
+# test_table_viewer.py
+
+import pytest
+
+from table_viewer import KeysetPager
+
+# (number, department): ties in department are broken by number
+ROWS = [("S1", "Physics"), ("S2", "Mathematics"), ("S3", "Physics"), ("S4", "Chemistry"), ("S5", "Physics"),
+        ("S6", "Mathematics"), ("S7", "Physics"), ("S8", "100%_Physics")]
+
+@pytest.fixture
+def conn(db):
+    conn = db.connection()
+    conn.executemany("INSERT OR IGNORE INTO Users (username, password, role) VALUES (?, 'unused', 'student')",
+                     [(number,) for number, _ in ROWS])
+    conn.execute("DELETE FROM Students")
+    conn.executemany("INSERT INTO Students (number, name, surname, department, year, email, phone) "
+                     "VALUES (?, 'N', 'S', ?, '1', 'e', 'p')", ROWS)
+    conn.commit()
+    return conn
+
+def numbers(rows):
+    return [row[0] for row in rows]
+
+def walk_forward(pager):
+    pages = [pager.first_page()]
+    while pages[-1]:
+        pages.append(pager.next_page(pages[-1][-1]))
+    return pages[:-1]
+
+def walk_backward(pager):
+    pages = [pager.last_page()]
+    while pages[-1]:
+        pages.append(pager.previous_page(pages[-1][0]))
+    return pages[:-1]
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_pages_cover_every_row_once_across_ties(conn, descending):
+    pager = KeysetPager(conn, "Students", page_size=3)
+    pager.set_sort("department", descending)
+    expected = [number for number, _ in sorted(ROWS, key=lambda row: (row[1], row[0]), reverse=descending)]
+    forward = walk_forward(pager)
+    assert [len(page) for page in forward] == [3, 3, 2]
+    assert [n for page in forward for n in numbers(page)] == expected
+    backward = walk_backward(pager)
+    assert [len(page) for page in backward] == [3, 3, 2]
+    assert [n for page in reversed(backward) for n in numbers(page)] == expected
+
+def test_page_edges_are_empty(conn):
+    pager = KeysetPager(conn, "Students", page_size=len(ROWS))
+    page = pager.first_page()
+    assert numbers(page) == sorted(number for number, _ in ROWS)
+    assert pager.next_page(page[-1]) == []
+    assert pager.previous_page(page[0]) == []
+    assert pager.last_page() == page
+
+def test_filter_matches_wildcards_literally(conn):
+    pager = KeysetPager(conn, "Students", page_size=10)
+    pager.set_filter("department", "%_")
+    assert numbers(pager.first_page()) == ["S8"]
+    pager.set_filter("department", "")
+    assert len(pager.first_page()) == len(ROWS)
+
+def test_unknown_columns_are_refused(conn):
+    pager = KeysetPager(conn, "Students")
+    with pytest.raises(ValueError):
+        pager.set_sort("number; DROP TABLE Students", False)
+    with pytest.raises(ValueError):
+        KeysetPager(conn, "Users")
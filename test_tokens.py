@@ -0,0 +1,84 @@
+# test_tokens.py
+
+import json
+import sqlite3
+import time
+
+import pytest
+
+from reference_cache import ReferenceCache
+from repositories import ChangeCounterRepo, TokenEpochRepo, UserRecord, token_epoch_repo
+from services import AuthenticationError, service
+from session import sessions
+from tokens import TokenAuthority, _b64encode
+
+@pytest.fixture
+def epochs(db):
+    return TokenEpochRepo(db, cache=ReferenceCache(ChangeCounterRepo(db).versions))
+
+@pytest.fixture
+def authority(epochs):
+    return TokenAuthority("test-secret", ttl=60, epochs=epochs)
+
+@pytest.fixture
+def session():
+    session = sessions.start(UserRecord(username="admin1", role="admin"))
+    yield session
+    sessions.end(session)
+
+def signed(authority, claims):
+    payload = _b64encode(json.dumps(claims).encode("utf-8"))
+    return f"{payload}.{authority._sign(payload)}"
+
+def test_epoch_bump_by_another_connection_revokes_tokens(db, authority, session):
+    token = authority.issue(session)
+    assert authority.authenticate(token) is session
+    other = sqlite3.connect(db.path)
+    try:
+        other.execute("INSERT INTO TokenEpochs (username, epoch) VALUES ('admin1', 1) "
+                      "ON CONFLICT (username) DO UPDATE SET epoch = epoch + 1")
+        other.commit()
+    finally:
+        other.close()
+    with pytest.raises(AuthenticationError):
+        authority.authenticate(token)
+    assert authority.authenticate(authority.issue(session)) is session
+
+def test_password_change_through_service_revokes_earlier_tokens(live_db):
+    session = service.login("S1", "Secret@123")
+    token = TokenAuthority("test-secret", epochs=token_epoch_repo).issue(session)
+    # A second authority knows no session for the token, e.g. after a restart,
+    # so only the epoch can reject it
+    assert TokenAuthority("test-secret", epochs=token_epoch_repo).authenticate(token).username == "S1"
+    service.change_password(session, "Secret@123", "Changed@456")
+    with pytest.raises(AuthenticationError):
+        TokenAuthority("test-secret", epochs=token_epoch_repo).authenticate(token)
+    fresh = service.login("S1", "Changed@456")
+    token = TokenAuthority("test-secret", epochs=token_epoch_repo).issue(fresh)
+    assert TokenAuthority("test-secret", epochs=token_epoch_repo).authenticate(token).username == "S1"
+
+def test_revoked_token_is_refused(authority, session):
+    token = authority.issue(session)
+    authority.revoke(token)
+    with pytest.raises(AuthenticationError):
+        authority.authenticate(token)
+
+def test_tampered_token_is_refused(authority, session):
+    payload, _, signature = authority.issue(session).partition(".")
+    with pytest.raises(AuthenticationError):
+        authority.authenticate(f"{payload}x.{signature}")
+
+@pytest.mark.parametrize("claims", [
+    {"u": "admin1", "r": "admin", "i": "t1", "e": 0},
+    {"u": "admin1", "r": "admin", "i": "t1", "x": "9999999999", "e": 0},
+    {"u": "admin1", "r": "admin", "i": "t1", "x": 9999999999, "e": True},
+    ["admin1"],
+])
+def test_signed_token_with_bad_claims_is_refused(authority, claims):
+    with pytest.raises(AuthenticationError):
+        authority.authenticate(signed(authority, claims))
+
+def test_expired_token_is_refused(authority):
+    claims = {"u": "admin1", "r": "admin", "i": "t1", "x": int(time.time()) - 1, "e": 0}
+    with pytest.raises(AuthenticationError, match="expired"):
+        authority.authenticate(signed(authority, claims))
@@ -0,0 +1,65 @@
+# test_write_queue.py
+
+import sqlite3
+import threading
+
+import pytest
+
+from write_queue import WriteQueue
+
+@pytest.fixture
+def queue(db):
+    conn = db.connection()
+    conn.execute("CREATE TABLE Items (name TEXT PRIMARY KEY)")
+    conn.commit()
+    writer = WriteQueue(db)
+    yield writer
+    writer.close()
+
+def items(db):
+    return {row[0] for row in db.connection().execute("SELECT name FROM Items")}
+
+def test_failing_operation_is_rolled_back_alone(db, queue):
+    def add(name):
+        db.connection().execute("INSERT INTO Items (name) VALUES (?)", (name,))
+        return name
+
+    def add_then_fail(name):
+        add(name)
+        raise ValueError(f"{name} failed")
+
+    # Hold the writer in a first group so the next three queue up as one group
+    started, release = threading.Event(), threading.Event()
+    held = queue.submit(lambda: (started.set(), release.wait()))
+    started.wait()
+    futures = [queue.submit(add, "a"), queue.submit(add_then_fail, "b"), queue.submit(add, "c")]
+    release.set()
+
+    held.result()
+    assert futures[0].result() == "a"
+    with pytest.raises(ValueError, match="b failed"):
+        futures[1].result()
+    assert futures[2].result() == "c"
+    assert items(db) == {"a", "c"}
+    assert (queue.groups, queue.operations) == (2, 4)
+
+def test_failed_commit_fails_the_whole_group(db, queue):
+    queue.call(lambda: db.connection().execute("INSERT INTO Items (name) VALUES ('a')"))
+    # A constraint checked only at commit time fails every operation of the group
+    def defer_violation():
+        conn = db.connection()
+        conn.execute("PRAGMA defer_foreign_keys = ON")
+        conn.execute("INSERT INTO Students (number, name, surname, department, year, email, phone) "
+                     "VALUES ('nobody', 'N', 'N', 'N', '1', 'n', 'n')")
+
+    with pytest.raises(sqlite3.IntegrityError):
+        queue.call(defer_violation)
+    assert items(db) == {"a"}
+    assert queue.call(lambda: 42) == 42
+
+def test_nested_call_joins_the_running_group(db, queue):
+    def outer():
+        return queue.call(lambda: "inner")
+
+    assert queue.call(outer) == "inner"
+    assert queue.operations == 1
@@ -0,0 +1,166 @@
+# tokens.py
+
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+
+from repositories import token_epoch_repo, UserRecord
+from services import AuthenticationError
+from session import sessions
+from write_queue import write_queue
+
+# Lifetime of an API session token in seconds; clients refresh before it runs out
+TOKEN_TTL = int(os.environ.get("FACULTYONSITE_TOKEN_TTL", 900))
+# Signing key. Without it a random key is used, so tokens do not survive a restart.
+SECRET_VARIABLE = "FACULTYONSITE_TOKEN_SECRET"
+# Claim -> type every token must carry
+CLAIM_TYPES = {"u": str, "r": str, "i": str, "x": int, "e": int}
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+class TokenAuthority:
+    """
+    Issue and verify HMAC-SHA256 signed session tokens.
+
+    A token carries the username, role, a token id, its expiry and the user's
+    token epoch. Verifying one is an HMAC and a few dictionary lookups, with no
+    bcrypt and usually no database access. Tokens are revoked server side in
+    two ways:
+    - logout adds the token id to a deny list until the token would expire;
+    - revoke_user bumps the user's epoch in TokenEpochs, rejecting every token
+      issued before. The registry calls it whenever a user's sessions are
+      invalidated (password change, profile edit).
+    Epochs are read through the reference cache, which reloads them once the
+    TokenEpochs change counter moves, so a bump by another server process or
+    connection takes effect on the next request here.
+    """
+
+    def __init__(self, secret=None, ttl=TOKEN_TTL, epochs=token_epoch_repo):
+        secret = secret or os.environ.get(SECRET_VARIABLE)
+        if not secret:
+            logging.warning(f"{SECRET_VARIABLE} is not set; using a random key for this process")
+            secret = secrets.token_hex(32)
+        self.key = secret.encode("utf-8") if isinstance(secret, str) else secret
+        self.ttl = ttl
+        self.epochs = epochs
+        self.lock = threading.Lock()
+        self.denied = {}
+        # token id -> Session, so a verified token maps back to its profile
+        self.sessions = {}
+
+    def _sign(self, payload):
+        return _b64encode(hmac.new(self.key, payload.encode("ascii"), hashlib.sha256).digest())
+
+    def issue(self, session):
+        """
+        Sign a token for a session that has just logged in (or refreshed).
+        Sets session.token and session.token_expires and returns the token.
+        """
+        token_id = secrets.token_urlsafe(12)
+        expires = int(time.time()) + self.ttl
+        claims = {"u": session.username, "r": session.role, "i": token_id,
+                  "x": expires, "e": self.epochs.get(session.username)}
+        payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+        session.token = f"{payload}.{self._sign(payload)}"
+        session.token_expires = expires
+        with self.lock:
+            self.sessions[token_id] = session
+            self._prune()
+        return session.token
+
+    def _claims(self, token):
+        payload, _, signature = token.partition(".")
+        if not signature or not hmac.compare_digest(signature, self._sign(payload)):
+            raise AuthenticationError("Invalid session token.")
+        try:
+            claims = json.loads(_b64decode(payload))
+        except ValueError:
+            raise AuthenticationError("Invalid session token.")
+        # Signed, but possibly by an older release or with a leaked key
+        if not isinstance(claims, dict) or any(
+                type(claims.get(name)) is not kind for name, kind in CLAIM_TYPES.items()):
+            raise AuthenticationError("Invalid session token.")
+        if claims["x"] < time.time():
+            raise AuthenticationError("Your session has expired. Please log in again.")
+        return claims
+
+    def authenticate(self, token):
+        """
+        Return the Session for a valid token or raise AuthenticationError.
+        """
+        claims = self._claims(token)
+        token_id = claims["i"]
+        with self.lock:
+            denied = token_id in self.denied
+            session = self.sessions.get(token_id)
+        if denied or claims["e"] != self.epochs.get(claims["u"]):
+            raise AuthenticationError("Your session has expired. Please log in again.")
+        if session is not None and not session.valid:
+            raise AuthenticationError("Your session has expired. Please log in again.")
+        if session is None:
+            # Signed by this key but issued before a restart: rebuild the session without bcrypt
+            session = sessions.start(UserRecord(username=claims["u"], role=claims["r"]))
+            session.token, session.token_expires = token, claims["x"]
+            with self.lock:
+                self.sessions[token_id] = session
+        return session
+
+    def refresh(self, session):
+        """
+        Issue a fresh token for an authenticated session and revoke the old one.
+        """
+        old = session.token
+        token = self.issue(session)
+        self._deny(self._claims(old))
+        return token
+
+    def revoke(self, token):
+        """
+        Revoke one token, e.g. on logout.
+        """
+        try:
+            claims = self._claims(token)
+        except AuthenticationError:
+            return
+        self._deny(claims)
+
+    def _deny(self, claims):
+        with self.lock:
+            self.denied[claims["i"]] = claims["x"]
+            self.sessions.pop(claims["i"], None)
+
+    def revoke_user(self, username):
+        """
+        Revoke every token issued to a user so far.
+        """
+        write_queue.call(self.epochs.bump, username)
+        with self.lock:
+            for token_id in [i for i, s in self.sessions.items() if s.username == username]:
+                del self.sessions[token_id]
+        logging.info(f"Revoked all tokens of {username}")
+
+    def _prune(self):
+        # Called with the lock held; drops entries of tokens that have expired anyway
+        now = time.time()
+        if len(self.denied) > 1024:
+            self.denied = {i: x for i, x in self.denied.items() if x >= now}
+        if len(self.sessions) > 4096:
+            self.sessions = {i: s for i, s in self.sessions.items() if s.token_expires >= now}
+
+def create_authority(secret=None, ttl=TOKEN_TTL):
+    """
+    Create a TokenAuthority whose user revocation follows the session registry.
+    """
+    authority = TokenAuthority(secret, ttl)
+    sessions.add_listener(authority.revoke_user)
+    return authority
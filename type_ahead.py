@@ -0,0 +1,98 @@
+# type_ahead.py
+
+import logging
+
+import customtkinter as ctk
+
+class TypeAheadPicker(ctk.CTkFrame):
+    """
+    Entry that searches as the user types and offers the top matches.
+
+    search(text, limit) returns at most limit rows; it runs once the user has stopped
+    typing for delay milliseconds, so a fast typist costs one query rather than
+    one per key. The result buttons are a fixed pool created once and relabelled
+    on every search. describe(row) is the button text and key(row) the value
+    the picker selects.
+    """
+
+    def __init__(self, master, search, describe, key, on_select=None, delay=250, limit=20,
+                 placeholder_text="Type to search"):
+        super().__init__(master)
+        self.search = search
+        self.describe = describe
+        self.key = key
+        self.on_select = on_select
+        self.delay = delay
+        self.limit = limit
+        self.selected_key = None
+        self.pending = None
+        self.last_text = None
+
+        self.entry = ctk.CTkEntry(self, placeholder_text=placeholder_text, width=300)
+        self.entry.pack(pady=5)
+        self.entry.bind("<KeyRelease>", self._schedule)
+        self.status = ctk.CTkLabel(self, text="")
+        self.status.pack()
+        self.results = ctk.CTkScrollableFrame(self, width=300, height=150)
+        self.results.pack(pady=5)
+        self.buttons = []
+        self.rows = []
+        self.default_color = ctk.ThemeManager.theme["CTkButton"]["fg_color"]
+        for index in range(limit):
+            button = ctk.CTkButton(self.results, text="", anchor="w", command=lambda i=index: self._choose(i))
+            self.buttons.append(button)
+
+    def _schedule(self, event=None):
+        # Debounce: restart the timer on every key and search only when it fires
+        if self.pending is not None:
+            self.after_cancel(self.pending)
+        self.pending = self.after(self.delay, self._run_search)
+
+    def _run_search(self):
+        self.pending = None
+        text = self.entry.get().strip()
+        if text == self.last_text:
+            return
+        self.last_text = text
+        self.selected_key = None
+        try:
+            # Only as many rows as there are buttons are fetched (and sent, over HTTP)
+            rows = self.search(text, self.limit) if text else []
+        except Exception as e:
+            logging.error(f"Error in type-ahead search for {text!r}: {e}")
+            self.status.configure(text="Search failed.")
+            rows = []
+        else:
+            self.status.configure(text="" if rows or not text else "No matches.")
+        self._show(rows)
+
+    def _show(self, rows):
+        self.rows = rows[:len(self.buttons)]
+        for index, button in enumerate(self.buttons):
+            if index < len(self.rows):
+                button.configure(text=self.describe(self.rows[index]), fg_color=self.default_color)
+                button.pack(fill="x", pady=2)
+            else:
+                button.pack_forget()
+
+    def _choose(self, index):
+        row = self.rows[index]
+        self.selected_key = self.key(row)
+        for i, button in enumerate(self.buttons[:len(self.rows)]):
+            button.configure(fg_color="green" if i == index else self.default_color)
+        self.status.configure(text=f"Selected: {self.describe(row)}")
+        if self.on_select:
+            self.on_select(row)
+
+    def clear(self):
+        """
+        Forget the typed text, the results and the selection.
+        """
+        if self.pending is not None:
+            self.after_cancel(self.pending)
+            self.pending = None
+        self.entry.delete(0, "end")
+        self.last_text = None
+        self.selected_key = None
+        self.status.configure(text="")
+        self._show([])
@@ -0,0 +1,162 @@
+# write_queue.py
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from database import manager
+from query_stats import stats
+
+# synchronous setting of the writer's connection. Under WAL, NORMAL may lose
+# the last group commits on power loss but never corrupts the database; FULL
+# syncs the WAL on every group commit, so a completed call is durable.
+DURABILITY = os.environ.get("FACULTYONSITE_DURABILITY", "NORMAL").upper()
+# A group is committed once it holds this many operations...
+GROUP_COMMIT_OPS = int(os.environ.get("FACULTYONSITE_GROUP_COMMIT_OPS", 64))
+# ...or when the queue runs dry, after lingering at most this many milliseconds
+# for more operations. Operations arriving during a commit form the next group
+# anyway, so lingering only helps when callers do not block on each write.
+# The default is 0 because every caller here blocks on its write (the GUI and
+# the API server's pool threads): a 5 ms linger gave 1.0k ops/s against 3.0k
+# for direct commits, while draining only what is already queued gave 3.9k
+# against 2.2k.
+GROUP_COMMIT_MS = float(os.environ.get("FACULTYONSITE_GROUP_COMMIT_MS", 0))
+
+class WriteQueue:
+    """
+    Single writer thread that commits queued mutations in groups.
+
+    Callers submit a function that writes through the repositories; the
+    writer runs a group of them in one transaction and commits once, so
+    concurrent users share one sync instead of queueing for the write lock
+    one commit at a time. Each function runs in its own savepoint: one that
+    raises is rolled back alone and its caller gets the exception, while the
+    rest of the group commits. Results are delivered only after the commit.
+    """
+
+    def __init__(self, db=manager, max_ops=GROUP_COMMIT_OPS, max_delay_ms=GROUP_COMMIT_MS, durability=DURABILITY):
+        if durability not in ("NORMAL", "FULL", "EXTRA"):
+            raise ValueError(f"Invalid durability mode: {durability}")
+        self.db = db
+        self.max_ops = max_ops
+        self.max_delay = max_delay_ms / 1000
+        self.durability = durability
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.groups = 0
+        self.operations = 0
+
+    def _start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self.thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queue fn(*args, **kwargs) for the writer thread and return a Future of its result.
+        """
+        future = Future()
+        if threading.current_thread() is self.thread:
+            # A queued function writing again joins its own transaction
+            future.set_result(fn(*args, **kwargs))
+            return future
+        self._start()
+        self.queue.put((future, fn, args, kwargs))
+        return future
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) on the writer thread and wait for the group commit.
+        Returns fn's result or raises its exception.
+        """
+        return self.submit(fn, *args, **kwargs).result()
+
+    def _run(self):
+        self.db.connection().execute(f"PRAGMA synchronous = {self.durability}")
+        logging.info(f"Write queue started (synchronous={self.durability}, "
+                     f"{self.max_ops} operations or {self.max_delay * 1000:g} ms per group)")
+        running = True
+        while running:
+            item = self.queue.get()
+            if item is None:
+                break
+            group = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(group) < self.max_ops:
+                # Everything that queued up during the last commit joins this
+                # group; waiting for more only pays off with a linger time set
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self.queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                if item is None:
+                    running = False
+                    break
+                group.append(item)
+            self._commit(group)
+        # Operations queued after close() are refused rather than left waiting
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[0].set_exception(RuntimeError("The write queue is closed."))
+        self.db.close_thread_connection()
+
+    def _commit(self, group):
+        outcomes = []
+        try:
+            with stats.timed("write_queue.group_commit"), self.db.transaction():
+                for future, fn, args, kwargs in group:
+                    if not future.set_running_or_notify_cancel():
+                        outcomes.append(None)
+                        continue
+                    try:
+                        with self.db.transaction():
+                            outcomes.append((True, fn(*args, **kwargs)))
+                    except Exception as e:
+                        outcomes.append((False, e))
+        except Exception as e:
+            # The commit itself failed: nothing in the group was written
+            logging.error(f"Group commit of {len(group)} operations failed: {e}")
+            for future, _, _, _ in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.groups += 1
+        self.operations += len(group)
+        logging.debug(f"Committed a group of {len(group)} operations")
+        for (future, _, _, _), outcome in zip(group, outcomes):
+            if outcome is None:
+                continue
+            ok, value = outcome
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def close(self):
+        """
+        Commit everything queued so far and stop the writer thread.
+        """
+        with self.lock:
+            thread = self.thread
+        if thread is not None:
+            self.queue.put(None)
+            thread.join()
+            with self.lock:
+                self.thread = None
+
+write_queue = WriteQueue()